@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+# ======= 永続APIキャッシュ =======
+
+# APIレスポンスの永続キャッシュ
+class ResponseCache:
+    """APIレスポンスを圧縮してSQLiteファイルに保存する、TTL・LRU付きの永続キャッシュ"""
+
+    def __init__(self, path, ttl, max_entries=5000, compress_level=6):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.compress_level = compress_level
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._entry_count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    # データベースへの接続（破損している場合は作り直す）
+    def _connect(self):
+        try:
+            return self._open()
+        except sqlite3.DatabaseError:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+            return self._open()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries (last_access)")
+        conn.commit()
+        return conn
+
+    # キャッシュからの取得
+    def get(self, key):
+        """有効期限内のエントリがあればデータを返し、なければNoneを返す"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            payload, expires_at = row
+            if expires_at <= now:
+                # 期限切れのエントリは削除してミス扱い
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._entry_count -= 1
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            # LRU管理のため最終アクセス時刻を更新
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.counters["hits"] += 1
+
+        return json.loads(zlib.decompress(payload).decode("utf-8"))
+
+    # キャッシュへの保存
+    def set(self, key, data, ttl=None):
+        """データを圧縮して保存し、上限を超えた場合は最も古いエントリから削除（保存したバイト数を返す）"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        payload = zlib.compress(
+            json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            self.compress_level
+        )
+
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, payload, created_at, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(payload), now, expires_at, now)
+            )
+            if not exists:
+                self._entry_count += 1
+            self.counters["writes"] += 1
+
+            # サイズ上限を超えたら最終アクセスが古いものから削除
+            overflow = self._entry_count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._entry_count -= overflow
+                self.counters["evictions"] += overflow
+
+            self._conn.commit()
+        return len(payload)
+
+    # 期限切れエントリの一括削除
+    def purge_expired(self):
+        """期限切れのエントリを削除し、削除件数を返す"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            self._entry_count -= cursor.rowcount
+            self.counters["expired"] += cursor.rowcount
+            return cursor.rowcount
+
+    # 統計情報
+    def stats(self):
+        """ヒット/ミス数などの統計情報を返す"""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(
+                self.counters,
+                entries=self._entry_count,
+                hit_rate=(self.counters["hits"] / lookups * 100) if lookups else 0.0,
+                file_size=os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            )
+
+    # 接続のクローズ
+    def close(self):
+        """WALの内容を書き戻して接続を閉じる"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+            self._conn = None
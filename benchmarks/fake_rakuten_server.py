@@ -0,0 +1,170 @@
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ======= 楽天商品検索APIの代替サーバー（オフライン計測用） =======
+
+# 代替サーバーの設定値
+SERVER_CONFIG = {
+    "latency_ms": 50.0,  # 応答までの基本の待ち時間
+    "jitter_ms": 20.0,  # 待ち時間に加えるばらつき（0〜この値の一様分布）
+    "error_rate": 0.0,  # サーバー障害（500）を返す割合
+    "rate_limit_rate": 0.0,  # レート制限（429）を返す割合
+    "retry_after": 1,  # 429のRetry-Afterヘッダーの秒数
+    "empty_rate": 0.1,  # 検索結果が0件のJANの割合
+    "max_hits": 8,  # 1JANあたりの検索結果の最大件数
+    "seed": 0,  # 検索結果の内容を決める乱数の種
+}
+
+# 合成した商品オブジェクト（formatVersion 2 の全項目）
+def make_item(rnd, jan_code, index):
+    image_urls = [f"https://thumbnail.image.rakuten.co.jp/@0_mall/shop{index}/cabinet/{jan_code}_{i}.jpg?_ex=128x128"
+                  for i in range(3)]
+    name = f"【送料無料】テスト商品 {jan_code if rnd.random() < 0.6 else ''} 正規品 カラー{index}"
+    if rnd.random() < 0.1:
+        name = "【中古】" + name
+    return {
+        "itemName": name,
+        "catchcopy": "ポイント最大10倍！あす楽対応",
+        "itemCode": f"shop{index}:{jan_code}",
+        "itemPrice": rnd.randint(500, 50000),
+        "itemCaption": "商品説明文です。素材・サイズ・注意事項などが続きます。" * rnd.randint(5, 20)
+                       + (f" JAN:{jan_code}" if rnd.random() < 0.5 else ""),
+        "itemUrl": f"https://item.rakuten.co.jp/shop{index}/{jan_code}/",
+        "affiliateUrl": "",
+        "smallImageUrls": image_urls,
+        "mediumImageUrls": image_urls,
+        "availability": 1 if rnd.random() < 0.8 else 0,
+        "reviewCount": rnd.randint(0, 500),
+        "reviewAverage": round(rnd.uniform(1, 5), 2),
+        "shopName": f"テストショップ{index}",
+        "shopCode": f"shop{index}",
+        "shopUrl": f"https://www.rakuten.co.jp/shop{index}/",
+        "genreId": "100000",
+        "tagIds": [1000000 + i for i in range(10)],
+    }
+
+# JANコードの検索結果（同じJANコードには常に同じ結果を返す）
+def make_search_body(jan_code, params, config):
+    rnd = random.Random(zlib.crc32(f"{jan_code}-{config['seed']}".encode()))
+    hits = 0 if rnd.random() < config["empty_rate"] else rnd.randint(1, config["max_hits"])
+    items = [make_item(rnd, jan_code, i) for i in range(hits)]
+
+    # elementsの指定があれば指定された項目のみ返す
+    elements = [name for name in params.get("elements", "").split(",") if name]
+    if elements:
+        items = [{name: item[name] for name in elements if name in item} for item in items]
+    if str(params.get("formatVersion", "1")) != "2":
+        items = [{"Item": item} for item in items]
+    return {"count": hits, "page": 1, "first": 1 if hits else 0, "last": hits, "hits": hits,
+            "carrier": 0, "pageCount": 1 if hits else 0, "Items": items}
+
+# リクエストの処理
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-aliveで接続を再利用させる
+    disable_nagle_algorithm = True  # ヘッダーと本文を分けて送るため、遅延ACKによる待ちを避ける
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        params = {key: values[0] for key, values in urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query).items()}
+        with server.lock:
+            roll = server.rnd.random()
+            delay = (config["latency_ms"] + server.rnd.uniform(0, config["jitter_ms"])) / 1000
+        time.sleep(delay)
+
+        headers = {}
+        if roll < config["rate_limit_rate"]:
+            status, body = 429, {"error": "too_many_requests", "error_description": "This request was rate limited"}
+            headers["Retry-After"] = str(config["retry_after"])
+        elif roll < config["rate_limit_rate"] + config["error_rate"]:
+            status, body = 500, {"error": "system_error", "error_description": "synthetic failure"}
+        elif not params.get("keyword"):
+            status, body = 400, {"error": "wrong_parameter", "error_description": "keyword is not valid"}
+        else:
+            status, body = 200, make_search_body(params["keyword"], params, config)
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        server.record(status, len(payload))
+
+    def log_message(self, format, *args):
+        pass  # リクエストごとのアクセスログは出さない
+
+# 代替サーバー
+class FakeRakutenServer(ThreadingHTTPServer):
+    """楽天商品検索APIと同じ形式の合成した検索結果を返すローカルHTTPサーバー"""
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, config=None):
+        super().__init__((host, port), SearchHandler)
+        self.config = dict(SERVER_CONFIG, **(config or {}))
+        self.lock = threading.Lock()
+        self.rnd = random.Random(self.config["seed"])
+        self.stats = {"requests": 0, "bytes": 0, "status": {}}
+        self._thread = None
+
+    # 応答の統計の記録
+    def record(self, status, size):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += size
+            self.stats["status"][str(status)] = self.stats["status"].get(str(status), 0) + 1
+
+    # 統計の取得とリセット
+    def take_stats(self):
+        with self.lock:
+            stats = self.stats
+            self.stats = {"requests": 0, "bytes": 0, "status": {}}
+        return stats
+
+    # 検索APIのURL（monitor.pyのRAKUTEN_SEARCH_API_URLに指定する）
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/services/api/IchibaItem/Search/20170706"
+
+    # バックグラウンドでの起動
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-rakuten", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description="楽天商品検索APIの代替サーバーを起動します")
+    parser.add_argument("--port", type=int, default=8080, help="待ち受けるポート番号")
+    parser.add_argument("--latency-ms", type=float, default=SERVER_CONFIG["latency_ms"], help="応答までの基本の待ち時間")
+    parser.add_argument("--jitter-ms", type=float, default=SERVER_CONFIG["jitter_ms"], help="待ち時間のばらつき")
+    parser.add_argument("--error-rate", type=float, default=SERVER_CONFIG["error_rate"], help="500を返す割合")
+    parser.add_argument("--rate-limit-rate", type=float, default=SERVER_CONFIG["rate_limit_rate"], help="429を返す割合")
+    args = parser.parse_args()
+
+    server = FakeRakutenServer(port=args.port, config={
+        "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate,
+    })
+    print(f"RAKUTEN_SEARCH_API_URL={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_rakuten_server import FakeRakutenServer
+
+# ======= 監視処理全体のオフラインベンチマーク =======
+
+# 子プロセスでmonitor_productsを実行し、計測結果をファイルに書き出すコード
+RUN_MONITOR = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+import monitor
+
+latencies = []
+fetch = monitor.get_product_info_by_jan_code
+def timed_fetch(jan_code, context=None):
+    start = time.perf_counter()
+    try:
+        return fetch(jan_code, context)
+    finally:
+        latencies.append(time.perf_counter() - start)
+monitor.get_product_info_by_jan_code = timed_fetch
+
+start = time.perf_counter()
+notified = monitor.monitor_products(max_workers={workers!r}, full_sweep=True)
+elapsed = time.perf_counter() - start
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+try:
+    import resource
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+except ImportError:
+    peak_rss = None
+
+written = None
+if os.path.exists("/proc/self/io"):
+    with open("/proc/self/io") as f:
+        written = dict(line.split(": ") for line in f.read().splitlines()).get("wchar")
+
+with open({report!r}, "w", encoding="utf-8") as f:
+    json.dump({{"elapsed": elapsed, "fetched": len(latencies), "notified": len(notified),
+               "p50_ms": (percentile(latencies, 0.5) or 0) * 1e3, "p99_ms": (percentile(latencies, 0.99) or 0) * 1e3,
+               "peak_rss": peak_rss, "written_bytes": int(written) if written else None}}, f)
+"""
+
+# 計測用の商品リストを作成（JANコードはチェックディジット付きの13桁）
+def write_catalog(path, count):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["jan_code", "product_name", "last_price", "last_availability", "monitor_flag",
+                         "notified_flag", "last_notified_price", "last_notified_time", "last_updated"])
+        for i in range(count):
+            body = f"490{i:09d}"
+            check = (10 - sum(int(d) * (3 if k % 2 else 1) for k, d in enumerate(body)) % 10) % 10
+            # 半数は前回の取得結果あり（価格変動の比較を通す）、残りは初回取得
+            if i % 2:
+                writer.writerow([body + str(check), f"テスト商品 {body}{check} 正規品", 10000 + i % 5000, "在庫あり",
+                                 True, False, 0, "", ""])
+            else:
+                writer.writerow([body + str(check), "", "", "unknown", True, False, 0, "", ""])
+
+# ディレクトリ内のファイルサイズの合計
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+# 1つの商品リストの件数で計測する
+def run_case(server, size, workers, env):
+    with tempfile.TemporaryDirectory() as tempdir:
+        # 作業ディレクトリの増加分を保存されたデータ量とするため、計測結果は作業ディレクトリの外に書き出す
+        workdir = os.path.join(tempdir, "work")
+        os.makedirs(workdir)
+        report_path = os.path.join(tempdir, "report.json")
+        write_catalog(os.path.join(workdir, "product_list.csv"), size)
+        initial_size = directory_size(workdir)
+        server.take_stats()
+
+        code = RUN_MONITOR.format(root=ROOT, workers=workers, report=report_path)
+        with open(os.path.join(workdir, "run.log"), "w", encoding="utf-8") as log:
+            completed = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        log_size = os.path.getsize(os.path.join(workdir, "run.log"))
+        if completed.returncode != 0 or not os.path.exists(report_path):
+            with open(os.path.join(workdir, "run.log"), encoding="utf-8", errors="replace") as f:
+                tail = f.read()[-2000:]
+            raise RuntimeError(f"{size}件の計測に失敗しました（終了コード {completed.returncode}）\n{tail}")
+
+        with open(report_path, encoding="utf-8") as f:
+            result = json.load(f)
+        result.update({
+            "size": size,
+            "items_per_sec": result["fetched"] / result["elapsed"] if result["elapsed"] else 0.0,
+            "output_bytes": directory_size(workdir) - initial_size - log_size,
+            "log_bytes": log_size,
+            "server": server.take_stats(),
+        })
+        return result
+
+# 前回の記録から同じ条件の結果を探す
+def load_previous(path, settings):
+    if not path or not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("settings") == settings:
+                previous = record
+    return previous
+
+# 前回との差を整形
+def format_change(current, previous, lower_is_better=False):
+    if not previous or current is None:
+        return "-"
+    change = (current - previous) / previous * 100
+    worse = change > 0 if lower_is_better else change < 0
+    return f"{change:+.1f}%" + ("!" if worse and abs(change) >= 10 else "")
+
+def main():
+    parser = argparse.ArgumentParser(description="ローカルの代替サーバーを使った監視処理全体（monitor_products）のスループット計測")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="商品リストの件数")
+    parser.add_argument("--workers", type=int, default=4, help="APIリクエストの並列数")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="代替サーバーの応答までの基本の待ち時間")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="待ち時間のばらつき")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="サーバー障害（500）を返す割合")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="レート制限（429）を返す割合")
+    parser.add_argument("--rate-limit", type=float, default=0, help="monitor.pyの1秒あたりのリクエスト上限（0で無制限）")
+    parser.add_argument("--record", metavar="PATH", help="結果を1行のJSONとして追記するファイル（同じ条件の前回の結果と比較します）")
+    args = parser.parse_args()
+
+    settings = {"workers": args.workers, "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate, "rate_limit": args.rate_limit}
+    previous = load_previous(args.record, settings)
+    previous_cases = {case["size"]: case for case in (previous or {}).get("cases", [])}
+
+    server = FakeRakutenServer(config={"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                                       "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate}).start()
+    env = dict(os.environ, RAKUTEN_APP_ID="benchmark", RAKUTEN_SEARCH_API_URL=server.url,
+               RAKUTEN_API_RATE_LIMIT=str(args.rate_limit), RAKUTEN_API_RATE_BURST=str(max(1, args.workers)),
+               PYTHONDONTWRITEBYTECODE="1")
+    env.pop("TWITTER_API_KEY", None)  # 投稿は行わない
+    print(f"代替サーバー: {server.url}（待ち時間 {args.latency_ms:.0f}+0〜{args.jitter_ms:.0f}ms, "
+          f"500: {args.error_rate:.1%}, 429: {args.rate_limit_rate:.1%}）")
+
+    cases = []
+    try:
+        print(f"{'件数':>8} {'経過(s)':>9} {'件/秒':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'最大RSS(MB)':>12} "
+              f"{'書込(MB)':>9} {'保存(MB)':>9} {'前回比(件/秒)':>14} {'前回比(RSS)':>12}")
+        for size in args.sizes:
+            case = run_case(server, size, args.workers, env)
+            cases.append(case)
+            before = previous_cases.get(size, {})
+            print(f"{size:>8} {case['elapsed']:>9.1f} {case['items_per_sec']:>9.1f} {case['p50_ms']:>9.1f} "
+                  f"{case['p99_ms']:>9.1f} {(case['peak_rss'] or 0) / 2**20:>12.1f} "
+                  f"{(case['written_bytes'] or 0) / 2**20:>9.1f} {case['output_bytes'] / 2**20:>9.1f} "
+                  f"{format_change(case['items_per_sec'], before.get('items_per_sec')):>14} "
+                  f"{format_change(case['peak_rss'], before.get('peak_rss'), lower_is_better=True):>12}")
+    finally:
+        server.stop()
+
+    if args.record:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "commit": commit,
+                "python": sys.version.split()[0],
+                "settings": settings,
+                "cases": cases
+            }, ensure_ascii=False) + "\n")
+        print(f"結果を{args.record}に追記しました" + (f"（前回: {previous['commit']} {previous['time']}）" if previous else ""))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_series import PriceSeriesStore
+
+# ======= 価格時系列のベンチマーク =======
+
+# 合成した実行ごとのサンプルを作成
+def make_runs(jan_count, runs, seed=0):
+    rnd = random.Random(seed)
+    jan_codes = [str(4900000000000 + i) for i in rnd.sample(range(jan_count * 10), jan_count)]
+    prices = {jan_code: rnd.randint(500, 50000) for jan_code in jan_codes}
+    shops = [f"ショップ{i}" for i in range(200)]
+    for _ in range(runs):
+        samples = []
+        for jan_code in jan_codes:
+            # 1割程度の商品だけ価格が動く
+            if rnd.random() < 0.1:
+                prices[jan_code] = max(100, prices[jan_code] + rnd.randint(-2000, 2000))
+            samples.append((jan_code, prices[jan_code], "在庫あり" if rnd.random() < 0.9 else "在庫なし",
+                            rnd.choice(shops)))
+        yield samples
+
+def main():
+    parser = argparse.ArgumentParser(description="価格時系列の追記・検索・保存サイズの計測")
+    parser.add_argument("--jans", type=int, default=1800, help="商品数")
+    parser.add_argument("--runs", type=int, default=240, help="実行回数（3時間ごとなら1か月で240回）")
+    parser.add_argument("--queries", type=int, default=200, help="計測に使うJAN検索の回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = PriceSeriesStore(directory)
+        base_time = 1700000000
+        jan_codes = None
+
+        start = time.perf_counter()
+        for run, samples in enumerate(make_runs(args.jans, args.runs)):
+            jan_codes = jan_codes or [sample[0] for sample in samples]
+            store.append(samples, now=base_time + run * 3 * 3600)
+        append_time = (time.perf_counter() - start) / args.runs
+
+        stats = store.stats()
+        print(f"サンプル数: {stats['samples']}件, 月数: {stats['months']}")
+        print(f"1回の実行あたりの追記: {append_time * 1e3:.2f}ms")
+        print(f"保存サイズ（過去の月は圧縮済み・当月は追記形式）: {stats['file_size'] / 1024:.1f}KB ({stats['file_size'] / max(stats['samples'], 1):.2f}バイト/件)")
+
+        sample = random.Random(1).sample(jan_codes, min(args.queries, len(jan_codes)))
+        start = time.perf_counter()
+        for jan_code in sample:
+            store.query(jan_code)
+        print(f"JAN単位の全期間検索: {(time.perf_counter() - start) / len(sample) * 1e3:.2f}ms/件")
+
+        start = time.perf_counter()
+        summary = store.summarize(start=base_time + args.runs * 3 * 3600 - 7 * 86400)
+        print(f"全商品の直近7日間の集計: {(time.perf_counter() - start) * 1e3:.1f}ms ({len(summary)}件)")
+
+        start = time.perf_counter()
+        packed = store.pack_completed_months("9999-12")
+        packed_stats = store.stats()
+        print(f"列形式への圧縮: {(time.perf_counter() - start) * 1e3:.1f}ms ({len(packed)}か月), "
+              f"圧縮後サイズ: {packed_stats['file_size'] / 1024:.1f}KB "
+              f"({packed_stats['file_size'] / max(packed_stats['samples'], 1):.2f}バイト/件)")
+
+        start = time.perf_counter()
+        for jan_code in sample:
+            store.query(jan_code)
+        print(f"圧縮後のJAN単位の全期間検索: {(time.perf_counter() - start) / len(sample) * 1e3:.2f}ms/件")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from product_store import ProductStore, OfferRecord
+
+# ======= 監視ループ（読み込み〜変動検知）のベンチマーク =======
+
+# 合成した商品リストと取得結果を作成
+def make_catalog(size, seed=0):
+    rnd = random.Random(seed)
+    jan_codes = [str(4900000000000 + i) for i in rnd.sample(range(size * 10), size)]
+    prices = [float(rnd.randint(500, 50000)) if rnd.random() > 0.01 else None for _ in range(size)]
+    product_df = pd.DataFrame({
+        "jan_code": jan_codes,
+        "product_name": [f"商品{i}" for i in range(size)],
+        "last_price": prices,
+        "last_availability": [rnd.choice(["在庫あり", "在庫あり", "在庫なし"]) for _ in range(size)],
+        "monitor_flag": [rnd.random() > 0.05 for _ in range(size)],
+        "notified_flag": [False] * size,
+        "last_notified_price": [0] * size,
+        "last_notified_time": [None] * size,
+    })
+
+    # 1割程度の商品の価格・在庫が変わった取得結果
+    product_infos = {}
+    for jan_code, price in zip(jan_codes, prices):
+        changed = rnd.random() < 0.1
+        product_infos[jan_code] = {
+            "jan_code": jan_code,
+            "item_name": f"取得{jan_code}",
+            "item_price": int((price or 1000) + (rnd.randint(-500, 500) if changed else 0)),
+            "shop_name": "ショップ",
+            "availability": "在庫あり" if not changed or rnd.random() < 0.5 else "在庫なし",
+            "item_url": f"https://example.com/{jan_code}",
+            "affiliate_url": f"https://example.com/a/{jan_code}",
+            "image_url": "",
+            "is_new_item": True
+        }
+    return product_df, product_infos
+
+# 従来方式: iterrows・行ごとのpd.isna・タプルのDataFrame化・to_dictでの走査
+def legacy_path(product_df, product_infos):
+    active_products = product_df[product_df["monitor_flag"] == True]
+    active_rows = list(active_products.iterrows())
+    jan_codes = [str(row["jan_code"]).strip() for _, row in active_rows]
+    first_fetch_jan_codes = {
+        jan_code for (_, row), jan_code in zip(active_rows, jan_codes)
+        if pd.isna(row["last_price"]) or row["last_price"] == 0
+        or pd.isna(row["last_availability"]) or row["last_availability"] == "不明"
+    }
+
+    fetch_results = []
+    for jan_code in jan_codes:
+        product_info = product_infos[jan_code]
+        fetch_results.append((
+            jan_code, product_info["item_name"], product_info["item_price"], product_info["availability"],
+            product_info["shop_name"], product_info["item_url"], product_info["affiliate_url"]
+        ))
+
+    index = {}
+    for label, jan_code in zip(product_df.index, product_df["jan_code"]):
+        index.setdefault(str(jan_code).strip(), []).append(label)
+
+    batch = pd.DataFrame.from_records(fetch_results, columns=[
+        "jan_code", "item_name", "item_price", "availability", "shop_name", "item_url", "affiliate_url"])
+    first_labels = [index[jan_code][0] for jan_code in batch["jan_code"]]
+    previous = product_df.loc[first_labels, ["last_price", "last_availability"]]
+    previous_price = pd.to_numeric(previous["last_price"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    previous_availability = previous["last_availability"].where(
+        previous["last_availability"].notna(), "不明").to_numpy(dtype=object)
+    current_price = batch["item_price"].to_numpy()
+    first_fetch = (previous_price == 0) | (previous_availability == "不明")
+    price_changed = ~first_fetch & (current_price != previous_price)
+    availability_changed = ~first_fetch & (batch["availability"].to_numpy(dtype=object) != previous_availability)
+    changed = price_changed | availability_changed
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = np.where(previous_price > 0, (current_price - previous_price) / previous_price * 100, 0.0)
+    batch["previous_price"] = previous_price
+    batch["previous_availability"] = previous_availability
+    batch["first_fetch"] = first_fetch
+    batch["price_changed"] = price_changed
+    batch["availability_changed"] = availability_changed
+    batch["changed"] = changed
+    batch["price_change_rate"] = np.where(changed, rate, 0.0)
+
+    changed_products = []
+    for record in batch.to_dict("records"):
+        if record["first_fetch"] or not record["changed"]:
+            continue
+        changed_products.append({
+            "jan_code": record["jan_code"],
+            "current_price": record["item_price"],
+            "previous_price": record["previous_price"],
+            "price_change_rate": record["price_change_rate"],
+        })
+    return len(first_fetch_jan_codes), changed_products
+
+# レコード方式: ProductStore.records()・OfferRecord・ChangeRecordでの走査
+def record_path(product_df, product_infos):
+    product_store = ProductStore(product_df)
+    active_products = [record for record in product_store.records() if record.monitor_flag]
+    first_fetch_jan_codes = {record.jan_code for record in active_products if record.needs_first_fetch}
+
+    offers = [OfferRecord.from_product_info(record.jan_code, product_infos[record.jan_code])
+              for record in active_products]
+
+    changed_products = []
+    for change in product_store.apply_fetch_results(offers):
+        if change.first_fetch or not change.changed:
+            continue
+        changed_products.append({
+            "jan_code": change.offer.jan_code,
+            "current_price": change.offer.item_price,
+            "previous_price": change.previous_price,
+            "price_change_rate": change.price_change_rate,
+        })
+    return len(first_fetch_jan_codes), changed_products
+
+# 所要時間とメモリのピークを計測（tracemallocの負荷が時間に乗らないよう別々に実行する）
+def measure(path_func, product_df, product_infos):
+    start = time.perf_counter()
+    result = path_func(product_df.copy(), product_infos)
+    elapsed = time.perf_counter() - start
+
+    product_df = product_df.copy()
+    tracemalloc.start()
+    path_func(product_df, product_infos)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description="監視ループの従来方式と軽量レコード方式の比較")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 100000])
+    args = parser.parse_args()
+
+    print(f"{'商品数':>8} {'従来(s)':>9} {'レコード(s)':>11} {'従来(µs/件)':>12} {'レコード(µs/件)':>15} "
+          f"{'従来ピーク(MB)':>14} {'レコードピーク(MB)':>18} {'結果一致':>8}")
+    for size in args.sizes:
+        product_df, product_infos = make_catalog(size)
+        legacy_time, legacy_peak, legacy_result = measure(legacy_path, product_df, product_infos)
+        record_time, record_peak, record_result = measure(record_path, product_df, product_infos)
+        same = legacy_result == record_result
+        print(f"{size:>8} {legacy_time:>9.2f} {record_time:>11.2f} {legacy_time / size * 1e6:>12.1f} "
+              f"{record_time / size * 1e6:>15.1f} {legacy_peak / 2**20:>14.1f} {record_peak / 2**20:>18.1f} "
+              f"{'はい' if same else 'いいえ':>8}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import random
+import argparse
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from product_store import ProductStore
+
+# ======= 商品リスト更新のベンチマーク =======
+
+# 合成した商品リストを作成
+def make_product_df(size, seed=0):
+    rnd = random.Random(seed)
+    jan_codes = [str(4900000000000 + i) for i in rnd.sample(range(size * 10), size)]
+    return pd.DataFrame({
+        "jan_code": jan_codes,
+        "product_name": [f"商品{i}" for i in range(size)],
+        "last_price": [float(rnd.randint(500, 50000)) for _ in range(size)],
+        "last_availability": ["在庫あり"] * size,
+        "monitor_flag": [True] * size,
+        "notified_flag": [False] * size,
+        "last_notified_price": [0] * size,
+        "last_notified_time": [None] * size,
+    })
+
+# 従来方式（JANコード列の全件比較）での更新
+def update_with_mask(product_df, jan_code, price):
+    mask = product_df["jan_code"].astype(str) == jan_code
+    if not mask.any():
+        return
+    product_df.loc[mask, "product_name"] = f"更新{jan_code}"
+    product_df.loc[mask, "last_price"] = price
+    product_df.loc[mask, "last_availability"] = "在庫あり"
+
+# 索引方式での更新
+def update_with_store(product_store, jan_code, price):
+    product_store.update(jan_code, product_name=f"更新{jan_code}", last_price=price, last_availability="在庫あり")
+
+# 1件あたりの更新時間を計測
+def time_updates(update_func, target, jan_codes):
+    start = time.perf_counter()
+    for jan_code in jan_codes:
+        update_func(target, jan_code, 1234.0)
+    return (time.perf_counter() - start) / len(jan_codes)
+
+def main():
+    parser = argparse.ArgumentParser(description="商品リスト更新方式のスケーリング比較")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 200000])
+    parser.add_argument("--samples", type=int, default=200, help="計測に使う更新件数")
+    args = parser.parse_args()
+
+    print(f"{'商品数':>8} {'従来(µs/件)':>14} {'索引(µs/件)':>14} {'従来(全件更新s)':>16} {'索引(全件更新s)':>16} {'索引構築(ms)':>12}")
+    for size in args.sizes:
+        product_df = make_product_df(size)
+        sample = random.Random(1).sample(list(product_df["jan_code"]), min(args.samples, size))
+
+        legacy_per_update = time_updates(update_with_mask, product_df.copy(), sample)
+
+        start = time.perf_counter()
+        product_store = ProductStore(product_df.copy())
+        build_time = time.perf_counter() - start
+        store_per_update = time_updates(update_with_store, product_store, sample)
+
+        print(f"{size:>8} {legacy_per_update * 1e6:>14.1f} {store_per_update * 1e6:>14.1f} "
+              f"{legacy_per_update * size:>16.2f} {store_per_update * size + build_time:>16.2f} {build_time * 1e3:>12.1f}")
+
+if __name__ == "__main__":
+    main()
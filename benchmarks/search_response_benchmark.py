@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rakuten_items import SEARCH_ELEMENTS, CAPTION_ELEMENT, parse_search_response
+
+# ======= 楽天API検索結果の転送量・解析時間のベンチマーク =======
+
+# 楽天商品検索APIの全項目を持つ商品オブジェクト（formatVersion 1 相当）を作成
+def make_full_item(rnd, jan_code, index):
+    image_urls = [{"imageUrl": f"https://thumbnail.image.rakuten.co.jp/@0_mall/shop{index}/cabinet/{jan_code}_{i}.jpg?_ex=128x128"}
+                  for i in range(3)]
+    return {
+        "itemName": f"【送料無料】テスト商品 {jan_code} 正規品 {index}",
+        "catchcopy": "ポイント最大10倍！あす楽対応 " * 2,
+        "itemCode": f"shop{index}:{jan_code}",
+        "itemPrice": rnd.randint(500, 50000),
+        "itemCaption": ("商品説明文です。素材・サイズ・注意事項などが続きます。" * rnd.randint(10, 40)
+                        + (f" JAN:{jan_code}" if rnd.random() < 0.5 else "")),
+        "itemUrl": f"https://item.rakuten.co.jp/shop{index}/{jan_code}/",
+        "affiliateUrl": f"https://hb.afl.rakuten.co.jp/hgc/0000/?pc=https%3A%2F%2Fitem.rakuten.co.jp%2Fshop{index}%2F{jan_code}%2F",
+        "imageFlag": 1,
+        "smallImageUrls": image_urls,
+        "mediumImageUrls": image_urls,
+        "availability": 1,
+        "taxFlag": 0,
+        "postageFlag": 0,
+        "creditCardFlag": 1,
+        "shopOfTheYearFlag": 0,
+        "shipOverseasFlag": 0,
+        "shipOverseasArea": "",
+        "asurakuFlag": 1,
+        "asurakuClosingTime": "12:00",
+        "asurakuArea": "東京都/神奈川県/埼玉県/千葉県",
+        "affiliateRate": 4,
+        "startTime": "",
+        "endTime": "",
+        "reviewCount": rnd.randint(0, 500),
+        "reviewAverage": round(rnd.uniform(1, 5), 2),
+        "pointRate": 1,
+        "pointRateStartTime": "",
+        "pointRateEndTime": "",
+        "giftFlag": 0,
+        "shopName": f"テストショップ{index}",
+        "shopCode": f"shop{index}",
+        "shopUrl": f"https://www.rakuten.co.jp/shop{index}/",
+        "shopAffiliateUrl": "",
+        "genreId": "100000",
+        "tagIds": [1000000 + i for i in range(20)],
+    }
+
+# 検索結果のレスポンス本文を作成（全項目の従来形式と、項目を絞った形式）
+def make_responses(rnd, jan_code, hits, with_caption):
+    items = [make_full_item(rnd, jan_code, i) for i in range(hits)]
+    full = {"count": hits, "page": 1, "first": 1, "last": hits, "hits": hits, "carrier": 0, "pageCount": 1,
+            "Items": [{"Item": item} for item in items], "GenreInformation": [], "TagInformation": []}
+    elements = SEARCH_ELEMENTS + ([CAPTION_ELEMENT] if with_caption else [])
+    pruned = {"count": hits, "Items": [{key: item[key] for key in elements if key in item} for item in items]}
+    return (json.dumps(full, ensure_ascii=False).encode("utf-8"),
+            json.dumps(pruned, ensure_ascii=False).encode("utf-8"))
+
+# 従来方式: レスポンス全体をdictとして保持してキャッシュ
+def legacy_path(body, jan_code):
+    result = json.loads(body)
+    payload = zlib.compress(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    return result, len(payload)
+
+# 軽量方式: 必要な項目だけをレコードに変換してキャッシュ
+def record_path(body, jan_code):
+    _, items = parse_search_response(body, jan_code)
+    payload = zlib.compress(json.dumps([item.to_list() for item in items], ensure_ascii=False,
+                                       separators=(",", ":")).encode("utf-8"), 6)
+    return items, len(payload)
+
+# 解析時間・保持メモリ・キャッシュ保存サイズを計測
+def measure(path_func, bodies):
+    start = time.perf_counter()
+    cache_bytes = sum(path_func(body, jan_code)[1] for jan_code, body in bodies)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    kept = [path_func(body, jan_code)[0] for jan_code, body in bodies]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return elapsed, retained, cache_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="楽天API検索結果の全項目取得と項目を絞った取得の比較")
+    parser.add_argument("--jan-codes", type=int, default=300, help="計測するJANコードの件数")
+    parser.add_argument("--hits", type=int, default=30, help="1JANあたりの検索結果の件数")
+    parser.add_argument("--no-caption", action="store_true", help="説明文を取得しない設定で計測する")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    full_bodies = []
+    pruned_bodies = []
+    for i in range(args.jan_codes):
+        jan_code = str(4900000000000 + i)
+        full, pruned = make_responses(rnd, jan_code, args.hits, not args.no_caption)
+        full_bodies.append((jan_code, full))
+        pruned_bodies.append((jan_code, pruned))
+
+    count = args.jan_codes
+    print(f"{'方式':<24} {'受信(バイト/JAN)':>16} {'解析(ms/JAN)':>14} {'保持メモリ(KB/JAN)':>19} {'キャッシュ(バイト/JAN)':>22}")
+    for name, path_func, bodies in (("従来（全項目・dict保持）", legacy_path, full_bodies),
+                                    ("軽量（項目指定・レコード）", record_path, pruned_bodies)):
+        elapsed, retained, cache_bytes = measure(path_func, bodies)
+        received = sum(len(body) for _, body in bodies)
+        print(f"{name:<24} {received / count:>16.0f} {elapsed * 1000 / count:>14.3f} "
+              f"{retained / 1024 / count:>19.1f} {cache_bytes / count:>22.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ======= 起動時間のベンチマーク =======
+
+# 子プロセスの終了時に読み込まれた重いライブラリを報告するコード
+REPORT_MODULES = """
+import atexit, json, sys, time
+def _report():
+    sys.stdout.write("\\nSTARTUP_REPORT " + json.dumps({
+        "end": time.time(),
+        "modules": {name: name in sys.modules for name in ("pandas", "numpy", "requests", "tweepy")}
+    }) + "\\n")
+atexit.register(_report)
+"""
+
+# 最初のHTTPリクエストの時点で計測して終了するコード
+STOP_AT_FIRST_REQUEST = """
+import os, http_client
+def _first_request(method, url, **kwargs):
+    sys.stdout.write("\\nFIRST_REQUEST " + json.dumps({"time": time.time()}) + "\\n")
+    _report()
+    sys.stdout.flush()
+    os._exit(0)
+http_client.request = _first_request
+"""
+
+# 計測対象のスクリプトを実行するコード
+RUN_SCRIPT = """
+import runpy
+sys.path.insert(0, {root!r})
+sys.argv = [{script!r}] + {args!r}
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+# 計測用の商品リストを作成
+def write_product_list(path, count, monitored):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["jan_code", "product_name", "last_price", "last_availability", "monitor_flag",
+                         "notified_flag", "last_notified_price", "last_notified_time", "last_updated"])
+        for i in range(count):
+            writer.writerow([str(4900000000000 + i), "", "", "unknown", monitored, False, 0, "", ""])
+
+# 子プロセスで1回計測する
+def measure(workdir, script, args=(), stop_at_first_request=False):
+    code = REPORT_MODULES
+    if stop_at_first_request:
+        code += "import sys\nsys.path.insert(0, %r)\n" % ROOT + STOP_AT_FIRST_REQUEST
+    if script is not None:
+        code += RUN_SCRIPT.format(root=ROOT, script=os.path.join(ROOT, script), args=list(args))
+
+    env = dict(os.environ, RAKUTEN_APP_ID=os.environ.get("RAKUTEN_APP_ID", "benchmark"), PYTHONDONTWRITEBYTECODE="1")
+    start = time.time()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                               capture_output=True, text=True, encoding="utf-8")
+    finished = time.time()
+
+    result = {"elapsed": finished - start, "modules": {}}
+    for line in completed.stdout.splitlines():
+        if line.startswith("STARTUP_REPORT "):
+            result["modules"] = json.loads(line.split(" ", 1)[1])["modules"]
+        elif line.startswith("FIRST_REQUEST "):
+            result["first_request"] = json.loads(line.split(" ", 1)[1])["time"] - start
+    return result
+
+# 計測ケースを複数回実行して中央値を求める
+def run_case(name, setup, script, args=(), stop_at_first_request=False, repeat=5):
+    timings = []
+    modules = {}
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            setup(workdir)
+            result = measure(workdir, script, args, stop_at_first_request)
+        timings.append(result.get("first_request", result["elapsed"]))
+        modules = result["modules"] or modules
+    loaded = [name for name, imported in modules.items() if imported]
+    return {"case": name, "median_ms": statistics.median(timings) * 1e3, "min_ms": min(timings) * 1e3,
+            "loaded": loaded}
+
+def main():
+    parser = argparse.ArgumentParser(description="各エントリポイントの起動時間と最初のリクエストまでの時間の計測")
+    parser.add_argument("--repeat", type=int, default=5, help="各ケースの実行回数")
+    parser.add_argument("--products", type=int, default=200, help="計測用の商品リストの件数")
+    parser.add_argument("--record", metavar="PATH", help="結果を1行のJSONとして追記するファイル（経時比較用）")
+    args = parser.parse_args()
+
+    def no_products(workdir):
+        write_product_list(os.path.join(workdir, "product_list.csv"), args.products, False)
+
+    def due_products(workdir):
+        write_product_list(os.path.join(workdir, "product_list.csv"), args.products, True)
+
+    def nothing_to_post(workdir):
+        pass
+
+    cases = [
+        run_case("python起動のみ（基準）", nothing_to_post, None, repeat=args.repeat),
+        run_case("monitor.py（監視対象なし）", no_products, "monitor.py", repeat=args.repeat),
+        run_case("monitor.py（最初のAPIリクエストまで）", due_products, "monitor.py", ["--full-sweep"],
+                 stop_at_first_request=True, repeat=args.repeat),
+        run_case("twitter_poster.py（投稿なし）", nothing_to_post, "twitter_poster.py", repeat=args.repeat),
+        run_case("threads_poster.py（投稿なし）", nothing_to_post, "threads_poster.py", repeat=args.repeat),
+    ]
+
+    print(f"{'ケース':<40} {'中央値(ms)':>10} {'最小(ms)':>10}  読み込まれたライブラリ")
+    for case in cases:
+        print(f"{case['case']:<40} {case['median_ms']:>10.1f} {case['min_ms']:>10.1f}  {', '.join(case['loaded']) or '-'}")
+
+    if args.record:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "commit": commit,
+                "python": sys.version.split()[0],
+                "cases": cases
+            }, ensure_ascii=False) + "\n")
+        print(f"結果を{args.record}に追記しました")
+
+if __name__ == "__main__":
+    main()
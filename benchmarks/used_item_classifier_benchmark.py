@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from item_condition import DEFAULT_USED_KEYWORDS, ItemConditionClassifier
+
+# ======= 中古品キーワード判定のベンチマーク =======
+
+# 実際に見かける除外キーワード
+EXTRA_KEYWORDS = ["訳あり", "開封済", "アウトレット", "展示品", "ジャンク", "難あり", "再生品", "リファービッシュ"]
+
+# 合成したキーワード（実際のキーワードに似た長さのカナ・漢字の組み合わせ）
+def make_keywords(rnd, count):
+    chars = "アイウエオカキクケコサシスセソタチツテトナニヌネノ傷汚箱欠品再整備旧型"
+    keywords = list(DEFAULT_USED_KEYWORDS) + EXTRA_KEYWORDS
+    while len(keywords) < count:
+        keywords.append("".join(rnd.choice(chars) for _ in range(rnd.randint(2, 6))))
+    return keywords[:count]
+
+# 合成した商品名（一部に除外キーワードを含む。全角英数も混ぜる）
+def make_item_names(rnd, count):
+    words = ["【送料無料】", "正規品", "新品", "ティファール", "電気ケトル", "0.8L", "ＵＳＢ", "Ｔｙｐｅ－Ｃ",
+             "ブラック", "ホワイト", "あす楽", "ポイント10倍", "国内正規", "限定モデル", "2024年版"]
+    names = []
+    for _ in range(count):
+        name = " ".join(rnd.choice(words) for _ in range(rnd.randint(4, 10)))
+        if rnd.random() < 0.1:
+            name += " " + rnd.choice(EXTRA_KEYWORDS + ["ＵＳＥＤ", "中古品", "ﾕｰｽﾞﾄﾞ"])
+        names.append(name)
+    return names
+
+# 従来方式: 商品ごとにキーワードを小文字化して部分一致を繰り返す
+def legacy_path(keywords, names):
+    excluded = 0
+    for name in names:
+        item_name = name.lower()
+        if any(keyword.lower() in item_name for keyword in keywords):
+            excluded += 1
+    return excluded
+
+# 判定器方式: キーワードを1つの正規表現にまとめて1回走査する
+def classifier_path(classifier, names):
+    return sum(1 for name in names if classifier.matches(name))
+
+def main():
+    parser = argparse.ArgumentParser(description="中古品キーワード判定の従来方式と判定器方式の比較")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[5, 50, 500, 5000], help="キーワード数")
+    parser.add_argument("--jan-codes", type=int, default=2000, help="JANコードの件数")
+    parser.add_argument("--hits", type=int, default=30, help="1JANあたりの検索結果の件数")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    names = make_item_names(rnd, args.jan_codes * args.hits)
+    print(f"商品名: {len(names)}件（{args.jan_codes}JAN × {args.hits}件）")
+    print(f"{'キーワード数':>10} {'作成(ms)':>9} {'従来(s)':>9} {'判定器(s)':>10} {'従来(µs/件)':>12} "
+          f"{'判定器(µs/件)':>14} {'従来の除外':>10} {'判定器の除外':>12}")
+    for count in args.keywords:
+        keywords = make_keywords(rnd, count)
+
+        start = time.perf_counter()
+        classifier = ItemConditionClassifier(keywords)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy_excluded = legacy_path(keywords, names)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        classifier_excluded = classifier_path(classifier, names)
+        classifier_time = time.perf_counter() - start
+
+        # 従来方式は全角英数・半角カナを正規化しないため、判定器の方が除外件数が多くなる
+        print(f"{count:>10} {compile_time * 1000:>9.1f} {legacy_time:>9.2f} {classifier_time:>10.2f} "
+              f"{legacy_time / len(names) * 1e6:>12.2f} {classifier_time / len(names) * 1e6:>14.2f} "
+              f"{legacy_excluded:>10} {classifier_excluded:>12}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import re
+import functools
+from item_condition import normalize_text
+
+# ======= 検索結果の候補のスコアリング =======
+
+# スコアリングの設定値
+SCORING_CONFIG = {
+    "weights": {  # 各ルールの重み（0のルールは評価しない）
+        "jan_match": 1.0,  # 商品名・説明文にJANコードがある
+        "name_similarity": 1.0,  # 商品リストの商品名との語の一致度（0〜1）
+        "shop_whitelist": 0.5,  # 優先する販売店
+    },
+    "score_tolerance": 0.25,  # 最高スコアとの差がこの範囲内の候補は同等とみなし、最安値を選ぶ
+    "outlier_low_ratio": 0.3,  # 基準価格に対してこれより安い候補は別商品（付属品など）とみなす
+    "outlier_keep_similarity": 0.5,  # 安すぎる候補でも商品名の一致度がこれ以上（またはJANコードが一致）なら値下がりとみなす
+    "outlier_high_ratio": 3.0,  # 基準価格に対してこれより高い候補は別商品（セット品など）とみなす
+    "shop_blacklist": [],  # 選択しない販売店
+    "shop_whitelist": [],  # 優先する販売店
+}
+
+# 商品名の語の区切り（英数字の連続、かな・漢字の連続）
+TOKEN_PATTERN = re.compile(r"[0-9a-z][0-9a-z.\-]*|[぀-ヿ㐀-鿿豈-﫿ー]+")
+
+# 販促用の括弧書き（【送料無料】など）
+PROMOTION_PATTERN = re.compile(r"【[^】]*】|\[[^\]]*\]|＼[^／]*／|\\[^/]*/")
+
+# 商品名を語の集合に変換
+@functools.lru_cache(maxsize=65536)
+def tokenize(name):
+    """英数字は連続した語、かな・漢字は2文字ずつの組み合わせに分ける（表記の揺れ・区切りの違いに強くするため）"""
+    text = PROMOTION_PATTERN.sub(" ", normalize_text(name))
+    tokens = set()
+    for word in TOKEN_PATTERN.findall(text):
+        if word[0].isascii():
+            tokens.add(word.strip(".-"))
+        elif len(word) == 1:
+            tokens.add(word)
+        else:
+            tokens.update(word[i:i + 2] for i in range(len(word) - 1))
+    tokens.discard("")
+    return frozenset(tokens)
+
+# 語の集合の類似度
+def token_similarity(reference_tokens, candidate_tokens):
+    """Jaccard係数（商品名に余計な語が多い候補ほど低くなる）"""
+    if not reference_tokens or not candidate_tokens:
+        return 0.0
+    common = len(reference_tokens & candidate_tokens)
+    return common / (len(reference_tokens) + len(candidate_tokens) - common)
+
+# 商品名として使えない値（取得失敗時の仮の名前など）
+def is_reference_name(name, jan_code):
+    name = str(name or "").strip()
+    return bool(name) and name not in ("商品名なし", "取得エラー") and not name.startswith(f"{jan_code}（")
+
+# JANごとの選択の基準
+class CandidateContext:
+    """JANごとの基準（商品リストの基準の商品名の語の集合・過去の価格）"""
+    __slots__ = ("jan_code", "reference_name", "reference_tokens", "reference_price")
+
+    def __init__(self, jan_code, reference_name="", reference_price=0):
+        self.jan_code = str(jan_code)
+        self.reference_name = reference_name if is_reference_name(reference_name, jan_code) else ""
+        self.reference_tokens = tokenize(self.reference_name) if self.reference_name else frozenset()
+        self.reference_price = float(reference_price or 0)
+
+# ======= スコアリングのルール =======
+# 各ルールは (候補, 基準, 設定) を受け取り、0〜1のスコアを返す（Noneを返した候補は除外する）
+
+def score_jan_match(item, context, config):
+    return 1.0 if context.jan_code.lower() in (item.item_name or "").lower() or item.jan_in_caption else 0.0
+
+def score_name_similarity(item, context, config):
+    return token_similarity(context.reference_tokens, tokenize(item.item_name or ""))
+
+def score_shop_whitelist(item, context, config):
+    return 1.0 if item.shop_name in config["shop_whitelist"] else 0.0
+
+SCORING_RULES = {
+    "jan_match": score_jan_match,
+    "name_similarity": score_name_similarity,
+    "shop_whitelist": score_shop_whitelist,
+}
+
+# 候補のスコアリングと選択
+class CandidateScorer:
+    """検索結果の候補を基準との一致度で採点し、最高スコア付近の候補から最安値を選ぶ"""
+
+    def __init__(self, config=None, rules=None):
+        self.config = dict(SCORING_CONFIG, **(config or {}))
+        self.config["shop_blacklist"] = set(self.config["shop_blacklist"])
+        self.config["shop_whitelist"] = set(self.config["shop_whitelist"])
+        rules = SCORING_RULES if rules is None else rules
+        self.rules = [(name, rule, self.config["weights"].get(name, 0)) for name, rule in rules.items()
+                      if self.config["weights"].get(name, 0)]
+
+    # 価格の外れ値判定
+    def is_price_outlier(self, price, context, item=None):
+        """基準価格より極端に安い候補は、JANコード・商品名のどちらも一致しない場合のみ外れ値とする（itemを省略すると価格のみで判定）"""
+        if context.reference_price <= 0:
+            return False
+        if price > context.reference_price * self.config["outlier_high_ratio"]:
+            return True
+        if price < context.reference_price * self.config["outlier_low_ratio"]:
+            return item is None or not self.is_confident_match(item, context)
+        return False
+
+    # JANコード・商品名が基準と一致する候補か（実際の値下がりと付属品などの別商品を見分ける）
+    def is_confident_match(self, item, context):
+        return (score_jan_match(item, context, self.config) > 0
+                or score_name_similarity(item, context, self.config) >= self.config["outlier_keep_similarity"])
+
+    # 1候補の採点
+    def score(self, item, context):
+        return sum(weight * rule(item, context, self.config) for _, rule, weight in self.rules)
+
+    # 最適な候補の選択
+    def select(self, items, context):
+        """(選択した候補, スコア, 除外理由ごとの件数) を返す（候補がなければ候補はNone）
+
+        候補は有効な価格を持つものに限る。基準価格より極端に安くてもJANコード・商品名が一致する候補は値下がりとみなして残す。
+        全候補が価格の外れ値の場合は価格が実際に変わったとみなして外れ値判定を行わない。
+        並べ替えはせず、採点と最安値の探索をそれぞれ1回の走査で行う。
+        """
+        rejected = {"shop_blacklist": 0, "price_outlier": 0}
+        candidates = []
+        outliers = []
+        for item in items:
+            if item.shop_name in self.config["shop_blacklist"]:
+                rejected["shop_blacklist"] += 1
+                continue
+            price = int(item.item_price)
+            (outliers if self.is_price_outlier(price, context, item) else candidates).append((item, price))
+        rejected["price_outlier"] = len(outliers)
+        if not candidates:
+            candidates = outliers
+
+        if not candidates:
+            return None, 0.0, rejected
+
+        scores = [self.score(item, context) for item, _ in candidates]
+        threshold = max(scores) - self.config["score_tolerance"]
+        best = None
+        for (item, price), score in zip(candidates, scores):
+            # 同じ価格の場合は先に現れた候補（検索結果の並び順）を優先する
+            if score >= threshold and (best is None or price < best[1]):
+                best = (item, price, score)
+        return best[0], best[2], rejected
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from run_log import DEBUG, log_message
+
+# ======= 投稿先の認証情報の管理（有効期限付きのキャッシュ・検証・更新） =======
+
+# 認証情報の設定値
+CREDENTIAL_CONFIG = {
+    "cache_path": os.environ.get("CREDENTIAL_CACHE_PATH", "credential_cache.json"),  # キャッシュの保存先（空なら保存しない）
+    "validate_interval_hours": float(os.environ.get("CREDENTIAL_VALIDATE_HOURS", "24")),  # 検証してからこの時間は検証を省略する
+    "refresh_before_days": float(os.environ.get("CREDENTIAL_REFRESH_DAYS", "7")),  # 有効期限までこの日数を切ったら更新する
+    "cache_key": os.environ.get("CREDENTIAL_CACHE_KEY", ""),  # 更新したトークンを暗号化して保存する鍵（空なら保存しない）
+}
+
+# 元の認証情報の識別子（キャッシュに秘密の値そのものは残さない）
+def fingerprint(secret):
+    return hashlib.sha256(str(secret or "").encode("utf-8")).hexdigest()[:16]
+
+# 認証情報のキャッシュファイル
+class CredentialCache:
+    """投稿先ごとの有効期限・最終検証時刻などをJSONファイルに保存する（所有者のみ読み書き可）
+
+    トークンそのものは保存せず、識別子（token_fingerprint）だけを残す。
+    更新したトークンは鍵（CREDENTIAL_CACHE_KEY）がある場合のみ暗号化して保存する（token_encrypted）。
+    """
+
+    def __init__(self, path, key=""):
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self._entries = None
+        self._fernet = None
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._entries = json.load(f) or {}
+                    for entry in self._entries.values():
+                        entry.pop("token", None)  # 以前の形式で保存されたトークンは使わない（次の保存で消える）
+                except (OSError, ValueError) as e:
+                    log_message("認証情報", "システム", "警告", f"キャッシュを読み込めません: {str(e)}")
+        return self._entries
+
+    def get(self, name):
+        with self._lock:
+            entry = self._load().get(name)
+            return dict(entry) if entry else None
+
+    # 保存する値（トークンを識別子・暗号文に置き換える）
+    def put(self, name, entry):
+        state = {key: value for key, value in entry.items()
+                 if key not in ("token", "refreshed", "token_fingerprint", "token_encrypted")}
+        if "token" in entry:
+            state["token_fingerprint"] = fingerprint(entry["token"])
+        if entry.get("token") and entry.get("refreshed"):
+            encrypted = self.encrypt(entry["token"])
+            if encrypted:
+                state["token_encrypted"] = encrypted
+        with self._lock:
+            self._load()[name] = state
+
+    def discard(self, name):
+        with self._lock:
+            self._load().pop(name, None)
+
+    # 暗号化に使う鍵（鍵がない・cryptographyがない場合はNone）
+    def _cipher(self):
+        if self._fernet is None and self.key:
+            try:
+                from cryptography.fernet import Fernet
+                self._fernet = Fernet(self.key.encode("utf-8"))
+            except (ImportError, ValueError) as e:
+                log_message("認証情報", "システム", "警告", f"キャッシュの鍵を使用できません: {str(e)}")
+                self.key = ""
+        return self._fernet
+
+    def can_encrypt(self):
+        return bool(self.path) and self._cipher() is not None
+
+    def encrypt(self, token):
+        cipher = self._cipher()
+        return cipher.encrypt(token.encode("utf-8")).decode("ascii") if cipher else None
+
+    # 暗号化して保存したトークン（鍵が違う・ない場合はNone）
+    def decrypt(self, encrypted):
+        cipher = self._cipher() if encrypted else None
+        if cipher is None:
+            return None
+        try:
+            return cipher.decrypt(encrypted.encode("ascii")).decode("utf-8")
+        except Exception:
+            log_message("認証情報", "システム", "警告", "キャッシュのトークンを復号できません（鍵が変わった可能性があります）")
+            return None
+
+    # 一時ファイルに書いてから置き換える
+    def save(self):
+        """書き込み中は他のスレッドから保存させない（一時ファイルは呼び出しごとに別のファイルにする）"""
+        if not self.path:
+            return
+        with self._lock:
+            entries = self._load()
+            temp_path = None
+            try:
+                # mkstempは所有者のみ読み書きできるファイルを作る
+                fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                                 suffix=".tmp", dir=os.path.dirname(self.path) or ".")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+                log_message("認証情報", "システム", "警告", f"キャッシュを保存できません: {str(e)}")
+
+# 認証情報のキャッシュ（全投稿先で共有）
+_credential_cache = None
+_credential_cache_lock = threading.Lock()
+
+def get_credential_cache():
+    global _credential_cache
+    with _credential_cache_lock:
+        if _credential_cache is None:
+            _credential_cache = CredentialCache(CREDENTIAL_CONFIG["cache_path"], CREDENTIAL_CONFIG["cache_key"])
+        return _credential_cache
+
+# 投稿先ごとの認証情報
+class CredentialManager:
+    """1つの投稿先の認証情報を取得・キャッシュし、期限が近づけば更新、キャッシュが古くなれば検証する
+
+    サブクラスはnameと、source・fetch・validate（更新できる場合はrefresh）を定義する。
+    認証情報は1回の実行で1度だけ確認し、以降は確認済みの値を返す（投稿が認証エラーになった場合はrevalidate=Trueで確認し直す）。
+    """
+    name = ""
+
+    def __init__(self, cache=None, config=None):
+        self.cache = cache or get_credential_cache()
+        self.config = config or CREDENTIAL_CONFIG
+        self._lock = threading.Lock()
+        self._entry = None  # この実行で確認済みの認証情報
+
+    # 元の認証情報（環境変数など）。変わった場合はキャッシュを使わない
+    def source(self):
+        return ""
+
+    # 元の認証情報からトークンを取得する
+    def fetch(self):
+        """{"token": トークン, "expires_at": 有効期限（UNIX時刻、不明ならNone）, "validated_at": 検証時刻またはNone,
+        "refreshable": 更新できるか} を返す（取得できなければ例外）"""
+        raise NotImplementedError
+
+    # トークンを検証する（entryに取得した情報を書き込んでもよい）
+    def validate(self, entry):
+        return True
+
+    # トークンを更新する
+    def refresh(self, token):
+        """(新しいトークン, 有効期限) を返す（更新できなければNone）"""
+        return None
+
+    def _is_stale(self, entry, now):
+        validated_at = entry.get("validated_at")
+        return not validated_at or now - validated_at >= self.config["validate_interval_hours"] * 3600
+
+    def _needs_refresh(self, entry, now):
+        if not entry.get("refreshable"):
+            return False
+        expires_at = entry.get("expires_at")
+        if expires_at is None:
+            # 有効期限が不明なら更新して期限を得る（失敗した場合は検証と同じ間隔をあけて再試行）
+            return now - (entry.get("refresh_tried_at") or 0) >= self.config["validate_interval_hours"] * 3600
+        return expires_at - now <= self.config["refresh_before_days"] * 86400
+
+    # 期限の更新と検証（無効ならNone）
+    def _check(self, entry, now, revalidate):
+        if self._needs_refresh(entry, now):
+            entry["refresh_tried_at"] = now
+            try:
+                refreshed = self.refresh(entry["token"])
+            except Exception as e:
+                refreshed = None
+                log_message("認証情報", self.name, "警告", f"トークンの更新に失敗しました: {str(e)}")
+            if refreshed:
+                entry["token"], entry["expires_at"] = refreshed
+                entry["validated_at"] = now
+                entry["refreshed"] = True
+                log_message("認証情報", self.name, "更新", "トークンを更新しました" + (
+                    f"（有効期限: {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['expires_at']))}）"
+                    if entry["expires_at"] else ""))
+                if not self.cache.can_encrypt():
+                    log_message("認証情報", self.name, "警告",
+                                "更新したトークンは次回の実行に引き継がれません（CREDENTIAL_CACHE_KEYを設定するか、元の認証情報を更新してください）")
+
+        if revalidate or self._is_stale(entry, now):
+            try:
+                valid = self.validate(entry)
+            except Exception as e:
+                valid = False
+                log_message("認証情報", self.name, "検証失敗", f"エラー: {str(e)}")
+            if not valid:
+                log_message("認証情報", self.name, "検証失敗", "トークンが無効です")
+                return None
+            entry["validated_at"] = now
+            log_message("認証情報", self.name, "検証", "トークンを検証しました")
+        else:
+            log_message("認証情報", self.name, "キャッシュ", "検証済みのトークンを使用します", level=DEBUG)
+        return entry
+
+    # 元の認証情報からの取得
+    def _fetch(self, source, now):
+        try:
+            entry = dict(self.fetch())
+        except Exception as e:
+            log_message("認証情報", self.name, "取得失敗", f"エラー: {str(e)}")
+            return None
+        entry["source"] = source
+        log_message("認証情報", self.name, "取得", "トークンを取得しました")
+        return entry
+
+    # 確認済みの認証情報
+    def get(self, revalidate=False):
+        """確認済みの認証情報の辞書を返す（取得・検証できなければNone）"""
+        with self._lock:
+            if self._entry is not None and not revalidate:
+                return self._entry
+            now = time.time()
+            source = fingerprint(self.source())
+            state = self.cache.get(self.name)
+            if state and (state.get("source") != source or (state.get("expires_at") or now + 1) <= now):
+                state = None  # 元の認証情報が変わった・期限切れ
+
+            # 暗号化して保存した更新済みのトークン
+            token = self.cache.decrypt(state.get("token_encrypted")) if state else None
+            entry = None
+            if token is not None:
+                entry = self._check(dict(state, token=token, refreshed=True), now, revalidate)
+            if entry is None:
+                # キャッシュにトークンがない・キャッシュのトークンが無効なら元の認証情報から取得する
+                entry = self._fetch(source, now)
+                reused = False
+                if entry is not None and state and token is None:
+                    if state.get("token_fingerprint") == fingerprint(entry["token"]):
+                        entry = dict(state, token=entry["token"])  # 同じトークンの検証時刻・有効期限を引き継ぐ
+                        reused = True
+                    else:
+                        # 前回更新したトークンを引き継げない（元の認証情報のトークンを検証し直す）
+                        entry["refresh_tried_at"] = state.get("refresh_tried_at")
+                        if state.get("token_fingerprint"):
+                            log_message("認証情報", self.name, "警告", "前回更新したトークンがないため、元の認証情報のトークンを使用します")
+                if entry is not None:
+                    entry = self._check(entry, now, revalidate and reused)
+
+            if entry is None:
+                self.cache.discard(self.name)
+            else:
+                self.cache.put(self.name, entry)
+            self.cache.save()
+            self._entry = entry
+            return entry
+
+    def get_token(self, revalidate=False):
+        entry = self.get(revalidate)
+        return entry["token"] if entry else None
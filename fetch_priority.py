@@ -0,0 +1,49 @@
+import time
+
+# ======= 取得順の優先度 =======
+
+# 優先度の設定値
+PRIORITY_CONFIG = {
+    "weights": {  # 各要素の重み（要素はいずれも0〜1）
+        "deferred": 4.0,  # 前回の実行で時間切れなどにより取得できなかった
+        "near_low": 1.0,  # 前回価格が過去の最安値に近い（最安値の更新は通知につながりやすい）
+        "volatility": 1.0,  # 価格・在庫の変動頻度（スケジュールの指数移動平均）
+        "staleness": 1.0,  # 前回のチェックからの経過時間
+        "notification_rate": 1.0,  # 過去の通知回数
+    },
+    "low_window_days": 90,  # 最安値を求める価格時系列の期間
+    "stale_hours": 48,  # この時間以上チェックしていなければ経過時間の要素を最大とする
+    "notification_saturation": 5,  # この回数以上通知していれば通知回数の要素を最大とする
+}
+
+# JANごとの優先度の要素を計算
+def priority_components(last_price, low_price, schedule_entry, notification_count, deferred, now=None, config=None):
+    """優先度の各要素（0〜1）を辞書で返す。情報がない要素は0（経過時間は未チェックなら1）とする"""
+    config = config or PRIORITY_CONFIG
+    now = time.time() if now is None else now
+    schedule_entry = schedule_entry or {}
+
+    near_low = 0.0
+    if last_price and last_price > 0 and low_price and low_price > 0:
+        near_low = min(1.0, low_price / last_price)
+
+    last_check = schedule_entry.get("last_check") or 0
+    staleness = 1.0 if not last_check else min(1.0, (now - last_check) / 3600 / config["stale_hours"])
+
+    return {
+        "deferred": 1.0 if deferred else 0.0,
+        "near_low": near_low,
+        "volatility": max(schedule_entry.get("volatility", 0.0), schedule_entry.get("flapping", 0.0)),
+        "staleness": max(0.0, staleness),
+        "notification_rate": min(1.0, notification_count / config["notification_saturation"]),
+    }
+
+# 要素から優先度を計算
+def priority_score(components, config=None):
+    weights = (config or PRIORITY_CONFIG)["weights"]
+    return sum(weights.get(name, 0) * value for name, value in components.items())
+
+# 優先度の高い順に並べる
+def order_by_priority(jan_codes, scores):
+    """優先度の高い順に並べたJANコードのリストを返す（同じ優先度なら元の順序）"""
+    return sorted(jan_codes, key=lambda jan_code: -scores.get(jan_code, 0.0))
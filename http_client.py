@@ -0,0 +1,132 @@
+import os
+import threading
+import urllib.parse
+
+# ======= 共通HTTPクライアント =======
+
+# 接続プールの設定値
+HTTP_CONFIG = {
+    "pool_connections": int(os.environ.get("HTTP_POOL_CONNECTIONS", "4")),  # セッションごとに保持するホスト別プール数
+    "pool_maxsize": int(os.environ.get("HTTP_POOL_MAXSIZE", "10")),  # ホストごとに保持するkeep-alive接続数
+    "default_timeout": 15,  # タイムアウト未指定時の秒数
+}
+
+# 全リクエスト共通のヘッダー
+DEFAULT_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+# ホストごとの共有セッション
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# ホストごとの接続統計（接続プールが追い出されても累計が消えないよう、プールとは別に数える）
+_connection_counts = {}
+_connection_counts_lock = threading.Lock()
+
+def _count(host, name):
+    with _connection_counts_lock:
+        counts = _connection_counts.setdefault(host, {"requests": 0, "connections_opened": 0})
+        counts[name] += 1
+
+# 接続統計を数えるアダプターのクラス
+_adapter_class = None
+
+def _get_adapter_class():
+    """リクエスト数はアダプターで、新規接続数は接続プールで数える（requestsは最初の呼び出しで読み込む）"""
+    global _adapter_class
+    if _adapter_class is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                _count(self.host, "connections_opened")
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                _count(self.host, "connections_opened")
+                return super()._new_conn()
+
+        class CountingHTTPAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    "http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+            def send(self, request, *args, **kwargs):
+                _count(urllib.parse.urlsplit(request.url).hostname, "requests")
+                return super().send(request, *args, **kwargs)
+
+        _adapter_class = CountingHTTPAdapter
+    return _adapter_class
+
+# URLからホスト名を取得
+def _host_of(url_or_host):
+    if "://" in url_or_host:
+        return urllib.parse.urlsplit(url_or_host).hostname or url_or_host
+    return url_or_host
+
+# ホストごとの共有セッションを取得
+def get_session(url_or_host, pool_maxsize=None):
+    """ホストごとに接続プールとkeep-aliveを共有するセッションを返す"""
+    host = _host_of(url_or_host)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            # requestsは最初のセッション作成時に読み込む（通信しない実行の起動を速くするため）
+            import requests
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = _get_adapter_class()(
+                pool_connections=HTTP_CONFIG["pool_connections"],
+                pool_maxsize=pool_maxsize or HTTP_CONFIG["pool_maxsize"]
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+# 共有セッション経由でリクエストを送信
+def request(method, url, **kwargs):
+    """URLのホストに対応する共有セッションでリクエストを送信"""
+    kwargs.setdefault("timeout", HTTP_CONFIG["default_timeout"])
+    return get_session(url).request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+# ホストごとの接続統計を取得
+def get_connection_stats():
+    """ホストごとのリクエスト数・新規接続数・再利用数を返す（セッションを作ってからの累計）"""
+    with _connection_counts_lock:
+        stats = {host: dict(counts) for host, counts in _connection_counts.items()}
+    for host_stats in stats.values():
+        host_stats["connections_reused"] = max(0, host_stats["requests"] - host_stats["connections_opened"])
+    return stats
+
+# 接続統計を1行の文字列に整形
+def format_connection_stats(stats=None):
+    """ログ出力用に接続統計を整形"""
+    stats = get_connection_stats() if stats is None else stats
+    if not stats:
+        return "通信なし"
+    return ", ".join(
+        f"{host}: リクエスト{s['requests']}件 / 新規接続{s['connections_opened']}件 / 再利用{s['connections_reused']}件"
+        for host, s in sorted(stats.items())
+    )
+
+# すべてのセッションを閉じる
+def close_sessions():
+    """共有セッションと接続プールを解放（接続統計も消去する）"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+    with _connection_counts_lock:
+        _connection_counts.clear()
@@ -0,0 +1,81 @@
+import re
+import zlib
+import functools
+import unicodedata
+
+# ======= 商品状態（中古品など）の判定 =======
+
+# 明確に「中古」を表すキーワード（既定値）
+DEFAULT_USED_KEYWORDS = ["中古", "used", "ユーズド", "中古品", "USED"]
+
+# 照合用に文字列を正規化
+def normalize_text(text):
+    """全角英数・半角カナを揃え（NFKC）、大文字小文字を区別しない形にする"""
+    text = str(text or "")
+    if not unicodedata.is_normalized("NFKC", text):  # 正規化が必要な文字がなければ変換を省く（変換は比較的重い）
+        text = unicodedata.normalize("NFKC", text)
+    return text.casefold()
+
+# キーワードのトライ木を正規表現に変換
+def _trie_pattern(node):
+    """共通の接頭辞をまとめた正規表現を作る（キーワードが多くても1回の走査で照合できる）"""
+    if not node or "" in node:
+        return ""  # キーワードの終端（終端は常に葉になる）
+    branches = []
+    chars = []
+    for char in sorted(key for key in node if key):
+        sub_pattern = _trie_pattern(node[char])
+        if sub_pattern:
+            branches.append(re.escape(char) + sub_pattern)
+        else:
+            chars.append(re.escape(char))
+    if chars:
+        branches.append(chars[0] if len(chars) == 1 else "[" + "".join(chars) + "]")
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+# 商品状態の判定器
+class ItemConditionClassifier:
+    """キーワードを1つの正規表現にまとめ、商品名・説明文が中古品などに該当するかを判定する"""
+
+    def __init__(self, keywords):
+        normalized = sorted({normalize_text(keyword) for keyword in keywords if str(keyword or "").strip()})
+        self.keywords = normalized
+        # キーワードの組み合わせを表す短い識別子（判定結果をキャッシュする際の区別に使う）
+        self.signature = format(zlib.crc32("\n".join(normalized).encode("utf-8")), "08x")
+
+        # 共通の接頭辞をまとめたトライ木を作る。短いキーワードで終わる枝はその先を持たない
+        # （例: 「中古」があれば「中古品」は判定結果に影響しない。昇順に追加するため短い方が先に入る）
+        trie = {}
+        for keyword in normalized:
+            node = trie
+            for char in keyword:
+                if "" in node:
+                    break
+                node = node.setdefault(char, {})
+            else:
+                node.clear()
+                node[""] = {}
+        self._pattern = re.compile(_trie_pattern(trie)) if trie else None
+
+    # 該当するキーワードを探す
+    def find(self, text):
+        """該当したキーワード（正規化後）を返す（該当しなければNone）"""
+        if self._pattern is None or not text:
+            return None
+        match = self._pattern.search(normalize_text(text))
+        return match.group(0) if match else None
+
+    # 該当するかを判定
+    def matches(self, text):
+        return self.find(text) is not None
+
+# 判定器の作成（同じキーワードの組み合わせなら作成済みのものを使う）
+@functools.lru_cache(maxsize=8)
+def compile_classifier(keywords):
+    """キーワードのタプルから判定器を作成する"""
+    return ItemConditionClassifier(keywords)
+
+# 設定文字列からキーワードを取得
+def parse_keywords(value):
+    """カンマ区切りのキーワード文字列をリストに変換する（全角カンマ・読点も区切りとみなす）"""
+    return [keyword.strip() for keyword in re.split(r"[,，、]", value or "") if keyword.strip()]
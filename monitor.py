@@ -1,23 +1,43 @@
+import io
 import os
 import csv
 import json
 import time
 import functools
-import pandas as pd
-import requests
-import subprocess
-from datetime import datetime, timedelta
+import threading
+import zlib
+import collections
+import http_client
+from api_cache import ResponseCache
+from poll_scheduler import PollScheduler
+from rakuten_items import SEARCH_ELEMENTS, CAPTION_ELEMENT, SearchItem, parse_search_response
+from item_condition import DEFAULT_USED_KEYWORDS, compile_classifier, parse_keywords
+from candidate_scoring import CandidateContext, CandidateScorer, is_reference_name
+from fetch_priority import PRIORITY_CONFIG, priority_components, priority_score, order_by_priority
+from retry_policy import (PERMANENT, RATE_LIMIT, TRANSIENT, PermanentError, CircuitOpenError, CircuitBreaker,
+                          RetryStats, classify_error, error_for_response)
+from run_log import DEBUG, log_message, configure_logging, flush_logs, summarize_logs
+from run_metrics import RunMetrics, NullMetrics, SIZE_BUCKETS
+from posting import create_posters, run_posters
+from notification_history import NotificationHistory, JsonHistoryBackend, create_history_backend, migrate_json_history
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
 
 # ======= 共通ユーティリティ関数 =======
 
-# ログ出力関数
-def log_message(message_type, target, status, message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{message_type}] [{target}] [{status}] {message}")
+# エラーの分類の表示名
+ERROR_KIND_LABELS = {PERMANENT: "恒久的なエラー", RATE_LIMIT: "レート制限", TRANSIENT: "一時的な障害"}
+
+# リトライの統計（全スレッドで共有）
+_retry_stats = RetryStats()
 
 # 指数バックオフ付きリトライ装飾子
-def retry_with_backoff(max_tries=3, backoff_factor=2):
-    """指数バックオフ付きリトライ装飾子"""
+def retry_with_backoff(max_tries=3, backoff_factor=2, max_retry_after=120):
+    """指数バックオフ付きリトライ装飾子
+    
+    恒久的なエラー（PermanentError）は再試行しない。レート制限・一時的な障害でサーバーが待機秒数を指定した場合は
+    バックオフと指定のうち長い方（最大max_retry_after秒）待つ。
+    """
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -26,20 +46,62 @@ def retry_with_backoff(max_tries=3, backoff_factor=2):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
+                    kind, _ = classify_error(e)
                     retry_count += 1
-                    if retry_count == max_tries:
-                        # 最大リトライ回数に達したら例外を再発生
+                    if kind == PERMANENT or retry_count == max_tries:
+                        # 再試行しても成功しないエラー、または最大リトライ回数に達したら例外を再発生
+                        if not isinstance(e, CircuitOpenError):
+                            _retry_stats.record_give_up(kind)
+                            get_run_metrics().inc("api_gave_up", kind=kind)
                         raise
                     
-                    # 待機時間を計算 (1, 2, 4, 8, ... 秒)
+                    # 待機時間を計算 (1, 2, 4, 8, ... 秒。サーバーの指定があればそれ以上)
                     wait_time = (backoff_factor ** (retry_count - 1))
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after is not None:
+                        wait_time = max(wait_time, min(retry_after, max_retry_after))
+                    _retry_stats.record_retry(kind, wait_time)
+                    get_run_metrics().inc("api_retries", kind=kind)
                     log_message("リトライ", func.__name__, "待機", 
-                               f"エラー: {str(e)}, {wait_time}秒後に再試行します ({retry_count}/{max_tries})")
+                               f"{ERROR_KIND_LABELS[kind]}: {str(e)}, {wait_time}秒後に再試行します ({retry_count}/{max_tries})")
                     time.sleep(wait_time)
             return None  # ここには到達しないはずだが、念のため
         return wrapper
     return decorator
 
+# トークンバケット方式のレート制限
+class TokenBucket:
+    """スレッド間で共有するトークンバケット方式のレート制限"""
+    def __init__(self, rate, capacity=1):
+        # rate: 1秒あたりに補充されるトークン数（0以下なら無制限）
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """トークンを1つ取得できるまで待機し、待機した秒数を返す"""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                # 次のトークンが補充されるまでの時間
+                wait_time = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_time)
+            waited += wait_time
+
 # 設定値
 CONFIG = {
     "price_change_threshold": float(os.environ.get("PRICE_CHANGE_THRESHOLD", "5")),
@@ -47,77 +109,181 @@ CONFIG = {
     "min_notification_interval_hours": 72,  # 3日間
     "min_price_change_percentage": 1.0,  # 最低1%の変動率
     "api_cache_lifetime": 3600,  # APIキャッシュ有効期間（秒）
+    "api_cache_path": os.environ.get("RAKUTEN_API_CACHE_PATH", "api_cache.sqlite3"),  # 永続キャッシュファイル
+    "api_cache_max_entries": 5000,  # キャッシュに保持する最大件数（超過分は古い順に削除）
     "max_posts_per_run": 5,  # 1回の実行で投稿する最大商品数
+    "api_rate_limit": float(os.environ.get("RAKUTEN_API_RATE_LIMIT", "1")),  # 楽天APIの1秒あたりのリクエスト上限
+    "api_rate_burst": int(os.environ.get("RAKUTEN_API_RATE_BURST", "1")),  # 連続して送信できる最大リクエスト数
+    "api_max_workers": int(os.environ.get("RAKUTEN_API_WORKERS", "4")),  # 同時に実行するAPIリクエスト数
+    "api_breaker_threshold": int(os.environ.get("RAKUTEN_API_BREAKER_THRESHOLD", "5")),  # レート制限・サーバー障害がこの回数連続したらリクエストを止める
+    "api_breaker_cooldown": float(os.environ.get("RAKUTEN_API_BREAKER_COOLDOWN", "60")),  # リクエストを止める秒数
+    "api_breaker_max_trips": int(os.environ.get("RAKUTEN_API_BREAKER_MAX_TRIPS", "3")),  # この回数を超えて止まった場合は残りの取得を中止する
+    "adaptive_polling": os.environ.get("ADAPTIVE_POLLING", "1") != "0",  # 変動頻度に応じてチェック間隔を調整するか
+    "poll_schedule_path": "poll_schedule.json",  # JANごとの次回チェック時刻の保存先
+    "shard_output_dir": "shards",  # シャード実行時の部分結果の出力先
+    "notification_history_backend": os.environ.get("NOTIFICATION_HISTORY_BACKEND", "jsonl"),  # 通知履歴の保存形式（json / jsonl）
+    "notification_history_path": "notification_history.json",  # 従来形式の通知履歴
+    "notification_history_log_path": "notification_history.jsonl",  # 追記形式の通知履歴
+    "price_series_dir": os.environ.get("PRICE_SERIES_DIR", "price_series"),  # 毎回の取得価格を蓄積する時系列の保存先
+    "run_journal_path": "run_journal.jsonl",  # 実行の途中経過の記録（中断した実行の再開用）
+    "deferred_path": "deferred_jan_codes.json",  # 時間切れなどで取得できず、次回優先して取得するJANコード
+    "max_runtime_seconds": float(os.environ.get("MAX_RUNTIME_SECONDS", "0")) or None,  # 実行時間の上限（秒。--max-runtimeで上書き）
+    "max_runtime_reserve_ratio": 0.1,  # 実行時間の上限のうち、保存・通知のために残しておく割合
+    "api_match_caption": os.environ.get("RAKUTEN_API_MATCH_CAPTION", "1") != "0",  # JANコードの照合に商品説明文も使うか（使わない場合は説明文を取得しない）
+    "used_item_keywords": DEFAULT_USED_KEYWORDS + parse_keywords(os.environ.get("USED_ITEM_KEYWORDS", "")),  # 中古品などとして除外するキーワード
+    "used_item_check_caption": os.environ.get("USED_ITEM_CHECK_CAPTION", "0") == "1",  # 除外キーワードを商品説明文でも判定するか
+    "candidate_shop_blacklist": parse_keywords(os.environ.get("CANDIDATE_SHOP_BLACKLIST", "")),  # 選択しない販売店
+    "candidate_shop_whitelist": parse_keywords(os.environ.get("CANDIDATE_SHOP_WHITELIST", "")),  # 優先する販売店
+    "candidate_history_days": 30,  # 価格の外れ値判定の基準とする価格時系列の期間（日）
+    "metrics_enabled": os.environ.get("RUN_METRICS", "1") != "0",  # 段階ごとの所要時間などを計測するか
+    "metrics_path": os.environ.get("RUN_METRICS_PATH", "run_metrics"),  # 計測結果の保存先（.json と .prom を書き出す）
 }
 
+# ======= 実行の計測 =======
+
+# 実行ごとの計測値（全スレッドで共有）
+_run_metrics = None
+_run_metrics_lock = threading.Lock()
+
+# 実行の計測値を取得
+def get_run_metrics():
+    """設定で有効ならRunMetrics、無効なら何も記録しないNullMetricsを返す"""
+    global _run_metrics
+    if _run_metrics is None:
+        with _run_metrics_lock:
+            if _run_metrics is None:
+                _run_metrics = (RunMetrics({"api_response_bytes": SIZE_BUCKETS}) if CONFIG["metrics_enabled"]
+                                else NullMetrics())
+    return _run_metrics
+
+# 実行の計測値を破棄
+def reset_run_metrics():
+    global _run_metrics
+    with _run_metrics_lock:
+        _run_metrics = None
+
+# 実行の計測値を書き出す
+def write_run_metrics(suffix=""):
+    """段階ごとの所要時間・ヒストグラム・カウンターをJSONとPrometheus形式で保存する
+    
+    シャード実行ではsuffixで出力先を分ける。計測した段階がない実行（対象なしでの終了など）は何も書き出さない。
+    """
+    metrics = get_run_metrics()
+    if not metrics.enabled or not metrics.stages:
+        return
+    try:
+        base_path = f"{CONFIG['metrics_path']}{suffix}"
+        metrics.write(f"{base_path}.json", f"{base_path}.prom")
+        log_message("計測", "システム", "統計", 
+                   ", ".join(f"{name}: {stage['seconds']:.2f}秒" for name, stage in metrics.stages.items())
+                   + f"（{base_path}.json, {base_path}.promに保存しました）")
+    except Exception as e:
+        log_message("計測", "システム", "保存エラー", str(e))
+
 # ======= 通知履歴管理 =======
 
+# 通知履歴の保存形式を取得
+def get_history_backend():
+    """設定された保存形式を返す（追記形式の初回利用時は従来のJSONから移行する）"""
+    backend = create_history_backend(
+        CONFIG["notification_history_backend"],
+        json_path=CONFIG["notification_history_path"],
+        log_path=CONFIG["notification_history_log_path"]
+    )
+    if backend.name == "jsonl":
+        migrated = migrate_json_history(JsonHistoryBackend(CONFIG["notification_history_path"]), backend)
+        if migrated is not None:
+            log_message("通知履歴", "システム", "移行", 
+                       f"{migrated}件の通知履歴を{CONFIG['notification_history_path']}から"
+                       f"{CONFIG['notification_history_log_path']}に移行しました")
+    return backend
+
 # 通知履歴の取得
 def get_notification_history():
     """通知履歴ファイルから履歴を取得"""
-    if os.path.exists("notification_history.json"):
-        try:
-            with open("notification_history.json", "r", encoding="utf-8") as f:
-                history = json.load(f)
+    try:
+        backend = get_history_backend()
+        if backend.exists():
+            history = backend.load()
             
+            if backend.skipped_lines:
+                log_message("通知履歴", "システム", "警告", f"解析できない{backend.skipped_lines}行を読み飛ばしました")
             log_message("通知履歴", "システム", "読込", f"{len(history)}件の通知履歴を読み込みました")
             return history
-        except Exception as e:
-            log_message("通知履歴", "システム", "読込エラー", str(e))
+        else:
+            log_message("通知履歴", "システム", "初期化", "通知履歴ファイルが存在しないため新規作成します")
             return {}
-    else:
-        log_message("通知履歴", "システム", "初期化", "通知履歴ファイルが存在しないため新規作成します")
+    except Exception as e:
+        log_message("通知履歴", "システム", "読込エラー", str(e))
         return {}
 
 # 通知履歴の保存
-def save_notification_history(history):
-    """通知履歴をファイルに保存"""
+def save_notification_history(history, events=None):
+    """通知履歴をファイルに保存（追記形式では未保存の通知イベントのみを追記）"""
     try:
-        with open("notification_history.json", "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+        backend = get_history_backend()
+        written = backend.save(history, events or [])
         
-        log_message("通知履歴", "システム", "保存", f"{len(history)}件の履歴を保存しました")
+        log_message("通知履歴", "システム", "保存", 
+                   f"{len(history)}件の履歴を保存しました（形式: {backend.name}, 書き込み: {written}件）")
         return True
     except Exception as e:
         log_message("通知履歴", "システム", "保存エラー", str(e))
         return False
 
+# 通知履歴を従来のJSON形式で書き出す
+def export_notification_history(output_path):
+    """現在の通知履歴をnotification_history.jsonと同じ形式で書き出す"""
+    history = get_notification_history()
+    JsonHistoryBackend(output_path).save(history, [])
+    log_message("通知履歴", "システム", "書き出し", f"{len(history)}件の通知履歴を{output_path}に書き出しました")
+    return len(history)
+
+# 追記形式の通知履歴を圧縮する
+def compact_notification_history():
+    """通知イベント行を1JAN1行のスナップショットにまとめ直す"""
+    backend = get_history_backend()
+    if backend.name != "jsonl":
+        log_message("通知履歴", "システム", "情報", "追記形式ではないため圧縮は不要です")
+        return 0
+    history = get_notification_history()
+    count = backend.compact(history)
+    log_message("通知履歴", "システム", "圧縮", f"{count}件の通知履歴を{backend.path}に書き直しました")
+    return count
+
+# 実行中に共有する通知履歴（1回の実行につき1回だけ読み込む）
+_notification_history = None
+
+# 通知履歴サービスを取得
+def get_notification_history_service():
+    """通知履歴を初回のみ読み込み、以降は索引付きの同じインスタンスを返す"""
+    global _notification_history
+    if _notification_history is None:
+        _notification_history = NotificationHistory(get_notification_history())
+    return _notification_history
+
+# 通知履歴の変更を保存して閉じる
+def flush_notification_history():
+    """変更があれば通知履歴を1回だけ保存し、次回の実行では読み込み直す"""
+    global _notification_history
+    if _notification_history is None:
+        return
+    if _notification_history.dirty:
+        if save_notification_history(_notification_history.entries, _notification_history.pending_events):
+            _notification_history.pending_events = []
+    _notification_history = None
+
 # 通知履歴の更新
 def update_notification_history(notifiable_products):
     """通知対象商品の履歴を更新"""
     try:
-        history = get_notification_history()
+        history = get_notification_history_service()
         current_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # 新しい通知を履歴に追加
         for product in notifiable_products:
-            jan_code = str(product["jan_code"])
-            
-            if jan_code in history:
-                # 既存エントリの更新
-                history[jan_code].update({
-                    "product_name": product["product_name"],
-                    "price": product["current_price"],
-                    "last_notified_time": current_time_str,
-                    "notification_count": history[jan_code].get("notification_count", 0) + 1,
-                    "previous_prices": history[jan_code].get("previous_prices", []) + [
-                        {"price": product["current_price"], "time": current_time_str}
-                    ][-5:]  # 直近5回分の履歴を保持
-                })
-            else:
-                # 新規エントリの追加
-                history[jan_code] = {
-                    "product_name": product["product_name"],
-                    "price": product["current_price"],
-                    "last_notified_time": current_time_str,
-                    "notification_count": 1,
-                    "previous_prices": [
-                        {"price": product["current_price"], "time": current_time_str}
-                    ]
-                }
-        
-        # 履歴を保存
-        save_notification_history(history)
+            history.record_notification(product, current_time_str)
+        
         log_message("通知履歴", "システム", "更新", f"{len(notifiable_products)}件の通知履歴を更新しました")
     except Exception as e:
         log_message("通知履歴", "システム", "更新失敗", str(e))
@@ -127,6 +293,7 @@ def update_notification_history(notifiable_products):
 # 商品リストの読み込み
 def load_product_list():
     """product_list.csvを読み込み、DataFrameとして返す"""
+    import pandas as pd
     try:
         if os.path.exists("product_list.csv"):
             try:
@@ -164,6 +331,15 @@ def load_product_list():
                             product_df[col] = None
                         log_message("商品リスト", "システム", "列追加", f"{col}列を追加しました")
                 
+                # 候補の選択の基準にする商品名は1度だけ記録する（登録時の商品名、なければ初回取得時の商品名）
+                if "reference_name" not in product_df.columns:
+                    product_df["reference_name"] = ""
+                    log_message("商品リスト", "システム", "列追加", "reference_name列を追加しました")
+                reference_names = product_df["reference_name"].where(product_df["reference_name"].notna(), "")
+                missing = pd.Series([not is_reference_name(name, str(jan_code).strip()) for name, jan_code
+                                     in zip(reference_names, product_df["jan_code"])], index=product_df.index, dtype=bool)
+                product_df["reference_name"] = reference_names.where(~missing, product_df["product_name"].fillna("")).astype(str)
+                
                 return product_df
             except Exception as e:
                 log_message("商品リスト", "システム", "読込エラー", f"CSV解析エラー: {str(e)}")
@@ -174,19 +350,43 @@ def load_product_list():
         # 空のDataFrameを返す
         return pd.DataFrame(columns=[
             "jan_code", "product_name", "last_price", "last_availability", 
-            "monitor_flag", "notified_flag", "last_notified_price", "last_notified_time"
+            "monitor_flag", "notified_flag", "last_notified_price", "last_notified_time", "reference_name"
         ])
     except Exception as e:
         log_message("商品リスト", "システム", "読込エラー", str(e))
         # エラーが発生した場合も空のDataFrameを返す
         return pd.DataFrame(columns=[
             "jan_code", "product_name", "last_price", "last_availability", 
-            "monitor_flag", "notified_flag", "last_notified_price", "last_notified_time"
+            "monitor_flag", "notified_flag", "last_notified_price", "last_notified_time", "reference_name"
         ])
 
+# CSVに書き出したときの文字列で商品リストを表す
+def render_product_rows(csv_text):
+    """CSVの文字列を全列文字列のDataFrameとして読み直す（数値型の違いを無視して行を比較するため）"""
+    import pandas as pd
+    return pd.read_csv(io.StringIO(csv_text), dtype=str, keep_default_na=False)
+
+# 前回保存時から変わった行を判定
+def find_changed_product_rows(previous_rows, current_rows):
+    """last_updated以外の列が前回の保存内容と異なる行（新規行を含む）をTrueとする配列を返す"""
+    import numpy as np
+    if previous_rows is None or list(previous_rows.columns) != list(current_rows.columns):
+        return np.ones(len(current_rows), dtype=bool)
+    
+    # 同じJANコードの行が複数ある場合は出現順で対応付ける
+    compare_columns = [col for col in current_rows.columns if col != "last_updated"]
+    def row_keys(rows):
+        return zip(rows["jan_code"], rows.groupby("jan_code").cumcount())
+    previous_values = dict(zip(row_keys(previous_rows), previous_rows[compare_columns].itertuples(index=False, name=None)))
+    return np.fromiter(
+        (previous_values.get(key) != values
+         for key, values in zip(row_keys(current_rows), current_rows[compare_columns].itertuples(index=False, name=None))),
+        dtype=bool, count=len(current_rows)
+    )
+
 # 商品リストの保存
-def save_product_list(product_df):
-    """商品リストをCSVファイルに保存"""
+def save_product_list(product_df, path="product_list.csv"):
+    """商品リストをCSVファイルに保存（変更のあった行のみlast_updatedを更新し、変更がなければ書き込まない）"""
     try:
         # 保存前のチェック
         log_message("商品リスト", "システム", "保存前", f"行数: {len(product_df)}, 列: {product_df.columns.tolist()}")
@@ -194,70 +394,208 @@ def save_product_list(product_df):
         # null値を適切に処理
         product_df["product_name"] = product_df["product_name"].fillna("").astype(str)
         product_df["last_availability"] = product_df["last_availability"].fillna("unknown").astype(str)
+        if "last_updated" not in product_df.columns:
+            product_df["last_updated"] = None
         
-        # 現在の時刻を取得してタイムスタンプ列を追加
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        product_df["last_updated"] = current_time
+        # 前回保存した内容と比較して、変更のあった行にのみ現在の時刻を付ける
+        previous_text = None
+        previous_rows = None
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8", newline="") as f:
+                previous_text = f.read()
+            previous_rows = render_product_rows(previous_text)
         
-        # CSVファイルに保存（index=Falseは必須）
-        product_df.to_csv("product_list.csv", index=False, encoding="utf-8")
+        changed = find_changed_product_rows(previous_rows, render_product_rows(product_df.to_csv(index=False)))
+        if changed.any():
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            product_df["last_updated"] = product_df["last_updated"].astype(object)
+            product_df.loc[product_df.index[changed], "last_updated"] = current_time
         
-        # 保存後の確認
-        if os.path.exists("product_list.csv"):
-            file_size = os.path.getsize("product_list.csv")
-            log_message("商品リスト", "システム", "保存成功", f"{len(product_df)}件の商品情報を保存しました (サイズ: {file_size} バイト)")
+        csv_text = product_df.to_csv(index=False)
+        if csv_text == previous_text:
+            log_message("商品リスト", "システム", "保存スキップ", f"変更がないため書き込みません（{len(product_df)}件）")
             return True
-        else:
-            log_message("商品リスト", "システム", "保存エラー", "ファイルの確認ができません")
-            return False
+        
+        # 一時ファイルに書き出してから置き換える（途中で中断しても元のファイルを壊さない）
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(csv_text)
+        os.replace(temp_path, path)
+        
+        removed_count = max(0, len(previous_rows) - len(product_df)) if previous_rows is not None else 0
+        log_message("商品リスト", "システム", "保存成功", 
+                   f"{int(changed.sum())}/{len(product_df)}行を更新して保存しました"
+                   + (f"（削除: {removed_count}行）" if removed_count else "")
+                   + f" (サイズ: {len(csv_text.encode('utf-8'))} バイト)")
+        return True
     except Exception as e:
         log_message("商品リスト", "システム", "保存エラー", f"例外発生: {str(e)}")
         return False
 
 # 商品情報の更新
-def update_product_info(product_df, jan_code, product_info, price_change_rate=0):
+def update_product_info(product_store, jan_code, product_info, price_change_rate=0):
     """指定されたJANコードの商品情報を更新"""
     try:
-        # JANコードを文字列として扱う
-        jan_code_str = str(jan_code)
-        
-        # 文字列に変換したJANコードで比較
-        mask = product_df["jan_code"].astype(str) == jan_code_str
-        
-        # マッチする行が存在するか確認
-        if not mask.any():
+        # マッチする行が存在するか確認（索引によるO(1)の参照）
+        if jan_code not in product_store:
             log_message("商品情報更新", jan_code, "スキップ", "指定されたJANコードが商品リストに存在しません")
-            return product_df
+            return product_store
         
         # 更新前の値を記録
-        old_product_name = product_df.loc[mask, "product_name"].iloc[0] if not pd.isna(product_df.loc[mask, "product_name"].iloc[0]) else "未取得"
-        old_price = product_df.loc[mask, "last_price"].iloc[0] if not pd.isna(product_df.loc[mask, "last_price"].iloc[0]) else 0
-        old_availability = product_df.loc[mask, "last_availability"].iloc[0] if not pd.isna(product_df.loc[mask, "last_availability"].iloc[0]) else "不明"
+        old_product_name = product_store.get(jan_code, "product_name", "未取得")
+        old_price = product_store.get(jan_code, "last_price", 0)
+        old_availability = product_store.get(jan_code, "last_availability", "不明")
         
         # 商品情報を更新
-        product_df.loc[mask, "product_name"] = product_info["item_name"]
-        product_df.loc[mask, "last_price"] = product_info["item_price"]
-        product_df.loc[mask, "last_availability"] = product_info["availability"]
+        product_store.update(
+            jan_code,
+            product_name=product_info["item_name"],
+            last_price=product_info["item_price"],
+            last_availability=product_info["availability"]
+        )
         
         # 更新後の値を確認
-        new_product_name = product_df.loc[mask, "product_name"].iloc[0]
-        new_price = product_df.loc[mask, "last_price"].iloc[0]
-        new_availability = product_df.loc[mask, "last_availability"].iloc[0]
+        new_product_name = product_store.get(jan_code, "product_name")
+        new_price = product_store.get(jan_code, "last_price")
+        new_availability = product_store.get(jan_code, "last_availability")
         
         log_message("商品情報更新", jan_code, "成功", 
                    f"商品名: {old_product_name} → {new_product_name}, "
                    f"価格: {old_price}円 → {new_price}円, "
-                   f"在庫: {old_availability} → {new_availability}")
+                   f"在庫: {old_availability} → {new_availability}", level=DEBUG)
         
-        return product_df
+        return product_store
     except Exception as e:
         log_message("商品情報更新", jan_code, "失敗", str(e))
-        return product_df
+        return product_store
 
 # ======= 楽天API 関連 =======
 
-# APIキャッシュ
-_api_cache = {}  # シンプルなインメモリキャッシュ
+# 楽天商品検索APIのエンドポイント（計測時はローカルの代替サーバーを指定できる）
+RAKUTEN_SEARCH_API_URL = os.environ.get(
+    "RAKUTEN_SEARCH_API_URL", "https://app.rakuten.co.jp/services/api/IchibaItem/Search/20170706"
+)
+
+# APIキャッシュ（実行をまたいで保持される永続キャッシュ）
+_api_cache = None
+_api_cache_disabled = False  # 開けなかった場合はこの実行中は開き直さない
+_api_cache_lock = threading.Lock()
+
+# 永続APIキャッシュを取得
+def get_api_cache():
+    """設定値に基づく永続キャッシュを開いて返す（開けない場合はNone。開くのは1回の実行で1度だけ試す）"""
+    global _api_cache, _api_cache_disabled
+    with _api_cache_lock:
+        if _api_cache is None and not _api_cache_disabled:
+            try:
+                cache = ResponseCache(
+                    CONFIG["api_cache_path"],
+                    ttl=CONFIG["api_cache_lifetime"],
+                    max_entries=CONFIG["api_cache_max_entries"]
+                )
+                cache.purge_expired()
+                _api_cache = cache
+            except Exception as e:
+                _api_cache_disabled = True
+                log_message("APIキャッシュ", "システム", "エラー", f"キャッシュを開けないため無効化します: {str(e)}")
+        return _api_cache
+
+# 永続APIキャッシュを閉じる
+def close_api_cache():
+    """統計情報をログに記録してキャッシュを閉じる（開けなかった場合は次の実行で開き直す）"""
+    global _api_cache, _api_cache_disabled
+    with _api_cache_lock:
+        _api_cache_disabled = False
+        if _api_cache is None:
+            return
+        stats = _api_cache.stats()
+        log_message("APIキャッシュ", "システム", "統計", 
+                   f"ヒット: {stats['hits']}件, ミス: {stats['misses']}件 (ヒット率 {stats['hit_rate']:.1f}%), "
+                   f"期限切れ: {stats['expired']}件, 追い出し: {stats['evictions']}件, "
+                   f"保持: {stats['entries']}件, ファイルサイズ: {stats['file_size']}バイト")
+        _api_cache.close()
+        _api_cache = None
+
+# APIレート制限（全スレッドで共有）
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+# 楽天API用のレート制限を取得
+def get_rate_limiter():
+    """設定値に基づく共有トークンバケットを返す"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TokenBucket(CONFIG["api_rate_limit"], CONFIG["api_rate_burst"])
+        return _rate_limiter
+
+# サーキットブレーカー（全スレッドで共有）
+_circuit_breaker = None
+_circuit_breaker_lock = threading.Lock()
+
+# サーキットブレーカーの状態変化をログに記録
+def log_breaker_state(state, trips, pause):
+    if state == "open":
+        log_message("サーキットブレーカー", "楽天API", "停止", 
+                   f"レート制限・サーバー障害が続いたため{pause:.0f}秒間リクエストを止めます（{trips}回目）")
+    else:
+        log_message("サーキットブレーカー", "楽天API", "中止", 
+                   f"障害が解消しないため残りの取得を中止します（{trips}回目）")
+
+# 楽天API用のサーキットブレーカーを取得
+def get_circuit_breaker():
+    """設定値に基づく共有サーキットブレーカーを返す"""
+    global _circuit_breaker
+    with _circuit_breaker_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                CONFIG["api_breaker_threshold"], CONFIG["api_breaker_cooldown"],
+                CONFIG["api_breaker_max_trips"], on_state_change=log_breaker_state
+            )
+        return _circuit_breaker
+
+# リトライ・サーキットブレーカーの統計を整形
+def format_retry_stats():
+    """分類ごとの再試行・断念の件数とサーキットブレーカーの作動回数を文字列で返す"""
+    stats = _retry_stats.snapshot()
+    breaker = get_circuit_breaker().counters
+    return (", ".join(f"{ERROR_KIND_LABELS[kind]}: 再試行{stats['retries'][kind]}件/断念{stats['gave_up'][kind]}件"
+                      for kind in (PERMANENT, RATE_LIMIT, TRANSIENT))
+            + f", 再試行の待機: {stats['waited_seconds']:.0f}秒, ブレーカー作動: {breaker['trips']}回"
+            f" (停止 {breaker['paused_seconds']:.0f}秒, 中止 {breaker['rejected']}件)")
+
+# 楽天API検索の転送量・解析時間の統計（全スレッドで共有）
+_search_stats = {"requests": 0, "bytes": 0, "wire_bytes": 0, "parse_seconds": 0.0, "items": 0,
+                 "cached_jan_codes": 0, "cache_bytes": 0}
+_search_stats_lock = threading.Lock()
+
+# 楽天API検索の統計を加算
+def add_search_stats(**values):
+    with _search_stats_lock:
+        for key, value in values.items():
+            _search_stats[key] += value
+
+# 楽天API検索の統計を整形
+def format_search_stats():
+    """1JANあたりの受信バイト数・解析時間・キャッシュ保存サイズを文字列で返す"""
+    with _search_stats_lock:
+        stats = dict(_search_stats)
+    requests_count = max(stats["requests"], 1)
+    cached_count = max(stats["cached_jan_codes"], 1)
+    return (f"リクエスト: {stats['requests']}件, 受信: {stats['bytes']}バイト "
+            f"(平均 {stats['bytes'] / requests_count:.0f}バイト/JAN"
+            + (f", 転送時 {stats['wire_bytes'] / requests_count:.0f}バイト/JAN" if stats["wire_bytes"] else "")
+            + f"), 解析: {stats['parse_seconds'] * 1000:.1f}ms (平均 {stats['parse_seconds'] * 1000 / requests_count:.2f}ms/JAN), "
+            f"商品: {stats['items']}件, キャッシュ保存: 平均 {stats['cache_bytes'] / cached_count:.0f}バイト/JAN")
+
+# 楽天APIのエラー名に対応するHTTPステータスコード（エラーの分類に使う）
+RAKUTEN_ERROR_STATUS = {
+    "wrong_parameter": 400,
+    "not_found": 404,
+    "too_many_requests": 429,
+    "system_error": 500,
+    "service_unavailable": 503,
+}
 
 # 楽天APIの設定を取得
 def get_rakuten_api_settings():
@@ -270,18 +608,23 @@ def get_rakuten_api_settings():
 # JANコードで商品を検索（キャッシュ & リトライ機能付き）
 @retry_with_backoff(max_tries=3)
 def search_product_by_jan_code(jan_code, use_cache=True):
-    """楽天APIで商品を検索する関数（キャッシュ機能付き）"""
-    global _api_cache
-    
-    cache_key = f"jan_{jan_code}"
-    current_time = time.time()
+    """楽天APIで商品を検索し、検索結果の商品をSearchItemのリストで返す（キャッシュ機能付き）"""
+    match_caption = CONFIG["api_match_caption"]
+    caption_classifier = get_used_item_classifier() if CONFIG["used_item_check_caption"] else None
+    # 説明文の判定結果はキャッシュに含まれるため、判定の設定ごとにキーを分ける
+    cache_variant = ("c" if match_caption else "n") + (f"u{caption_classifier.signature}" if caption_classifier else "")
+    cache_key = f"items_{cache_variant}_{jan_code}"
+    cache = get_api_cache() if use_cache else None
+    search_jan_code = str(jan_code) if match_caption else None  # 説明文との照合は指定されたままのJANコードで行う
     
-    # キャッシュチェック
-    if use_cache and cache_key in _api_cache:
-        cache_entry = _api_cache[cache_key]
-        if current_time - cache_entry["timestamp"] < CONFIG["api_cache_lifetime"]:
-            log_message("楽天API検索", f"JANコード: {jan_code}", "キャッシュ利用", "キャッシュからデータを返します")
-            return cache_entry["data"]
+    # キャッシュチェック（軽量なリスト形式で保存している）
+    if cache is not None:
+        cached_items = cache.get(cache_key)
+        if cached_items is not None:
+            get_run_metrics().inc("api_cache_hits")
+            log_message("楽天API検索", f"JANコード: {jan_code}", "キャッシュ利用", "キャッシュからデータを返します", level=DEBUG)
+            return [SearchItem.from_list(values) for values in cached_items]
+        get_run_metrics().inc("api_cache_misses")
     
     try:
         settings = get_rakuten_api_settings()
@@ -289,18 +632,18 @@ def search_product_by_jan_code(jan_code, use_cache=True):
         affiliate_id = settings["affiliate_id"]
         
         if not app_id:
-            raise ValueError("RAKUTEN_APP_ID環境変数が設定されていません")
+            raise PermanentError("RAKUTEN_APP_ID環境変数が設定されていません")
             
         if not jan_code:
-            raise ValueError("JANコードが指定されていません")
+            raise PermanentError("JANコードが指定されていません")
             
         # JANコードの形式確認（数字のみ、8桁または13桁）
         jan_code = str(jan_code).replace("-", "").strip()
         if not (len(jan_code) == 8 or len(jan_code) == 13):
-            raise ValueError(f"無効なJANコード形式です: {jan_code}")
+            raise PermanentError(f"無効なJANコード形式です: {jan_code}")
             
         # 楽天商品検索APIのURL構築
-        base_url = "https://app.rakuten.co.jp/services/api/IchibaItem/Search/20170706"
+        base_url = RAKUTEN_SEARCH_API_URL
         params = {
             "applicationId": app_id,
             "affiliateId": affiliate_id,
@@ -308,7 +651,9 @@ def search_product_by_jan_code(jan_code, use_cache=True):
             "hits": 30,
             "sort": "+itemPrice",
             "availability": 1,
-            "format": "json"
+            "format": "json",
+            "formatVersion": 2,  # 商品ごとの {"Item": ...} の入れ子をなくす
+            "elements": ",".join(SEARCH_ELEMENTS + ([CAPTION_ELEMENT] if match_caption or caption_classifier else []))  # 必要な項目のみ返却させる
         }
         
         # URLパラメータ構築
@@ -316,118 +661,142 @@ def search_product_by_jan_code(jan_code, use_cache=True):
         query_string = "&".join([f"{key}={urllib.parse.quote(str(value))}" for key, value in params.items()])
         request_url = f"{base_url}?{query_string}"
         
-        # APIリクエスト実行
-        response = requests.get(request_url, timeout=15)
+        # 障害が続いていれば待機（または中止）し、レート制限に従ってAPIリクエスト実行
+        breaker = get_circuit_breaker()
+        breaker.before_call()
+        get_rate_limiter().acquire()
+        metrics = get_run_metrics()
+        request_start = time.perf_counter()
+        response = http_client.get(request_url, timeout=15)
+        metrics.observe("api_latency_seconds", time.perf_counter() - request_start)
+        metrics.inc("api_responses", status=response.status_code)
         
-        # レスポンスステータスの確認
+        # レスポンスステータスの確認（429はレート制限、5xxは一時的な障害、その他は再試行しない）
         if response.status_code != 200:
-            raise ValueError(f"API応答エラー：ステータスコード {response.status_code}")
+            raise error_for_response(response.status_code, response.headers)
+        breaker.record_success()
             
-        # レスポンスをJSONに変換
-        result = response.json()
+        # レスポンスを解析して軽量なレコードに変換（生のdictは保持しない）
+        body = response.content
+        metrics.observe("api_response_bytes", len(body))
+        parse_start = time.perf_counter()
+        result, items = parse_search_response(body, search_jan_code, caption_classifier)
+        add_search_stats(
+            requests=1, bytes=len(body), items=len(items),
+            wire_bytes=int(response.headers.get("Content-Length") or 0),
+            parse_seconds=time.perf_counter() - parse_start
+        )
         
         # エラーレスポンスのチェック
         if "error" in result:
             error_msg = f"楽天API エラー: {result['error']}: {result.get('error_description', '')}"
-            raise ValueError(error_msg)
+            raise error_for_response(RAKUTEN_ERROR_STATUS.get(result["error"], 400), message=error_msg)
         
         # 実行ログに記録
         log_message("楽天API検索", f"JANコード: {jan_code}", "成功", 
-                    f"検索結果: {result.get('count', 0)}件")
+                    f"検索結果: {result.get('count', 0)}件", level=DEBUG)
         
         # 成功した結果をキャッシュに保存
-        if use_cache and result and "Items" in result:
-            _api_cache[cache_key] = {
-                "data": result,
-                "timestamp": current_time
-            }
-            
-            # キャッシュサイズ管理
-            if len(_api_cache) > 100:  # 100件を超えたら古いものを削除
-                oldest_key = min(_api_cache.items(), key=lambda x: x[1]["timestamp"])[0]
-                del _api_cache[oldest_key]
+        if cache is not None and result["has_items"]:
+            stored_bytes = cache.set(cache_key, [item.to_list() for item in items])
+            add_search_stats(cached_jan_codes=1, cache_bytes=stored_bytes)
         
-        return result
+        return items
         
+    except CircuitOpenError:
+        raise  # 中止済みのため個別のログは残さない
     except Exception as e:
-        # エラーが発生した場合は実行ログに記録
+        # エラーが発生した場合は実行ログに記録し、障害によるものはサーキットブレーカーに数える
         log_message("楽天API検索", f"JANコード: {jan_code}", "失敗", str(e))
+        _, counts_as_failure = classify_error(e)
+        if counts_as_failure:
+            get_circuit_breaker().record_failure(getattr(e, "retry_after", None))
         raise  # リトライデコレータがキャッチする
         
+# 中古品などを判定する判定器を取得
+def get_used_item_classifier():
+    """設定されたキーワードから作成した判定器を返す（キーワードが同じ間は作成済みのものを使う）"""
+    return compile_classifier(tuple(CONFIG["used_item_keywords"]))
+
 # 新品商品のみをフィルタリングする
 def filter_new_items(items):
     """商品リストから新品商品のみをフィルタリング"""
-    # 明確に「中古」を表すキーワード
-    used_keywords = ["中古", "used", "ユーズド", "中古品", "USED"]
+    classifier = get_used_item_classifier()
     
-    # フィルタリング処理
+    # フィルタリング処理（説明文の判定結果は解析時に求めたもの）
     new_items = []
     for item in items:
-        if not item.get("itemName"):
+        if not item.item_name:
             continue
             
-        item_name = item["itemName"].lower()
-        if not any(keyword.lower() in item_name for keyword in used_keywords):
+        if not item.used_in_caption and not classifier.matches(item.item_name):
             new_items.append(item)
     
     log_message("新品フィルタ", "システム", "情報", 
-                f"全{len(items)}件中、{len(new_items)}件の新品商品を抽出しました")
+                f"全{len(items)}件中、{len(new_items)}件の新品商品を抽出しました", level=DEBUG)
     
     return new_items
 
+# 候補のスコアリングを取得
+_candidate_scorer = None
+
+def get_candidate_scorer():
+    """設定された販売店の指定で作成したスコアリングを返す（初回のみ作成）"""
+    global _candidate_scorer
+    if _candidate_scorer is None:
+        _candidate_scorer = CandidateScorer({
+            "shop_blacklist": CONFIG["candidate_shop_blacklist"],
+            "shop_whitelist": CONFIG["candidate_shop_whitelist"],
+        })
+    return _candidate_scorer
+
 # 検索結果から最適な商品を選択する
-def select_best_product(search_result, jan_code):
-    """検索結果から最適な（最安値新品）商品を選択"""
+def select_best_product(items, jan_code, context=None):
+    """検索結果（SearchItemのリスト）から最適な（最安値新品）商品を選択
+    
+    contextはJANごとの基準（商品リストの商品名・過去の価格）。省略した場合はJANコードの一致と価格のみで選ぶ。
+    """
     try:
         # 検索結果がない場合はNoneを返す
-        if not search_result or "Items" not in search_result or not search_result["Items"]:
+        if not items:
             log_message("商品選択", "なし", "失敗", "検索結果が0件です")
             return None
-            
-        # 商品リストを取得
-        items = [item["Item"] for item in search_result["Items"]]
         
         # 新品商品のみをフィルタリング
         new_items = filter_new_items(items)
         
         # 新品がない場合はNoneを返す
         if not new_items:
-            log_message("商品選択", "なし", "注意", "新品商品が見つからないため、スキップします")
+            log_message("商品選択", "なし", "注意", "新品商品が見つからないため、スキップします", level=DEBUG)
             return None
             
         # 価格の安い順にソートして最安値商品を選択
         valid_items = [item for item in new_items 
-                      if "itemPrice" in item and item["itemPrice"] and int(item["itemPrice"]) > 0]
+                      if item.item_price and int(item.item_price) > 0]
         
         if not valid_items:
             log_message("商品選択", "なし", "警告", "有効な価格の新品商品がありません")
             return None
             
-        # JANコードが商品名や説明文に含まれる商品を優先して選択
-        jan_matched_items = []
-        for item in valid_items:
-            item_name = item.get("itemName", "").lower()
-            item_caption = item.get("itemCaption", "").lower()
-            if str(jan_code).lower() in item_name or str(jan_code).lower() in item_caption:
-                jan_matched_items.append(item)
-        
-        # JANコードに一致する商品があればその中から最安値、なければ元の最安値商品を選択
-        items_to_sort = jan_matched_items if jan_matched_items else valid_items
-            
-        # 価格の安い順にソート
-        items_to_sort.sort(key=lambda x: int(x["itemPrice"]))
+        # JANコードの一致・商品名の類似度・販売店で採点し、最高スコア付近の候補から最安値を選択
+        # （説明文のJANコードは解析時に照合済み。価格の外れ値・除外する販売店の候補は対象外）
+        context = context or CandidateContext(jan_code)
+        selected_item, score, rejected = get_candidate_scorer().select(valid_items, context)
         
-        # 最安値の商品を選択
-        selected_item = items_to_sort[0]
+        if rejected["shop_blacklist"] or rejected["price_outlier"]:
+            log_message("商品選択", jan_code, "情報", 
+                       f"除外: 販売店 {rejected['shop_blacklist']}件, "
+                       f"価格の外れ値 {rejected['price_outlier']}件 (基準価格: {context.reference_price:.0f}円)", level=DEBUG)
         
         # 選択された商品の情報をログに記録
         if selected_item:
-            log_message("商品選択", selected_item.get("itemCode", "なし"), "成功", 
-                      f"新品商品を選択: {selected_item.get('itemName', '名称不明')}, "
-                      f"価格: {selected_item.get('itemPrice', '0')}円, "
-                      f"販売店: {selected_item.get('shopName', '不明')}")
+            log_message("商品選択", selected_item.item_code or "なし", "成功", 
+                      f"新品商品を選択: {selected_item.item_name or '名称不明'}, "
+                      f"価格: {selected_item.item_price or '0'}円, "
+                      f"販売店: {selected_item.shop_name or '不明'}, "
+                      f"スコア: {score:.2f}", level=DEBUG)
         else:
-            log_message("商品選択", "なし", "注意", "条件に合う商品が見つかりませんでした")
+            log_message("商品選択", "なし", "注意", "条件に合う商品が見つかりませんでした", level=DEBUG)
             
         return selected_item
         
@@ -446,43 +815,42 @@ def create_empty_product_info(jan_code):
         "availability": "不明",
         "item_url": "",
         "affiliate_url": "",
-        "image_url": "",
         "is_new_item": False
     }
 
 # 商品情報を整形
 def create_product_info(jan_code, selected_product):
     """商品情報を整形"""
+    item_url = selected_product.item_url if selected_product.item_url is not None else ""
     return {
         "jan_code": str(jan_code),
-        "item_name": selected_product.get("itemName", "商品名なし"),
-        "item_price": int(selected_product.get("itemPrice", 0)),
-        "shop_name": selected_product.get("shopName", "販売店不明"),
-        "availability": "在庫あり" if selected_product.get("availability") == 1 else "在庫なし",
-        "item_url": selected_product.get("itemUrl", ""),
-        "affiliate_url": selected_product.get("affiliateUrl", "") or selected_product.get("itemUrl", ""),
-        "image_url": (selected_product.get("mediumImageUrls", [{}])[0].get("imageUrl", "") 
-                    if selected_product.get("mediumImageUrls") else ""),
+        "item_name": selected_product.item_name if selected_product.item_name is not None else "商品名なし",
+        "item_price": int(selected_product.item_price or 0),
+        "shop_name": selected_product.shop_name if selected_product.shop_name is not None else "販売店不明",
+        "availability": "在庫あり" if selected_product.availability == 1 else "在庫なし",
+        "item_url": item_url,
+        "affiliate_url": selected_product.affiliate_url or item_url,
         "is_new_item": True
     }
 
 # JANコードから商品情報を取得する
-def get_product_info_by_jan_code(jan_code):
-    """JANコードをもとに商品情報を取得"""
+def get_product_info_by_jan_code(jan_code, context=None):
+    """JANコードをもとに商品情報を取得（contextは候補の選択の基準）"""
     try:
         # JANコードで商品を検索
-        search_result = search_product_by_jan_code(jan_code)
+        search_items = search_product_by_jan_code(jan_code)
         
         # 基本的なエラーチェック
-        if not search_result or "Items" not in search_result or len(search_result["Items"]) == 0:
+        if not search_items:
             return create_empty_product_info(jan_code)
             
-        # 検索結果から新品商品を選択
-        selected_product = select_best_product(search_result, jan_code)
+        # 検索結果から新品商品を選択（各スレッドの所要時間を合計する）
+        with get_run_metrics().stage("select"):
+            selected_product = select_best_product(search_items, jan_code, context)
         
         if not selected_product:
             # 新品商品が見つからない場合は「新品なし」状態を返す
-            log_message("商品選択", jan_code, "情報", "新品商品がないため、在庫なし状態を返します")
+            log_message("商品選択", jan_code, "情報", "新品商品がないため、在庫なし状態を返します", level=DEBUG)
             return {
                 "jan_code": str(jan_code),
                 "item_name": f"{jan_code}（新品なし）",
@@ -491,7 +859,6 @@ def get_product_info_by_jan_code(jan_code):
                 "availability": "在庫なし",
                 "item_url": "",
                 "affiliate_url": "",
-                "image_url": "",
                 "is_new_item": False
             }
             
@@ -501,123 +868,255 @@ def get_product_info_by_jan_code(jan_code):
         log_message("商品情報取得", jan_code, "成功", 
                     f"新品商品: {product_info['item_name']}, "
                     f"価格: {product_info['item_price']}円, "
-                    f"在庫: {product_info['availability']}")
+                    f"在庫: {product_info['availability']}", level=DEBUG)
                     
         return product_info
         
+    except CircuitOpenError:
+        return None  # 障害が続いたため取得を中止した（呼び出し元でまとめて記録する）
     except Exception as e:
         log_message("商品情報取得", jan_code, "失敗", f"エラー: {str(e)}")
-        return create_empty_product_info(jan_code)
+        return dict(create_empty_product_info(jan_code), error=str(e))  # 検索結果が0件の場合と区別する
+
+# 複数のJANコードの商品情報を並列に取得する
+def iter_product_infos(jan_codes, max_workers=None, contexts=None, deadline=None):
+    """商品情報を最大max_workers件並列に取得し、入力と同じ順序で返すジェネレータ
+    
+    contextsは {JANコード: CandidateContext}（候補の選択の基準。なければJANコードの一致と価格のみで選ぶ）。
+    deadline（time.monotonic()の値）を過ぎた後のJANは取得せずにNoneを返す（取得中のものは完了を待つ）。
+    """
+    workers = max(1, int(max_workers or CONFIG["api_max_workers"]))
+    contexts = contexts or {}
+    jan_contexts = [contexts.get(jan_code) for jan_code in jan_codes]
+    
+    def expired():
+        return deadline is not None and time.monotonic() >= deadline
+    
+    # 逐次実行（1並列）の場合はスレッドを使わない
+    if workers == 1 or len(jan_codes) <= 1:
+        for jan_code, context in zip(jan_codes, jan_contexts):
+            yield None if expired() else get_product_info_by_jan_code(jan_code, context)
+        return
+    
+    # リクエスト間隔は共有トークンバケットで制御されるため、ここでは同時実行数のみ制限する
+    # （期限を過ぎたら新たに投入しないよう、先行して投入するのは並列数の2倍まで）
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rakuten-api") as executor:
+        futures = collections.deque()
+        for jan_code, context in zip(jan_codes, jan_contexts):
+            futures.append(None if expired() else executor.submit(get_product_info_by_jan_code, jan_code, context))
+            if len(futures) >= workers * 2:
+                future = futures.popleft()
+                yield None if future is None else future.result()
+        while futures:
+            future = futures.popleft()
+            yield None if future is None else future.result()
+
+# 前回取得できなかったJANコードを読み込む
+def load_deferred_jan_codes():
+    """前回の実行で時間切れなどにより取得できなかったJANコードを返す（なければ空）"""
+    try:
+        with open(CONFIG["deferred_path"], "r", encoding="utf-8") as f:
+            return list(json.load(f).get("jan_codes", []))
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        log_message("取得順", "システム", "警告", f"{CONFIG['deferred_path']}を読み込めません: {str(e)}")
+        return []
+
+# 取得できなかったJANコードを保存
+def save_deferred_jan_codes(jan_codes):
+    """次回優先して取得するJANコードを保存する（なければファイルを削除する）"""
+    path = CONFIG["deferred_path"]
+    try:
+        if not jan_codes:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "deferred_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "jan_codes": list(jan_codes)
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+    except Exception as e:
+        log_message("取得順", "システム", "保存エラー", str(e))
+
+# 取得順の優先度を計算
+def build_fetch_priorities(records, jan_codes, scheduler, deferred_jan_codes):
+    """過去の最安値への近さ・変動頻度・前回チェックからの経過時間・通知回数・前回の未取得から優先度を求める"""
+    from price_series import PriceSeriesStore
+    jan_set = set(jan_codes)
+    low_prices = {}
+    try:
+        start = time.time() - PRIORITY_CONFIG["low_window_days"] * 86400
+        summary = PriceSeriesStore(CONFIG["price_series_dir"]).summarize(start=start, jan_codes=list(jan_set))
+        low_prices = dict(zip(summary["jan_code"], summary["min_price"].astype(float)))
+    except Exception as e:
+        log_message("取得順", "システム", "警告", f"価格時系列を読み込めないため最安値を考慮しません: {str(e)}")
+    
+    history = get_notification_history_service().entries
+    entries = scheduler.entries if scheduler is not None else {}
+    deferred = set(deferred_jan_codes)
+    now = time.time()
+    scores = {}
+    for record in records:
+        if record.jan_code in jan_set and record.jan_code not in scores:
+            components = priority_components(
+                record.last_price, low_prices.get(record.jan_code), entries.get(record.jan_code),
+                len((history.get(record.jan_code) or {}).get("previous_prices", [])),
+                record.jan_code in deferred, now
+            )
+            scores[record.jan_code] = priority_score(components)
+    return scores
+
+# 候補の選択の基準を作成
+def build_candidate_contexts(records, jan_codes):
+    """取得対象のJANごとに、商品リストの基準の商品名（語の集合）と基準価格を事前に求める
+    
+    商品名はreference_name列（選択した出品の商品名で上書きしないため、誤った選択が基準に残り続けない）。
+    基準価格は価格時系列の直近の中央値（サンプルがなければ商品リストの前回価格）。
+    """
+    from price_series import PriceSeriesStore
+    jan_set = set(jan_codes)
+    history_prices = {}
+    try:
+        start = time.time() - CONFIG["candidate_history_days"] * 86400
+        history_prices = PriceSeriesStore(CONFIG["price_series_dir"]).reference_prices(list(jan_set), start=start)
+    except Exception as e:
+        log_message("商品選択", "システム", "警告", f"価格時系列を読み込めないため前回価格を基準にします: {str(e)}")
+    
+    contexts = {}
+    for record in records:
+        if record.jan_code in jan_set and record.jan_code not in contexts:
+            contexts[record.jan_code] = CandidateContext(
+                record.jan_code, record.reference_name, history_prices.get(record.jan_code, record.last_price)
+            )
+    
+    log_message("商品選択", "システム", "情報", 
+               f"{len(contexts)}件の選択基準を作成しました "
+               f"(商品名あり: {sum(1 for context in contexts.values() if context.reference_tokens)}件, "
+               f"価格時系列あり: {sum(1 for jan_code in contexts if jan_code in history_prices)}件)")
+    return contexts
 
 # ======= 通知フィルタリング =======
             
+# 通知フィルタの除外理由（判定順）
+NOTIFICATION_FILTER_RULES = {
+    "min_percentage": "変動率が小さい",
+    "min_amount": "変動額が小さい",
+    "out_of_stock": "在庫なし",
+    "notification_interval": "前回通知からの間隔不足",
+    "last_notified_price": "前回通知時価格からの変動が小さい",
+    "not_in_product_list": "商品リストにない",
+    "not_price_drop_or_restock": "値下がり・再入荷ではない",
+}
+
 # 通知すべき商品をフィルタリング
-def filter_notifiable_products(changed_products, product_df, threshold=5):
-    """価格変動が閾値を超えた商品の中から通知すべきものをフィルタリング"""
-    notifiable = []
-    notification_history = get_notification_history()
-    current_time = datetime.now()
+def filter_notifiable_products(changed_products, product_store, threshold=5):
+    """価格変動が閾値を超えた商品の中から通知すべきものをフィルタリング
     
-    for product in changed_products:
-        jan_code = str(product["jan_code"])
-        
-        # ステップ1: 最小変動チェック
-        if abs(product["price_change_rate"]) < CONFIG["min_price_change_percentage"]:
-            log_message("通知フィルタ", jan_code, "スキップ", 
-                      f"変動率が小さすぎます: {product['price_change_rate']:.2f}%")
-            continue
-            
-        # ステップ2: 絶対額チェック
-        price_change_amount = abs(product["current_price"] - product["previous_price"])
-        if price_change_amount < CONFIG["min_price_change_amount"]:
-            log_message("通知フィルタ", jan_code, "スキップ", 
-                      f"価格変動額が小さすぎます: {price_change_amount}円")
-            continue
-        
-        # ステップ3: 在庫チェック
-        has_stock = product["current_availability"] == "在庫あり"
-        if not has_stock:
-            log_message("通知フィルタ", jan_code, "スキップ", "在庫がないため通知しません")
-            continue
-        
-        # ステップ4: 通知履歴チェック
-        if jan_code in notification_history:
-            try:
-                history = notification_history[jan_code]
-                
-                # 前回通知からの時間経過チェック
-                last_time = datetime.strptime(history["last_notified_time"], "%Y-%m-%d %H:%M:%S")
-                hours_since_last = (current_time - last_time).total_seconds() / 3600
-                
-                if hours_since_last < CONFIG["min_notification_interval_hours"]:
-                    log_message("通知フィルタ", jan_code, "スキップ", 
-                              f"前回通知から{hours_since_last:.1f}時間しか経過していません（最低{CONFIG['min_notification_interval_hours']}時間必要）")
-                    continue
-                    
-                # 前回通知時の価格との比較
-                last_price = history["price"]
-                price_diff_percent = abs((product["current_price"] - last_price) / last_price * 100) if last_price > 0 else 100
-                
-                if price_diff_percent < threshold:
-                    log_message("通知フィルタ", jan_code, "スキップ", 
-                              f"前回通知時価格({last_price}円)から変動が小さいため通知しません({price_diff_percent:.2f}%)")
-                    continue
-            except Exception as e:
-                log_message("通知フィルタ", jan_code, "警告", f"履歴解析エラー: {str(e)}")
-        
-        # 商品リストから該当商品の行を取得（データフレームへの登録チェック用）
-        product_row = product_df[product_df["jan_code"].astype(str) == jan_code]
-        
-        if product_row.empty:
-            log_message("通知フィルタ", jan_code, "警告", "商品リストに該当商品が見つかりません")
-            continue
-            
-        # 価格下落の判定（変動率が負の値かつ閾値以上）
-        price_reduced = (product["price_change_rate"] < 0 and 
-                        abs(product["price_change_rate"]) >= threshold)
-        
-        # 在庫が復活した場合の判定
-        stock_restored = (product["previous_availability"] == "在庫なし" and 
-                         product["current_availability"] == "在庫あり")
-
-        # 条件に合致し、かつ在庫があり、大きな価格変動がある場合に通知対象とする
-        if (price_reduced or stock_restored) and has_stock:
-            notifiable.append(product)
-            log_message("通知フィルタ", jan_code, "通知対象", 
-                      f"価格: {product['current_price']}円, 変動率: {product['price_change_rate']:.2f}%, 在庫: {product['current_availability']}")
-           
-    return notifiable
+    変動商品の列と通知履歴を配列として結合し、各条件を真偽値マスクで一括判定する。
+    戻り値は (通知対象商品のリスト, 除外理由ごとの件数)。各商品は最初に満たさなかった条件で数える。
+    """
+    import numpy as np
+    rejections = dict.fromkeys(NOTIFICATION_FILTER_RULES, 0)
+    if not changed_products:
+        return [], rejections
+    
+    notification_history = get_notification_history_service()
+    current_time = time.time()
+    
+    # 変動商品の列
+    jan_codes = [str(product["jan_code"]) for product in changed_products]
+    change_rates = np.array([product["price_change_rate"] for product in changed_products], dtype=float)
+    current_prices = np.array([product["current_price"] for product in changed_products], dtype=float)
+    previous_prices = np.array([product["previous_price"] for product in changed_products], dtype=float)
+    current_availability = np.array([product["current_availability"] for product in changed_products], dtype=object)
+    previous_availability = np.array([product["previous_availability"] for product in changed_products], dtype=object)
+    
+    # 通知履歴との結合（解析できない時刻・価格はNaNとし、その判定は行わない）
+    in_history = np.array([jan_code in notification_history for jan_code in jan_codes], dtype=bool)
+    notified_epochs = np.array([
+        notification_history.notified_epoch(jan_code) if has_history else None
+        for jan_code, has_history in zip(jan_codes, in_history)
+    ], dtype=float)
+    last_prices = []
+    for jan_code, has_history in zip(jan_codes, in_history):
+        entry = notification_history.get(jan_code) if has_history else None
+        price = entry.get("price") if isinstance(entry, dict) else None
+        last_prices.append(price if isinstance(price, (int, float)) else None)
+    last_prices = np.array(last_prices, dtype=float)
+    
+    history_time_error = in_history & np.isnan(notified_epochs)
+    history_price_error = in_history & ~history_time_error & np.isnan(last_prices)
+    hours_since_last = (current_time - notified_epochs) / 3600
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_diff_percent = np.where(
+            last_prices > 0, np.abs((current_prices - last_prices) / last_prices * 100), 100.0)
+    
+    has_stock = current_availability == "在庫あり"
+    in_product_list = np.array([jan_code in product_store for jan_code in jan_codes], dtype=bool)
+    price_reduced = (change_rates < 0) & (np.abs(change_rates) >= threshold)
+    stock_restored = (previous_availability == "在庫なし") & has_stock
+    
+    # 判定順に並べた各条件の不合格マスク
+    history_checked = in_history & ~history_time_error
+    rule_failures = {
+        "min_percentage": np.abs(change_rates) < CONFIG["min_price_change_percentage"],
+        "min_amount": np.abs(current_prices - previous_prices) < CONFIG["min_price_change_amount"],
+        "out_of_stock": ~has_stock,
+        "notification_interval": history_checked & (hours_since_last < CONFIG["min_notification_interval_hours"]),
+        "last_notified_price": history_checked & ~history_price_error & (price_diff_percent < threshold),
+        "not_in_product_list": ~in_product_list,
+        "not_price_drop_or_restock": ~(price_reduced | stock_restored),
+    }
+    
+    remaining = np.ones(len(changed_products), dtype=bool)
+    for rule, failed in rule_failures.items():
+        # 履歴を解析できなかった商品は従来どおり警告のうえ該当する履歴の判定を行わない
+        history_error = {"notification_interval": history_time_error, "last_notified_price": history_price_error}.get(rule)
+        if history_error is not None:
+            for index in np.flatnonzero(remaining & history_error):
+                log_message("通知フィルタ", jan_codes[index], "警告", "履歴解析エラー: 前回通知の時刻または価格を解析できません")
+        if rule == "not_in_product_list":
+            for index in np.flatnonzero(remaining & failed):
+                log_message("通知フィルタ", jan_codes[index], "警告", "商品リストに該当商品が見つかりません")
+        rejected = remaining & failed
+        rejections[rule] = int(rejected.sum())
+        remaining &= ~rejected
+    
+    notifiable = [changed_products[index] for index in np.flatnonzero(remaining)]
+    for product in notifiable:
+        log_message("通知フィルタ", str(product["jan_code"]), "通知対象", 
+                  f"価格: {product['current_price']}円, 変動率: {product['price_change_rate']:.2f}%, 在庫: {product['current_availability']}")
+    
+    rejection_summary = ", ".join(
+        f"{NOTIFICATION_FILTER_RULES[rule]} {count}件" for rule, count in rejections.items() if count)
+    log_message("通知フィルタ", "システム", "集計", 
+               f"候補{len(changed_products)}件中{len(notifiable)}件が通知対象"
+               + (f"（除外: {rejection_summary}）" if rejection_summary else ""))
+    return notifiable, rejections
 
 # ======= 投稿処理 =======
 
-# 投稿スクリプトを実行する関数
-def run_posting_scripts():
-    """通知対象商品をSNSに投稿するスクリプトを実行"""
+# 通知対象商品をSNSに投稿する関数
+def post_notifiable_products(products, on_result=None, exclude=None):
+    """設定されている投稿先に同じプロセス内で投稿し、商品ごとの投稿結果（PostResult）のリストを返す
+
+    on_result・excludeはposting.run_postersにそのまま渡す（1件ごとの記録・再開時に投稿済みの商品の除外）。
+    """
     try:
-        log_message("投稿実行", "システム", "開始", "投稿スクリプトを実行します")
-        
-        # スレッズに投稿
-        if os.path.exists("threads_poster.py"):
-            log_message("投稿実行", "Threads", "開始", "スレッズへの投稿を開始します")
-            try:
-                subprocess.run(["python", "threads_poster.py"], check=True)
-                log_message("投稿実行", "Threads", "完了", "スレッズへの投稿が完了しました")
-            except subprocess.CalledProcessError as e:
-                log_message("投稿実行", "Threads", "失敗", f"エラー: {str(e)}")
-        
-        # Twitterに投稿 (環境変数のチェック)
-        if os.path.exists("twitter_poster.py") and "TWITTER_API_KEY" in os.environ:
-            log_message("投稿実行", "Twitter", "開始", "Twitterへの投稿を開始します")
-            try:
-                subprocess.run(["python", "twitter_poster.py"], check=True)
-                log_message("投稿実行", "Twitter", "完了", "Twitterへの投稿が完了しました")
-            except subprocess.CalledProcessError as e:
-                log_message("投稿実行", "Twitter", "失敗", f"エラー: {str(e)}")
-        
-        log_message("投稿実行", "システム", "完了", "投稿スクリプトの実行が完了しました")
+        posters = create_posters()
+        log_message("投稿実行", "システム", "開始", f"{', '.join(poster.label for poster in posters)}に投稿します")
+        results = run_posters(products, posters, on_result, exclude)
+        succeeded = sum(1 for result in results if result.success)
+        log_message("投稿実行", "システム", "完了", f"投稿が完了しました（成功 {succeeded}件 / {len(results)}件）")
+        return results
         
     except Exception as e:
         log_message("投稿実行", "システム", "失敗", f"エラー: {str(e)}")
+        return []
 
 # ======= メイン処理 =======
 
@@ -625,25 +1124,12 @@ def run_posting_scripts():
 def is_recently_notified(jan_code, current_price, hours=24):
    """直近の指定時間内に同じJANコードで同じ価格の通知があるか確認"""
    try:
-       notification_history = get_notification_history()
-       if jan_code not in notification_history:
-           return False
-           
-       # 履歴エントリを取得
-       history = notification_history[jan_code]
-       last_notified_time = datetime.strptime(history["last_notified_time"], "%Y-%m-%d %H:%M:%S")
-       last_price = history["price"]
-       
-       # 時間チェック
-       time_diff = (datetime.now() - last_notified_time).total_seconds() / 3600
-       if time_diff < hours:
-           # 価格チェック
-           if abs(current_price - last_price) < 10:  # 10円未満の差は同一価格とみなす
-               log_message("重複チェック", jan_code, "検出", 
-                         f"{time_diff:.1f}時間前に同価格で通知済み: {last_price}円")
-               return True
-               
-       return False
+       recently, time_diff, last_price = get_notification_history_service().is_recently_notified(
+           jan_code, current_price, hours)
+       if recently:
+           log_message("重複チェック", jan_code, "検出", 
+                     f"{time_diff:.1f}時間前に同価格で通知済み: {last_price}円")
+       return recently
        
    except Exception as e:
        log_message("重複チェック", jan_code, "エラー", f"エラー詳細: {str(e)}")
@@ -690,130 +1176,251 @@ def remove_duplicate_jan_codes():
        # エラーが発生した場合は元のDataFrameを返す
        return load_product_list()
 
-# 監視対象商品の変動を監視するメイン関数
-def monitor_products():
-   """商品の価格変動を監視し、通知すべき商品を検出する"""
-   try:
-       # 商品リストを読み込む
-       product_df = load_product_list()
-       
-       if len(product_df) == 0:
-           log_message("メイン処理", "システム", "警告", "商品リストが空です")
-           return []
+# 監視対象商品の最新情報を取得して変動を検出する
+def collect_product_changes(product_store, max_workers=None, full_sweep=False, shard=None, journal=None, deadline=None):
+   """監視対象商品を取得・比較し、更新後の商品リストと変動商品を返す（対象がなければNone）
+   
+   journal（RunJournal）を渡すと取得結果を1件ずつ記録する。再開できる記録がある場合は前回の取得対象を引き継ぎ、
+   記録済みの取得結果は取得し直さずにそのまま反映する。
+   deadline（time.monotonic()の値）を指定すると優先度の高い順に取得し、期限を過ぎたら残りを次回に回す。
+   """
+   from product_store import OfferRecord
+   if len(product_store) == 0:
+       log_message("メイン処理", "システム", "警告", "商品リストが空です")
+       return None
+   
+   # 監視対象の商品のみを抽出（行ごとのSeriesを作らない軽量レコードで扱う）
+   active_products = [record for record in product_store.records() if record.monitor_flag]
+   
+   # シャード実行の場合は担当分のみを抽出
+   if shard is not None:
+       shard_index, shard_count = shard
+       active_products = [
+           record for record in active_products if shard_of(record.jan_code, shard_count) == shard_index
+       ]
+       log_message("シャード", f"{shard_index}/{shard_count}", "情報", f"{len(active_products)}件の商品を担当します")
+   
+   if len(active_products) == 0:
+       log_message("メイン処理", "システム", "警告", "監視対象の商品がありません")
+       return None
        
-       # 監視対象の商品のみを抽出
-       active_products = product_df[product_df["monitor_flag"] == True]
+   workers = max(1, int(max_workers or CONFIG["api_max_workers"]))
+   log_message("メイン処理", "システム", "開始", 
+              f"合計{len(active_products)}件の商品を監視します "
+              f"(並列数: {workers}, レート上限: {CONFIG['api_rate_limit']}件/秒)")
+   
+   changed_products = []
+   updated_jan_codes = []  # 商品情報を更新したJANコード
+   fetch_start_time = time.monotonic()
+   
+   # APIの取得は並列に行い、比較・更新は元の行順で逐次処理する
+   # （リクエスト間隔は共有トークンバケットで制御）
+   http_client.get_session(RAKUTEN_SEARCH_API_URL, pool_maxsize=workers)  # 並列数分の接続を保持
+   jan_codes = [record.jan_code for record in active_products]
+   
+   resuming = journal is not None and journal.resumable
+   deferred_jan_codes = load_deferred_jan_codes() if shard is None else []
+   
+   # 適応型スケジュールで今回チェックが必要な商品のみに絞り込む
+   scheduler = None
+   if CONFIG["adaptive_polling"]:
+       scheduler = PollScheduler(CONFIG["poll_schedule_path"]).load()
+       scheduler.seed_from_history(get_notification_history_service().entries)
        
-       if len(active_products) == 0:
-           log_message("メイン処理", "システム", "警告", "監視対象の商品がありません")
-           return []
+       if not full_sweep and not resuming:
+           # 初回取得が必要な商品・前回取得できなかった商品は常にチェックする
+           first_fetch_jan_codes = {record.jan_code for record in active_products if record.needs_first_fetch}
+           due_jan_codes, _ = scheduler.select_due(jan_codes, force=first_fetch_jan_codes | set(deferred_jan_codes))
+           due_set = set(due_jan_codes)
+           jan_codes = [jan_code for jan_code in jan_codes if jan_code in due_set]
            
-       log_message("メイン処理", "システム", "開始", f"合計{len(active_products)}件の商品を監視します")
-       
-       threshold = CONFIG["price_change_threshold"]  # 通知する価格変動閾値
-       changed_products = []
-       products_updated = False  # 商品情報が更新されたかを追跡するフラグ
-       
-       # APIレート制限対策のため、処理間隔を設定
-       api_request_interval = 1  # 秒
-       
-       # すべての監視対象商品を処理
-       for index, row in active_products.iterrows():
-           jan_code = str(row["jan_code"]).strip()
+           schedule_summary = scheduler.summary()
+           log_message("スケジュール", "システム", "情報", 
+                      f"{schedule_summary['total']}件中{schedule_summary['due']}件をチェックします "
+                      f"(API呼び出し削減: {schedule_summary['skipped']}件, {schedule_summary['saved_percentage']:.1f}%)")
+   
+   # 中断した実行の再開: 前回の取得対象を引き継ぎ、記録済みの取得結果は取得し直さない
+   replayed_infos = {}
+   if resuming:
+       active_jan_codes = set(jan_codes)
+       jan_codes = [jan_code for jan_code in journal.jan_codes if jan_code in active_jan_codes]
+       replayed_infos = {jan_code: journal.results[jan_code] for jan_code in jan_codes if jan_code in journal.results}
+       log_message("再開", "システム", "情報", 
+                  f"前回の取得対象{len(jan_codes)}件のうち{len(replayed_infos)}件の取得結果を記録から復元し、"
+                  f"残り{len(jan_codes) - len(replayed_infos)}件を取得します")
+   elif journal is not None:
+       journal.start(jan_codes)
+   
+   pending_jan_codes = [jan_code for jan_code in jan_codes if jan_code not in replayed_infos]
+   contexts = build_candidate_contexts(active_products, pending_jan_codes)
+   
+   # 実行時間に上限がある場合は、期限内に取得できる分を価値の高い商品に充てる
+   if deadline is not None:
+       scores = build_fetch_priorities(active_products, pending_jan_codes, scheduler, deferred_jan_codes)
+       pending_jan_codes = order_by_priority(pending_jan_codes, scores)
+       log_message("取得順", "システム", "情報", 
+                  f"{len(pending_jan_codes)}件を優先度順に取得します（残り時間: {max(0.0, deadline - time.monotonic()):.0f}秒, "
+                  f"前回未取得: {sum(1 for jan_code in pending_jan_codes if jan_code in set(deferred_jan_codes))}件）")
+   
+   # 取得は優先度順に行い、結果は取得できたものから記録する
+   metrics = get_run_metrics()
+   fetched_infos = {}
+   with metrics.stage("fetch"):
+       for jan_code, product_info in zip(pending_jan_codes, iter_product_infos(pending_jan_codes, workers, contexts, deadline)):
+           fetched_infos[jan_code] = product_info
+           # 取得を終えた結果のみ記録する（エラー・中止したJANは再開時に取得し直す。検索結果が0件の場合は記録する）
+           if journal is not None and product_info is not None and not product_info.get("error"):
+               journal.record_result(jan_code, product_info)
+   update_start = time.perf_counter()
+   
+   # 取得結果を軽量なレコードとして集める（比較・更新は元の行順でまとめて行う）
+   offers = []
+   unfetched_jan_codes = []  # サーキットブレーカーによる中止・時間切れで取得しなかったJANコード
+   for jan_code in jan_codes:
+       product_info = replayed_infos.get(jan_code) or fetched_infos.get(jan_code)
+       if product_info is None:
+           unfetched_jan_codes.append(jan_code)
+           continue
+       if product_info["availability"] == "不明":
+           log_message("価格監視", jan_code, "失敗", "商品情報が取得できませんでした", level=DEBUG)
+           continue
+       offers.append(OfferRecord.from_product_info(jan_code, product_info))
+   
+   # 取得できた全商品の価格・在庫・販売店を時系列のサンプルとして保持
+   sampled_at = int(time.time())
+   price_samples = [(offer.jan_code, offer.item_price, offer.availability, offer.shop_name) for offer in offers]
+   
+   # 前回データとの比較と商品リストへの反映（初回取得の場合は変動なしとする）
+   changes = product_store.apply_fetch_results(offers)
+   timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+   first_fetch_count = 0
+   changed_count = 0
+   
+   for change in changes:
+       offer = change.offer
+       jan_code = offer.jan_code
+       try:
+           # 変動の有無を次回チェック時刻の計算に反映
+           if scheduler is not None:
+               scheduler.record_check(jan_code, change.price_changed, change.availability_changed)
            
-           try:
-               # 処理中であることをログに記録
-               product_name = str(row["product_name"]) if not pd.isna(row["product_name"]) else "未取得"
-               log_message("価格監視", jan_code, "処理中", f"商品名: {product_name}, 処理を開始します")
-               
-               # JANコードで最新の商品情報を取得
-               product_info = get_product_info_by_jan_code(jan_code)
-               
-               if not product_info or product_info["availability"] == "不明":
-                   log_message("価格監視", jan_code, "失敗", "商品情報が取得できませんでした")
-                   continue
-                   
-               # 前回データとの比較
-               current_price = product_info["item_price"]
-               previous_price = row["last_price"] if not pd.isna(row["last_price"]) else 0
-               current_availability = product_info["availability"]
-               previous_availability = row["last_availability"] if not pd.isna(row["last_availability"]) else "不明"
-               
-               # 初回の場合は変動なしとする
-               if previous_price == 0 or previous_availability == "不明":
-                   # 商品リストを更新
-                   product_df = update_product_info(product_df, jan_code, product_info)
-                   products_updated = True  # 更新フラグをセット
-                   log_message("価格監視", jan_code, "初回取得", 
-                              f"商品名: {product_info['item_name']}, 価格: {current_price}円, 在庫: {current_availability}")
-                   continue
-               
-               # 価格または在庫に変動があるか確認
-               price_changed = current_price != previous_price
-               availability_changed = current_availability != previous_availability
-               
-               if price_changed or availability_changed:
-                   # 価格変動率を計算
-                   price_change_rate = 0
-                   if previous_price > 0:
-                       price_change_rate = ((current_price - previous_price) / previous_price) * 100
-                   
-                   # 重複チェック - 直近の通知と同一ならスキップ
-                   if is_recently_notified(jan_code, current_price):
-                       log_message("価格監視", jan_code, "通知スキップ", 
-                                 f"直近で同価格({current_price}円)の通知があるためスキップします")
-                       # 商品情報は更新するが、通知はしない
-                       product_df = update_product_info(product_df, jan_code, product_info, price_change_rate)
-                       products_updated = True  # 更新フラグをセット
-                       continue
-                   
-                   # 商品リストを更新
-                   product_df = update_product_info(product_df, jan_code, product_info, price_change_rate)
-                   products_updated = True  # 更新フラグをセット
-                   
-                   # 変動があった商品情報を配列に追加
-                   changed_products.append({
-                       "jan_code": jan_code,
-                       "product_name": product_info["item_name"],
-                       "current_price": current_price,
-                       "previous_price": previous_price,
-                       "price_change_rate": price_change_rate,
-                       "current_availability": current_availability,
-                       "previous_availability": previous_availability,
-                       "shop_name": product_info["shop_name"],
-                       "item_url": product_info["item_url"],
-                       "affiliate_url": product_info["affiliate_url"],
-                       "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                   })
-                   
-                   log_message("価格監視", jan_code, "変動検知", 
-                              f"商品名: {product_info['item_name']}, "
-                              f"価格変動: {previous_price}円→{current_price}円 ({price_change_rate:.2f}%), "
-                              f"在庫: {previous_availability}→{current_availability}")
-               else:
-                   log_message("価格監視", jan_code, "変動なし", 
-                              f"商品名: {product_info['item_name']}, 価格: {current_price}円, 在庫: {current_availability}")
-               
-               # API呼び出しの間に短い遅延を挿入（レート制限対策）
-               time.sleep(api_request_interval)
-               
-           except Exception as e:
-               log_message("価格監視", jan_code, "失敗", f"商品名: {row['product_name'] if not pd.isna(row['product_name']) else '未取得'}, エラー: {str(e)}")
-       
-       # 変動があった商品数をログに記録
-       log_message("メイン処理", "システム", "情報", f"{len(changed_products)}件の商品に変動がありました")
-       
-       # 商品情報に更新があった場合のみ保存
-       if products_updated:
-           # 商品リストの変更を保存
-           save_result = save_product_list(product_df)
-           log_message("メイン処理", "システム", "保存", 
-                     f"商品リストの保存: {'成功' if save_result else '失敗'}")
-       else:
-           log_message("メイン処理", "システム", "情報", "商品情報に更新がなかったため、保存をスキップします")
-       
+           if change.first_fetch:
+               updated_jan_codes.append(jan_code)
+               first_fetch_count += 1
+               log_message("価格監視", jan_code, "初回取得", 
+                          f"商品名: {offer.item_name}, 価格: {offer.item_price}円, 在庫: {offer.availability}", level=DEBUG)
+               continue
+           
+           if not change.changed:
+               continue
+           
+           changed_count += 1
+           updated_jan_codes.append(jan_code)
+           current_price = offer.item_price
+           
+           # 重複チェック - 直近の通知と同一ならスキップ（商品情報は更新済み）
+           if is_recently_notified(jan_code, current_price):
+               log_message("価格監視", jan_code, "通知スキップ", 
+                         f"直近で同価格({current_price}円)の通知があるためスキップします", level=DEBUG)
+               continue
+           
+           # 変動があった商品情報を配列に追加
+           changed_products.append({
+               "jan_code": jan_code,
+               "product_name": offer.item_name,
+               "current_price": current_price,
+               "previous_price": change.previous_price,
+               "price_change_rate": change.price_change_rate,
+               "current_availability": offer.availability,
+               "previous_availability": change.previous_availability,
+               "shop_name": offer.shop_name,
+               "item_url": offer.item_url,
+               "affiliate_url": offer.affiliate_url,
+               "timestamp": timestamp
+           })
+           
+           log_message("価格監視", jan_code, "変動検知", 
+                      f"商品名: {offer.item_name}, "
+                      f"価格変動: {change.previous_price}円→{current_price}円 ({change.price_change_rate:.2f}%), "
+                      f"在庫: {change.previous_availability}→{offer.availability}")
+           
+       except Exception as e:
+           log_message("価格監視", jan_code, "失敗", f"商品名: {offer.item_name}, エラー: {str(e)}")
+   
+   metrics.add_stage_time("update", time.perf_counter() - update_start)
+   metrics.inc("products_checked", len(jan_codes))
+   metrics.inc("products_changed", changed_count)
+   metrics.inc("products_deferred", len(unfetched_jan_codes))
+   log_message("価格監視", "システム", "集計", 
+              f"取得成功: {len(changes)}件, 初回取得: {first_fetch_count}件, "
+              f"変動: {changed_count}件, "
+              f"取得失敗: {len(jan_codes) - len(offers) - len(unfetched_jan_codes)}件"
+              + (f", 未取得: {len(unfetched_jan_codes)}件（次回の実行で優先してチェックします）" if unfetched_jan_codes else ""))
+   if unfetched_jan_codes:
+       log_message("取得順", "システム", "延期", 
+                  f"次回に回したJANコード: {', '.join(unfetched_jan_codes[:20])}"
+                  + (f" ほか{len(unfetched_jan_codes) - 20}件" if len(unfetched_jan_codes) > 20 else ""))
+   
+   # 取得処理の所要時間をログに記録
+   fetch_elapsed = time.monotonic() - fetch_start_time
+   log_message("メイン処理", "システム", "情報", 
+              f"{len(jan_codes)}件の取得が完了しました（{fetch_elapsed:.1f}秒, "
+              f"{len(jan_codes) / fetch_elapsed if fetch_elapsed > 0 else 0:.2f}件/秒）")
+   close_api_cache()
+   log_message("楽天API検索", "システム", "統計", format_search_stats())
+   log_message("リトライ", "システム", "統計", format_retry_stats())
+   log_message("HTTP接続", "システム", "統計", http_client.format_connection_stats())
+   
+   # 変動があった商品数をログに記録
+   log_message("メイン処理", "システム", "情報", f"{len(changed_products)}件の商品に変動がありました")
+   
+   return {
+       "product_store": product_store,
+       "changed_products": changed_products,
+       "updated_jan_codes": updated_jan_codes,
+       "scheduler": scheduler,
+       "price_samples": price_samples,
+       "sampled_at": sampled_at,
+       "deferred_jan_codes": unfetched_jan_codes
+   }
+
+# 取得価格を時系列に追記
+def record_price_samples(price_samples, sampled_at):
+   """今回取得した (jan_code, price, availability, shop_name) を価格時系列に追記する"""
+   from price_series import PriceSeriesStore
+   try:
+       written, skipped = PriceSeriesStore(CONFIG["price_series_dir"]).append(price_samples, now=sampled_at)
+       log_message("価格時系列", "システム", "保存", 
+                  f"{written}件のサンプルを{CONFIG['price_series_dir']}に追記しました"
+                  + (f"（JANコードが数字でないため{skipped}件を除外）" if skipped else ""))
+       return written
+   except Exception as e:
+       log_message("価格時系列", "システム", "保存エラー", str(e))
+       return 0
+
+# 変動商品から通知対象を選び、投稿と通知状態の更新を行う
+def notify_changed_products(changed_products, product_store, journal=None):
+   """通知対象の抽出・保存・履歴更新・投稿を行い、通知対象商品を返す
+   
+   journal（RunJournal）を渡すと、投稿前に通知対象を、投稿に成功するたびにその商品を記録する。
+   記録が残っている場合（投稿中に中断した実行の再開）は通知対象を選び直さず、投稿済みの商品は投稿しない。
+   """
+   threshold = CONFIG["price_change_threshold"]  # 通知する価格変動閾値
+   metrics = get_run_metrics()
+   resuming = journal is not None and journal.has_phase("notifying")
+   notified = dict(journal.phases.get("notified", {}).get("products", {})) if resuming else {}  # JANコード: 通知時の価格・時刻
+   posted_platforms = {platform: set(jan_codes) for platform, jan_codes in
+                       (journal.phases.get("notified", {}).get("platforms", {}) if resuming else {}).items()}
+   
+   if resuming:
+       # 前回の実行で選んだ通知対象（通知履歴は記録・保存済み）
+       unique_products = journal.phases["notifying"]["products"]
+       log_message("再開", "システム", "通知", 
+                  f"通知対象{len(unique_products)}件のうち投稿済みの{len(notified)}件を除いて投稿を再開します")
+   else:
        # 通知すべき変動商品をフィルタリング
-       notifiable_products = filter_notifiable_products(changed_products, product_df, threshold)
+       with metrics.stage("filter"):
+           notifiable_products, _ = filter_notifiable_products(changed_products, product_store, threshold)
        
        # 重複排除（JAN コードベース）
        unique_products = []
@@ -829,86 +1436,449 @@ def monitor_products():
        if unique_products:
            log_message("メイン処理", "システム", "通知", 
                       f"重複を除外して{len(unique_products)}件の商品を通知します (元は{len(notifiable_products)}件)")
-       
-       # 通知対象商品をJSONファイルに保存
-       if unique_products:
-           with open("notifiable_products.json", "w", encoding="utf-8") as f:
-               json.dump(unique_products, f, ensure_ascii=False, indent=2)
+       metrics.inc("notifications", len(unique_products))
+   
+   # 通知対象商品をJSONファイルに保存
+   if unique_products:
+       if not resuming:
+           with metrics.stage("save"):
+               with open("notifiable_products.json", "w", encoding="utf-8") as f:
+                   json.dump(unique_products, f, ensure_ascii=False, indent=2)
            log_message("メイン処理", "システム", "情報", f"通知対象商品をJSONファイルに保存しました")
            
-           # 通知履歴を更新
+           # 通知履歴を更新し、投稿の前に保存する（投稿中に中断しても再開時に同じ商品を通知対象に選び直さない）
            update_notification_history(unique_products)
+           with metrics.stage("save"):
+               flush_notification_history()
+           if journal is not None:
+               journal.mark("notifying", products=unique_products)
+       
+       # 投稿に成功するたびに記録する（各投稿先のスレッドから呼ばれる）
+       journal_lock = threading.Lock()
+       def on_posted(post_result):
+           if not post_result.success:
+               return
+           with journal_lock:
+               if post_result.jan_code not in notified:
+                   notified[post_result.jan_code] = {"price": post_result.product["current_price"],
+                                                     "time": post_result.posted_at}
+               posted_platforms.setdefault(post_result.platform, set()).add(post_result.jan_code)
+               if journal is not None:
+                   journal.mark("notified", products=notified,
+                                platforms={platform: sorted(jan_codes) for platform, jan_codes in posted_platforms.items()})
+       
+       # 投稿（通知状態の更新までを投稿の所要時間とする）
+       post_start = time.perf_counter()
+       post_results = post_notifiable_products(unique_products, on_posted,
+                                               {platform: set(jan_codes) for platform, jan_codes in posted_platforms.items()})
+       
+       # 実際に投稿された商品だけを「通知済み」としてマークする（再開時は前回の実行で投稿した商品も含む）
+       for post_result in post_results:
+           metrics.inc("post_results", platform=post_result.platform,
+                       result="success" if post_result.success else "failure")
+           if post_result.success:
+               log_message("投稿確認", post_result.jan_code, "成功", f"{post_result.platform}への投稿を確認")
+       posted_jan_codes = set(notified)
+
+       # 投稿に成功した商品だけをマークする
+       for jan_code, posted in notified.items():
+           if jan_code in product_store:
+               product_store.update(
+                   jan_code,
+                   notified_flag=True,
+                   last_notified_price=posted["price"],
+                   last_notified_time=posted["time"]
+               )
+               
+               log_message("通知状態更新", jan_code, "更新", 
+                         f"投稿確認済み: notified_flag = True, last_notified_price = {posted['price']}円")
+       
+       # 投稿に成功した件数をログに記録
+       metrics.add_stage_time("post", time.perf_counter() - post_start)
+       metrics.inc("posted", len(posted_jan_codes))
+       log_message("メイン処理", "システム", "完了", f"{len(posted_jan_codes)}件の商品が実際に投稿されました")
+               
+       # 通知フラグが更新された場合は商品リストを再度保存
+       if posted_jan_codes:
+           with metrics.stage("save"):
+               save_result = save_product_list(product_store.df)
+           log_message("メイン処理", "システム", "保存", 
+                     f"通知フラグ更新後の商品リスト保存: {'成功' if save_result else '失敗'}")
+   else:
+       log_message("メイン処理", "システム", "情報", "通知対象商品がありません")
+   
+   # 通知履歴の変更をまとめて保存
+   with metrics.stage("save"):
+       flush_notification_history()
+   
+   return unique_products
+
+# スケジュールを保存
+def save_poll_schedule(scheduler):
+   """適応型スケジュールを保存（無効時は何もしない）"""
+   if scheduler is None:
+       return
+   try:
+       scheduler.save()
+   except Exception as e:
+       log_message("スケジュール", "システム", "保存エラー", str(e))
+
+# 今回チェックが必要な商品数を軽量に数える
+def count_due_products(full_sweep=False, path="product_list.csv"):
+   """pandasを使わずに商品リストを読み、(監視対象の件数, 今回チェックが必要な件数) を返す"""
+   if not os.path.exists(path):
+       return 0, 0
+   
+   with open(path, "r", encoding="utf-8", newline="") as f:
+       rows = list(csv.DictReader(f))
+   
+   # 判定に迷う値はpandasでの読み込みと同じく監視対象・チェック対象の側に倒す
+   monitored = [
+       row for row in rows
+       if str(row.get("monitor_flag") or "").strip().lower() not in ("false", "0", "0.0")
+   ]
+   if not CONFIG["adaptive_polling"] or full_sweep:
+       return len(monitored), len(monitored)
+   
+   scheduler = PollScheduler(CONFIG["poll_schedule_path"]).load()
+   due_count = 0
+   for row in monitored:
+       last_price = str(row.get("last_price") or "").strip()
+       last_availability = str(row.get("last_availability") or "").strip()
+       try:
+           first_fetch = float(last_price) == 0
+       except ValueError:
+           first_fetch = True
+       if first_fetch or last_availability in ("", "不明") or scheduler.is_due(str(row.get("jan_code") or "").strip()):
+           due_count += 1
+   return len(monitored), due_count
+
+# 監視対象商品の変動を監視するメイン関数
+def monitor_products(max_workers=None, full_sweep=False, resume=False, deadline=None):
+   """商品の価格変動を監視し、通知すべき商品を検出する
+   
+   途中経過をジャーナルに記録し、resume=Trueなら中断した前回の実行を続きから再開する。
+   deadline（time.monotonic()の値）を過ぎたら取得を打ち切り、取得できなかった商品は次回優先して取得する。
+   """
+   from product_store import ProductStore
+   from run_journal import RunJournal
+   journal = RunJournal(CONFIG["run_journal_path"])
+   try:
+       if journal.load():
+           if resume:
+               log_message("再開", "システム", "開始", 
+                          f"{journal.header['started_at']}に開始した実行を再開します "
+                          f"(記録済みの取得結果: {len(journal.results)}件, 完了した段階: {', '.join(journal.phases) or 'なし'})")
+           else:
+               log_message("再開", "システム", "警告", 
+                          f"{journal.header['started_at']}に開始した実行が途中で終了しています。"
+                          f"記録を破棄して新しく実行します（--resumeで再開できます）")
+               journal = RunJournal(CONFIG["run_journal_path"])
+       
+       # 商品リストを読み込む
+       metrics = get_run_metrics()
+       with metrics.stage("load"):
+           product_store = ProductStore(load_product_list())
+       
+       # 商品リストの保存まで完了していた場合は通知処理のみを行う
+       if journal.has_phase("product_list"):
+           notified_products = notify_changed_products(journal.phases["product_list"]["changed_products"], product_store, journal)
+           journal.finish()
+           return notified_products
+       
+       result = collect_product_changes(product_store, max_workers, full_sweep, journal=journal, deadline=deadline)
+       if result is None:
+           journal.finish()
+           return []
+       with metrics.stage("save"):
+           save_poll_schedule(result["scheduler"])
+           save_deferred_jan_codes(result["deferred_jan_codes"])
+           if not journal.has_phase("price_samples"):
+               record_price_samples(result["price_samples"], result["sampled_at"])
+               journal.mark("price_samples")
            
-           # 投稿スクリプトを実行
-           run_posting_scripts()
-           
-           # 実際に投稿された商品だけを「通知済み」としてマークする
-           posted_jan_codes = set()
-           current_time = datetime.now()
-           time_threshold = (current_time - timedelta(minutes=10)).strftime("%Y-%m-%d %H:%M:%S")
-           
-           # Threadsの投稿ログをチェック
-           if os.path.exists("threads_posting_log.csv"):
-               try:
-                   posted_df = pd.read_csv("threads_posting_log.csv")
-                   recent_posts = posted_df[posted_df["timestamp"] > time_threshold]
-                   
-                   # 投稿に成功した商品のJANコードを取得
-                   for jan_code in recent_posts[recent_posts["success"] == True]["jan_code"]:
-                       posted_jan_codes.add(str(jan_code))
-                       log_message("投稿確認", jan_code, "成功", "Threadsへの投稿を確認")
-               except Exception as e:
-                   log_message("投稿確認", "Threads", "エラー", f"ログ解析エラー: {str(e)}")
-
-           # Twitterの投稿ログをチェック（ある場合）
-           if os.path.exists("twitter_posting_log.csv"):
-               try:
-                   twitter_df = pd.read_csv("twitter_posting_log.csv")
-                   recent_twitter = twitter_df[twitter_df["timestamp"] > time_threshold]
-                   for jan_code in recent_twitter[recent_twitter["success"] == True]["jan_code"]:
-                       posted_jan_codes.add(str(jan_code))
-                       log_message("投稿確認", jan_code, "成功", "Twitterへの投稿を確認")
-               except Exception as e:
-                   log_message("投稿確認", "Twitter", "エラー", f"ログ解析エラー: {str(e)}")
-
-           # 投稿に成功した商品だけをマークする
-           for jan_code in posted_jan_codes:
-               product_info = next((p for p in unique_products if str(p["jan_code"]) == jan_code), None)
-               if product_info:
-                   mask = product_df["jan_code"].astype(str) == jan_code
-                   product_df.loc[mask, "notified_flag"] = True
-                   product_df.loc[mask, "last_notified_price"] = product_info["current_price"]
-                   product_df.loc[mask, "last_notified_time"] = current_time.strftime("%Y-%m-%d %H:%M:%S")
-                   
-                   log_message("通知状態更新", jan_code, "更新", 
-                             f"投稿確認済み: notified_flag = True, last_notified_price = {product_info['current_price']}円")
+           # 保存の前に通知対象を記録する（保存した直後に中断すると、再開時に取得結果を反映し直しても変動として検出されない）
+           changed_products = result["changed_products"]
+           if journal.has_phase("saving"):  # 前回の実行が保存の前後で中断した場合は記録した通知対象を使う
+               saved_products = journal.phases["saving"]["changed_products"]
+               saved_jan_codes = {str(product["jan_code"]) for product in saved_products}
+               changed_products = saved_products + [product for product in changed_products
+                                                    if str(product["jan_code"]) not in saved_jan_codes]
+           journal.mark("saving", changed_products=changed_products)
            
-           # 投稿に成功した件数をログに記録
-           log_message("メイン処理", "システム", "完了", f"{len(posted_jan_codes)}件の商品が実際に投稿されました")
-                   
-           # 通知フラグが更新された場合は商品リストを再度保存
-           if posted_jan_codes:
-               save_result = save_product_list(product_df)
-               log_message("メイン処理", "システム", "保存", 
-                         f"通知フラグ更新後の商品リスト保存: {'成功' if save_result else '失敗'}")
+           # 商品情報に更新があった場合のみ商品リストの変更を保存
+           save_result = save_product_list(product_store.df) if result["updated_jan_codes"] else True
+       if result["updated_jan_codes"]:
+           log_message("メイン処理", "システム", "保存", 
+                     f"商品リストの保存: {'成功' if save_result else '失敗'}")
        else:
-           log_message("メイン処理", "システム", "情報", "通知対象商品がありません")
+           log_message("メイン処理", "システム", "情報", "商品情報に更新がなかったため、保存をスキップします")
        
-       return unique_products
+       # 保存できた場合は、再開時に取得結果を反映し直さないよう通知対象とともに記録する
+       if save_result:
+           journal.mark("product_list", changed_products=changed_products)
+       
+       notified_products = notify_changed_products(changed_products, product_store,
+                                                   journal if save_result else None)
+       if save_result:
+           journal.finish()
+       return notified_products
        
    except Exception as e:
        log_message("メイン処理", "システム", "失敗", str(e))
        return []
+   finally:
+       journal.close()
+       flush_notification_history()
+
+# ======= シャード実行 =======
+
+# JANコードの担当シャードを決める
+def shard_of(jan_code, shard_count):
+   """JANコードの安定ハッシュから担当シャード番号（0始まり）を返す"""
+   return zlib.crc32(str(jan_code).strip().encode("utf-8")) % shard_count
+
+# シャード指定（i/N）を解析
+def parse_shard_spec(spec):
+   """'i/N' 形式のシャード指定を (i, N) に変換する"""
+   try:
+       index_str, count_str = spec.split("/")
+       shard_index, shard_count = int(index_str), int(count_str)
+   except ValueError:
+       raise ValueError(f"シャード指定は 'i/N' 形式で指定してください: {spec}")
+   if shard_count < 1 or not 0 <= shard_index < shard_count:
+       raise ValueError(f"シャード番号は 0 以上 {shard_count} 未満で指定してください: {spec}")
+   return shard_index, shard_count
+
+# シャードの出力ファイルパス
+def get_shard_output_path(shard_index, shard_count):
+   return os.path.join(CONFIG["shard_output_dir"], f"shard_{shard_index}_of_{shard_count}.json")
+
+# 担当シャード分の監視を実行し、部分結果を書き出す
+def run_shard(shard_index, shard_count, max_workers=None, full_sweep=False, rate_limit=None):
+   """担当分の商品を取得・比較し、商品状態と変動商品をシャード出力ファイルに保存する"""
+   from product_store import ProductStore
+   global _rate_limiter
+   try:
+       # ローカルの並列実行ではアプリIDの上限をシャード間で分け合う
+       if rate_limit is not None:
+           CONFIG["api_rate_limit"] = rate_limit
+           _rate_limiter = None
+       
+       # 計測値はシャードごとに別のファイルに書き出す（親プロセスから引き継いだ値は破棄する）
+       reset_run_metrics()
+       with get_run_metrics().stage("load"):
+           product_store = ProductStore(load_product_list())
+       result = collect_product_changes(product_store, max_workers, full_sweep, shard=(shard_index, shard_count))
+       
+       products = {}
+       changed_products = []
+       schedule = {}
+       price_samples = []
+       sampled_at = None
+       if result is not None:
+           for jan_code in dict.fromkeys(result["updated_jan_codes"]):
+               row = product_store.get_row(jan_code)
+               products[jan_code] = {
+                   "product_name": str(row["product_name"]),
+                   "last_price": float(row["last_price"]),
+                   "last_availability": str(row["last_availability"])
+               }
+           changed_products = result["changed_products"]
+           price_samples = result["price_samples"]
+           sampled_at = result["sampled_at"]
+           if result["scheduler"] is not None:
+               schedule = {
+                   jan_code: entry for jan_code, entry in result["scheduler"].entries.items()
+                   if shard_of(jan_code, shard_count) == shard_index
+               }
+       
+       # 部分結果を一時ファイル経由で書き出す
+       save_start = time.perf_counter()
+       output_path = get_shard_output_path(shard_index, shard_count)
+       os.makedirs(CONFIG["shard_output_dir"], exist_ok=True)
+       temp_path = f"{output_path}.tmp"
+       with open(temp_path, "w", encoding="utf-8") as f:
+           json.dump({
+               "shard_index": shard_index,
+               "shard_count": shard_count,
+               "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+               "products": products,
+               "changed_products": changed_products,
+               "schedule": schedule,
+               "price_samples": price_samples,
+               "sampled_at": sampled_at
+           }, f, ensure_ascii=False, indent=2)
+       os.replace(temp_path, output_path)
+       get_run_metrics().add_stage_time("save", time.perf_counter() - save_start)
+       
+       log_message("シャード", f"{shard_index}/{shard_count}", "保存", 
+                  f"更新{len(products)}件, 変動{len(changed_products)}件を{output_path}に保存しました")
+       return output_path
+   except Exception as e:
+       log_message("シャード", f"{shard_index}/{shard_count}", "失敗", str(e))
+       return None
+   finally:
+       close_api_cache()
+       flush_notification_history()
+       write_run_metrics(f"_shard_{shard_index}_of_{shard_count}")
+       reset_run_metrics()
+       # 子プロセスは終了時の処理を行わないため、ここで書き出す
+       summarize_logs()
+       flush_logs()
+
+# シャードの部分結果を統合する
+def merge_shard_outputs(shard_count):
+   """全シャードの部分結果を商品リスト・スケジュール・通知対象・通知履歴に反映する"""
+   from product_store import ProductStore
+   try:
+       with get_run_metrics().stage("load"):
+           product_store = ProductStore(load_product_list())
+       row_order = {jan_code: position for position, jan_code in enumerate(product_store.jan_codes())}
+       
+       products = {}
+       changed_products = []
+       schedule = {}
+       price_sample_groups = []
+       merged_paths = []
+       
+       # シャード番号順に読み込む（結果が実行順に依存しないようにする）
+       for shard_index in range(shard_count):
+           output_path = get_shard_output_path(shard_index, shard_count)
+           if not os.path.exists(output_path):
+               log_message("シャード統合", f"{shard_index}/{shard_count}", "警告", "出力ファイルがないためスキップします")
+               continue
+           
+           with open(output_path, "r", encoding="utf-8") as f:
+               shard_output = json.load(f)
+           
+           if shard_output.get("shard_index") != shard_index or shard_output.get("shard_count") != shard_count:
+               log_message("シャード統合", output_path, "警告", "シャード番号が一致しないためスキップします")
+               continue
+           
+           # 担当外のJANコードは取り込まない（他シャードの結果を上書きしないため）
+           for jan_code, values in shard_output["products"].items():
+               if shard_of(jan_code, shard_count) == shard_index:
+                   products[jan_code] = values
+           changed_products.extend(
+               product for product in shard_output["changed_products"]
+               if shard_of(product["jan_code"], shard_count) == shard_index
+           )
+           schedule.update({
+               jan_code: entry for jan_code, entry in shard_output["schedule"].items()
+               if shard_of(jan_code, shard_count) == shard_index
+           })
+           if shard_output.get("price_samples"):
+               price_sample_groups.append((
+                   [sample for sample in shard_output["price_samples"] if shard_of(sample[0], shard_count) == shard_index],
+                   shard_output["sampled_at"]
+               ))
+           merged_paths.append(output_path)
+       
+       log_message("シャード統合", "システム", "情報", 
+                  f"{len(merged_paths)}/{shard_count}シャードを統合します "
+                  f"(更新{len(products)}件, 変動{len(changed_products)}件)")
+       
+       # 取得で変わる列のみを現在の商品リストに反映する（他の列の変更は保持）
+       for jan_code, values in products.items():
+           update_product_info(product_store, jan_code, {
+               "item_name": values["product_name"],
+               "item_price": values["last_price"],
+               "availability": values["last_availability"]
+           })
+       
+       # スケジュールを統合
+       if CONFIG["adaptive_polling"] and schedule:
+           scheduler = PollScheduler(CONFIG["poll_schedule_path"]).load()
+           scheduler.entries.update(schedule)
+           save_poll_schedule(scheduler)
+       
+       # 価格時系列はシャードごとの取得時刻で追記する
+       for price_samples, sampled_at in price_sample_groups:
+           record_price_samples(price_samples, sampled_at)
+       
+       if products:
+           save_result = save_product_list(product_store.df)
+           log_message("シャード統合", "システム", "保存", 
+                      f"商品リストの保存: {'成功' if save_result else '失敗'}")
+       
+       # 単一プロセス実行と同じ順序で通知処理を行う
+       changed_products.sort(key=lambda product: row_order.get(str(product["jan_code"]), len(row_order)))
+       unique_products = notify_changed_products(changed_products, product_store)
+       
+       # 統合済みのシャード出力を削除（再統合による二重通知を防ぐ）
+       for output_path in merged_paths:
+           os.remove(output_path)
+       
+       return unique_products
+   except Exception as e:
+       log_message("シャード統合", "システム", "失敗", str(e))
+       return []
+   finally:
+       flush_notification_history()
+
+# ローカルのプロセスプールで全シャードを実行して統合する
+def run_sharded_locally(shard_count, max_workers=None, full_sweep=False):
+   """shard_count個のプロセスで並列に監視し、結果を統合する"""
+   log_message("シャード", "システム", "開始", f"{shard_count}プロセスで並列に監視します")
+   
+   # APIの上限は同じアプリIDを使う全プロセスで共有する
+   rate_limit = CONFIG["api_rate_limit"] / shard_count
+   flush_logs()  # 未出力の行を子プロセスに引き継がない
+   with ProcessPoolExecutor(max_workers=shard_count) as executor:
+       futures = [
+           executor.submit(run_shard, shard_index, shard_count, max_workers, full_sweep, rate_limit)
+           for shard_index in range(shard_count)
+       ]
+       output_paths = [future.result() for future in futures]
+   
+   failed = [index for index, path in enumerate(output_paths) if path is None]
+   if failed:
+       log_message("シャード", "システム", "警告", f"失敗したシャード: {failed}")
+   
+   return merge_shard_outputs(shard_count)
 
 # メイン実行関数
 if __name__ == "__main__":
+   RUN_STARTED_AT = time.monotonic()  # 実行時間の上限の起点
    try:
        # コマンドライン引数の解析
+       import sys
        import argparse
        parser = argparse.ArgumentParser(description="楽天商品価格監視システム")
        parser.add_argument("--dry-run", action="store_true", help="通知はスキップしてテスト実行します")
        parser.add_argument("--debug", action="store_true", help="デバッグモードで実行します")
+       parser.add_argument("--workers", type=int, default=None, 
+                           help="楽天APIへの同時リクエスト数（既定: RAKUTEN_API_WORKERS または 4）")
+       parser.add_argument("--full-sweep", action="store_true", 
+                           help="適応型スケジュールを無視してすべての監視対象商品をチェックします")
+       shard_group = parser.add_mutually_exclusive_group()
+       shard_group.add_argument("--shard", metavar="i/N", 
+                                help="N分割したうちi番目（0始まり）の商品のみを監視し、部分結果を出力します")
+       shard_group.add_argument("--merge-shards", type=int, metavar="N", 
+                                help="N個のシャードの部分結果を統合して通知処理を行います")
+       shard_group.add_argument("--parallel-shards", type=int, metavar="N", 
+                                help="N個のプロセスでシャード実行し、統合まで行います")
+       shard_group.add_argument("--export-history", nargs="?", const="notification_history.json", metavar="PATH", 
+                                help="通知履歴を従来のJSON形式で書き出して終了します")
+       shard_group.add_argument("--compact-history", action="store_true", 
+                                help="追記形式の通知履歴を1JAN1行に圧縮して終了します")
+       parser.add_argument("--resume", action="store_true", 
+                           help="中断した前回の実行があれば、記録済みの取得結果を使って続きから再開します")
+       parser.add_argument("--max-runtime", type=float, metavar="SECONDS", 
+                           help="実行時間の上限（秒）。優先度の高い商品から取得し、時間切れの商品は次回優先して取得します")
        args = parser.parse_args()
+       # --debugでJANごとの詳細ログも出力する（前回の実行のログファイルは空にする）
+       configure_logging(level=DEBUG if args.debug else None, script="monitor", truncate=True)
+       sharded = bool(args.shard or args.merge_shards or args.parallel_shards)
+       if args.max_runtime is not None and sharded:
+           parser.error("--max-runtime はシャード実行とは併用できません")
+       
+       # 取得の期限（保存・通知の時間を残す。シャード実行では環境変数の指定を使わない）
+       max_runtime = args.max_runtime if args.max_runtime is not None else (None if sharded else CONFIG["max_runtime_seconds"])
+       deadline = None
+       if max_runtime:
+           deadline = RUN_STARTED_AT + max_runtime * (1 - CONFIG["max_runtime_reserve_ratio"])
        
        # 実行開始ログ
        if args.dry_run:
@@ -916,12 +1886,44 @@ if __name__ == "__main__":
        else:
            log_message("メイン処理", "システム", "開始", "楽天商品価格監視システムの実行を開始します")
        
+       # 通知履歴の保守コマンド
+       if args.export_history:
+           export_notification_history(args.export_history)
+           sys.exit(0)
+       if args.compact_history:
+           compact_notification_history()
+           sys.exit(0)
+       
+       # シャード実行（部分結果のみを出力し、通知は統合時に行う）
+       if args.shard:
+           shard_index, shard_count = parse_shard_spec(args.shard)
+           run_shard(shard_index, shard_count, max_workers=args.workers, full_sweep=args.full_sweep)
+           sys.exit(0)
+       
+       # チェックする商品がなければpandasなどを読み込まずに終了する（再開する実行がある場合を除く）
+       resuming = args.resume and os.path.exists(CONFIG["run_journal_path"])
+       if not (args.merge_shards or args.parallel_shards or resuming):
+           monitored_count, due_count = count_due_products(full_sweep=args.full_sweep)
+           if due_count == 0:
+               log_message("メイン処理", "システム", "完了", 
+                          "監視対象の商品がありません" if monitored_count == 0 
+                          else f"監視対象{monitored_count}件のうち今回チェックが必要な商品がありません")
+               sys.exit(0)
+       
        # 重複するJANコードを削除
        log_message("メイン処理", "システム", "準備", "重複するJANコードを確認・削除します")
-       product_df = remove_duplicate_jan_codes()
+       with get_run_metrics().stage("load"):
+           product_df = remove_duplicate_jan_codes()
        
        # 商品監視を実行
-       notified_products = monitor_products()
+       if args.merge_shards:
+           notified_products = merge_shard_outputs(args.merge_shards)
+       elif args.parallel_shards:
+           notified_products = run_sharded_locally(args.parallel_shards, max_workers=args.workers, 
+                                                   full_sweep=args.full_sweep)
+       else:
+           notified_products = monitor_products(max_workers=args.workers, full_sweep=args.full_sweep, 
+                                                resume=args.resume, deadline=deadline)
        
        # 処理完了をログに記録
        log_message("メイン処理", "システム", "完了", f"楽天商品価格監視システムの実行が完了しました（通知商品数: {len(notified_products)}）")
@@ -931,3 +1933,7 @@ if __name__ == "__main__":
        # スタックトレースをログに出力（デバッグ用）
        import traceback
        traceback.print_exc()
+   finally:
+       close_api_cache()
+       flush_notification_history()
+       write_run_metrics()
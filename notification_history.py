@@ -0,0 +1,212 @@
+import os
+import json
+import time
+from datetime import datetime
+
+# ======= 通知履歴の共通処理 =======
+
+# 通知履歴の時刻形式
+HISTORY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 履歴の時刻文字列をエポック秒に変換
+def parse_history_time(value):
+    """解析できない場合はNoneを返す"""
+    try:
+        return datetime.strptime(value, HISTORY_TIME_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+# 通知イベントを履歴に適用
+def apply_notification_event(entries, event):
+    """通知イベント（jan_code, product_name, price, time）を履歴の辞書に反映する"""
+    jan_code = str(event["jan_code"])
+    notified_time_str = event["time"]
+    entry = entries.get(jan_code)
+
+    if entry is not None:
+        # 既存エントリの更新
+        entry.update({
+            "product_name": event["product_name"],
+            "price": event["price"],
+            "last_notified_time": notified_time_str,
+            "notification_count": entry.get("notification_count", 0) + 1,
+            "previous_prices": entry.get("previous_prices", []) + [
+                {"price": event["price"], "time": notified_time_str}
+            ][-5:]  # 直近5回分の履歴を保持
+        })
+    else:
+        # 新規エントリの追加
+        entries[jan_code] = {
+            "product_name": event["product_name"],
+            "price": event["price"],
+            "last_notified_time": notified_time_str,
+            "notification_count": 1,
+            "previous_prices": [
+                {"price": event["price"], "time": notified_time_str}
+            ]
+        }
+    return jan_code
+
+# ======= 通知履歴の保存形式 =======
+
+# 従来のJSONファイル（保存のたびに全体を書き直す）
+class JsonHistoryBackend:
+    """notification_history.json 形式で履歴全体を読み書きする"""
+    name = "json"
+
+    def __init__(self, path="notification_history.json"):
+        self.path = path
+        self.skipped_lines = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, entries, events):
+        """履歴全体を書き直す（eventsは使用しない）"""
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
+        return len(entries)
+
+# 追記専用のJSON Linesファイル（通知1件につき1行を追記する）
+class AppendOnlyHistoryBackend:
+    """スナップショット行と通知イベント行を追記し、読み込み時に順に再生する"""
+    name = "jsonl"
+
+    def __init__(self, path="notification_history.jsonl"):
+        self.path = path
+        self.skipped_lines = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """全行を再生して履歴を復元する（途中で切れた行などは読み飛ばす）"""
+        entries = {}
+        self.skipped_lines = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if record["event"] == "snapshot":
+                        entries[str(record["jan_code"])] = record["entry"]
+                    elif record["event"] == "notified":
+                        apply_notification_event(entries, record)
+                    else:
+                        self.skipped_lines += 1
+                except (ValueError, KeyError, TypeError):
+                    self.skipped_lines += 1
+        return entries
+
+    def save(self, entries, events):
+        """未保存の通知イベントのみを追記する"""
+        if not events:
+            return 0
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(dict(event, event="notified"), ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return len(events)
+
+    def compact(self, entries):
+        """現在の履歴を1JAN1行のスナップショットとして書き直す"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for jan_code, entry in entries.items():
+                f.write(json.dumps({"event": "snapshot", "jan_code": jan_code, "entry": entry}, 
+                                   ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+        return len(entries)
+
+# 保存形式を作成
+def create_history_backend(name, json_path="notification_history.json", log_path="notification_history.jsonl"):
+    """設定名から保存形式を返す（json / jsonl）"""
+    if name == "json":
+        return JsonHistoryBackend(json_path)
+    if name == "jsonl":
+        return AppendOnlyHistoryBackend(log_path)
+    raise ValueError(f"未対応の通知履歴形式です: {name}")
+
+# 従来のJSONから追記形式への移行
+def migrate_json_history(json_backend, log_backend):
+    """追記形式のファイルがまだなく従来のJSONがある場合に、スナップショットとして書き出す"""
+    if log_backend.exists() or not json_backend.exists():
+        return None
+    return log_backend.compact(json_backend.load())
+
+# ======= 通知履歴サービス =======
+
+# 実行中に保持する通知履歴
+class NotificationHistory:
+    """通知履歴を1回の読み込みで保持し、JANごとの最終通知時刻（エポック秒）の索引で参照する"""
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+        self.pending_events = []  # 未保存の通知イベント
+        self._notified_epochs = {
+            jan_code: parse_history_time(entry.get("last_notified_time"))
+            for jan_code, entry in self.entries.items()
+        }
+
+    def __contains__(self, jan_code):
+        return jan_code in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, jan_code):
+        return self.entries.get(jan_code)
+
+    # 最終通知時刻（エポック秒）
+    def notified_epoch(self, jan_code):
+        """読み込み時に解析済みの最終通知時刻を返す（履歴がない・解析できない場合はNone）"""
+        return self._notified_epochs.get(jan_code)
+
+    # 最終通知時の価格
+    def last_notified_price(self, jan_code):
+        """最終通知時の価格を返す（履歴がなければNone）"""
+        entry = self.entries.get(jan_code)
+        return None if entry is None else entry["price"]
+
+    # 最終通知からの経過時間
+    def hours_since_notified(self, jan_code, now=None):
+        """最終通知からの経過時間（時間）を返す。時刻が解析できない場合はValueError"""
+        notified_epoch = self._notified_epochs.get(jan_code)
+        if notified_epoch is None:
+            raise ValueError(f"最終通知時刻を解析できません: {self.entries.get(jan_code, {}).get('last_notified_time')}")
+        now = time.time() if now is None else now
+        return (now - notified_epoch) / 3600
+
+    # 直近に同価格で通知済みか
+    def is_recently_notified(self, jan_code, current_price, hours=24, now=None):
+        """指定時間内に10円未満の差の価格で通知済みならTrue（判定に使った値も返す）"""
+        if jan_code not in self.entries:
+            return False, None, None
+
+        hours_since = self.hours_since_notified(jan_code, now)
+        last_price = self.last_notified_price(jan_code)
+        recently = hours_since < hours and abs(current_price - last_price) < 10
+        return recently, hours_since, last_price
+
+    @property
+    def dirty(self):
+        return bool(self.pending_events)
+
+    # 通知の記録
+    def record_notification(self, product, notified_time_str):
+        """通知した商品の履歴を追加・更新し、保存用のイベントとして保持する"""
+        event = {
+            "jan_code": str(product["jan_code"]),
+            "product_name": product["product_name"],
+            "price": product["current_price"],
+            "time": notified_time_str
+        }
+        jan_code = apply_notification_event(self.entries, event)
+        self._notified_epochs[jan_code] = parse_history_time(notified_time_str)
+        self.pending_events.append(event)
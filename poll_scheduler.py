@@ -0,0 +1,156 @@
+import os
+import json
+import time
+from datetime import datetime
+
+# ======= 適応型ポーリングスケジュール =======
+
+# スケジュールの設定値
+SCHEDULE_CONFIG = {
+    "run_interval_hours": float(os.environ.get("POLL_RUN_INTERVAL_HOURS", "3")),  # cronの実行間隔
+    "max_interval_hours": float(os.environ.get("POLL_MAX_INTERVAL_HOURS", "48")),  # 安定商品の最大チェック間隔
+    "quiet_period_divisor": 4,  # 変動がない期間の1/4を次回までの間隔とする
+    "volatility_alpha": 0.3,  # 変動頻度の指数移動平均の重み
+    "volatile_threshold": 0.2,  # これ以上の変動頻度なら毎回チェック
+    "flapping_threshold": 0.2,  # これ以上の在庫変動頻度なら毎回チェック
+    "due_slack_minutes": 30,  # cronの実行時刻のずれを吸収する余裕
+}
+
+# JANごとのチェック時刻を管理するスケジューラ
+class PollScheduler:
+    """価格変動の頻度・最終変動からの経過時間・在庫の揺れから、JANごとの次回チェック時刻を決める"""
+
+    def __init__(self, path="poll_schedule.json", config=None):
+        self.path = path
+        self.config = dict(SCHEDULE_CONFIG, **(config or {}))
+        self.entries = {}
+        self.stats = {"due": 0, "skipped": 0, "recorded": 0}
+
+    # スケジュールの読み込み
+    def load(self):
+        """スケジュールファイルを読み込む（存在しなければ空で開始）"""
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        return self
+
+    # スケジュールの保存
+    def save(self):
+        """1JAN1行のJSONとして一時ファイル経由で保存（差分を最小限にするため）"""
+        lines = [
+            f"  {json.dumps(jan_code)}: {json.dumps(self.entries[jan_code], ensure_ascii=False, sort_keys=True)}"
+            for jan_code in sorted(self.entries)
+        ]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("{\n" + ",\n".join(lines) + ("\n" if lines else "") + "}\n")
+        os.replace(temp_path, self.path)
+
+    # 通知履歴から初期値を設定
+    def seed_from_history(self, notification_history):
+        """スケジュール未登録のJANについて、通知履歴の価格推移から変動頻度と最終変動時刻を推定"""
+        seeded = 0
+        for jan_code, history in notification_history.items():
+            if jan_code in self.entries:
+                continue
+
+            previous_prices = history.get("previous_prices", [])
+            last_change = None
+            for entry in previous_prices:
+                try:
+                    entry_time = datetime.strptime(entry["time"], "%Y-%m-%d %H:%M:%S").timestamp()
+                except (KeyError, TypeError, ValueError):
+                    continue
+                last_change = entry_time if last_change is None else max(last_change, entry_time)
+
+            if last_change is None:
+                continue
+
+            # 通知回数が多い商品ほど変動しやすいとみなす
+            self.entries[jan_code] = {
+                "checks": 0,
+                "changes": len(previous_prices),
+                "volatility": round(min(1.0, len(previous_prices) / 5), 4),
+                "flapping": 0.0,
+                "last_change": int(last_change),
+                "last_check": 0,
+                "next_check": 0,
+                "interval_hours": self.config["run_interval_hours"]
+            }
+            seeded += 1
+        return seeded
+
+    # チェック対象かどうか
+    def is_due(self, jan_code, now=None):
+        """次回チェック時刻を過ぎている（または未登録の）場合にTrue"""
+        entry = self.entries.get(jan_code)
+        if entry is None:
+            return True
+        now = time.time() if now is None else now
+        return entry.get("next_check", 0) <= now + self.config["due_slack_minutes"] * 60
+
+    # チェック対象のJANを抽出
+    def select_due(self, jan_codes, now=None, force=()):
+        """JANコードのリストをチェック対象と今回スキップするものに分ける（forceは常にチェック対象）"""
+        now = time.time() if now is None else now
+        due, skipped = [], []
+        for jan_code in jan_codes:
+            (due if jan_code in force or self.is_due(jan_code, now) else skipped).append(jan_code)
+        self.stats["due"] += len(due)
+        self.stats["skipped"] += len(skipped)
+        return due, skipped
+
+    # チェック結果を記録
+    def record_check(self, jan_code, price_changed, availability_changed, now=None):
+        """チェック結果から変動頻度を更新し、次回チェック時刻を決める"""
+        now = time.time() if now is None else now
+        alpha = self.config["volatility_alpha"]
+        entry = self.entries.get(jan_code)
+        if entry is None:
+            entry = {
+                "checks": 0, "changes": 0, "volatility": 0.0, "flapping": 0.0,
+                "last_change": int(now), "last_check": 0, "next_check": 0,
+                "interval_hours": self.config["run_interval_hours"]
+            }
+            self.entries[jan_code] = entry
+
+        changed = price_changed or availability_changed
+        entry["checks"] += 1
+        entry["volatility"] = round((1 - alpha) * entry["volatility"] + alpha * (1.0 if changed else 0.0), 4)
+        entry["flapping"] = round((1 - alpha) * entry["flapping"] + alpha * (1.0 if availability_changed else 0.0), 4)
+        if changed:
+            entry["changes"] += 1
+            entry["last_change"] = int(now)
+
+        interval_hours = self.next_interval_hours(entry, now)
+        entry["interval_hours"] = round(interval_hours, 2)
+        entry["last_check"] = int(now)
+        entry["next_check"] = int(now + interval_hours * 3600)
+        self.stats["recorded"] += 1
+        return interval_hours
+
+    # 次回チェックまでの間隔を計算
+    def next_interval_hours(self, entry, now):
+        """変動しやすい商品は毎回、長く変動していない商品ほど間隔を広げる"""
+        base = self.config["run_interval_hours"]
+        if (entry["volatility"] >= self.config["volatile_threshold"] or
+                entry["flapping"] >= self.config["flapping_threshold"]):
+            return base
+
+        quiet_hours = max(0.0, (now - entry.get("last_change", now)) / 3600)
+        interval = quiet_hours / self.config["quiet_period_divisor"]
+
+        # 変動頻度が残っている分だけ間隔を縮める
+        interval *= (1 - entry["volatility"] / self.config["volatile_threshold"] / 2)
+        return min(self.config["max_interval_hours"], max(base, interval))
+
+    # 削減件数のサマリ
+    def summary(self):
+        """フルスイープと比べたAPI呼び出しの削減数を返す"""
+        total = self.stats["due"] + self.stats["skipped"]
+        return {
+            "total": total,
+            "due": self.stats["due"],
+            "skipped": self.stats["skipped"],
+            "saved_percentage": (self.stats["skipped"] / total * 100) if total else 0.0
+        }
@@ -0,0 +1,175 @@
+import os
+import csv
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from run_log import log_message
+
+# ======= SNS投稿の共通処理（監視処理から同じプロセス内で呼び出す） =======
+
+# 1商品・1投稿先の投稿結果
+class PostResult:
+    __slots__ = ("platform", "jan_code", "product", "success", "post_id", "error", "posted_at")
+
+    def __init__(self, platform, product, result, posted_at=None):
+        self.platform = platform
+        self.jan_code = str(product["jan_code"])
+        self.product = product
+        self.success = bool(result.get("success"))
+        self.post_id = result.get("id", "")
+        self.error = result.get("error", "")
+        self.posted_at = posted_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def to_dict(self):
+        return {"platform": self.platform, "jan_code": self.jan_code, "success": self.success,
+                "id": self.post_id, "error": self.error, "posted_at": self.posted_at}
+
+# 投稿先ごとの処理の基底クラス
+class Poster:
+    """サブクラスはplatform・label・log_path・id_columnと、create_message・publish（必要ならprepare・reauthenticate）を定義する
+
+    publishは {"success": bool, "id": 投稿ID, "error": エラー内容, "platform": 投稿先} の辞書を返す。
+    認証エラーの場合は "auth_error": True を含め、reauthenticateで認証し直せれば投稿し直す（1回の投稿処理で1度だけ）。
+    """
+    platform = ""
+    label = ""  # ログに表示する投稿先の名前
+    log_path = None  # 投稿結果を記録するCSVファイル
+    id_column = "post_id"  # CSVの投稿IDの列名
+    max_posts = 5  # 1回の実行で投稿する上限（API制限対策）
+    post_interval = 2.0  # 連続投稿の間隔（秒）
+
+    # 投稿前の準備（認証など）。Falseを返すと投稿しない
+    def prepare(self):
+        return True
+
+    # 投稿が認証エラーになった場合の再認証。Trueを返すと投稿し直す
+    def reauthenticate(self):
+        return False
+
+    def create_message(self, product):
+        raise NotImplementedError
+
+    def publish(self, message):
+        raise NotImplementedError
+
+    # 投稿結果をCSVに記録
+    def record(self, post_result):
+        if not self.log_path:
+            return
+        product = post_result.product
+        try:
+            is_new = not os.path.exists(self.log_path)
+            with open(self.log_path, mode="a", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file)
+                if is_new:
+                    writer.writerow([
+                        "timestamp", "jan_code", "product_name", "current_price",
+                        "price_change_rate", "success", self.id_column, "error"
+                    ])
+                writer.writerow([
+                    post_result.posted_at,
+                    product["jan_code"],
+                    product["product_name"],
+                    product["current_price"],
+                    product["price_change_rate"],
+                    post_result.success,
+                    post_result.post_id,
+                    post_result.error
+                ])
+        except Exception as e:
+            log_message("投稿記録", post_result.jan_code, "失敗", f"エラー: {str(e)}")
+
+    # 商品を順に投稿する
+    def post_products(self, products, on_result=None, posted_count=0):
+        """先頭から上限件数までを投稿し、商品ごとのPostResultのリストを返す（準備に失敗した場合は空）
+
+        on_resultを渡すと、1件投稿するごとにそのPostResultを渡して呼び出す（中断に備えた記録用）。
+        posted_countには同じ実行で投稿済みの件数を渡す（再開時。上限から差し引く）。
+        """
+        category = f"{self.label}投稿"
+        if not products:
+            log_message(category, "システム", "情報", "通知対象の商品がありません")
+            return []
+        if posted_count >= self.max_posts:
+            log_message(category, "システム", "情報", f"投稿済みの{posted_count}件で上限に達しているため投稿しません")
+            return []
+
+        if not self.prepare():
+            log_message(category, "システム", "中止", "認証に失敗したため投稿をスキップします")
+            return []
+
+        log_message(category, "システム", "開始", f"{len(products)}件の商品を投稿します")
+        results = []
+        reauthenticated = False
+        max_posts = min(self.max_posts - posted_count, len(products))
+
+        for i in range(max_posts):
+            product = products[i]
+            try:
+                message = self.create_message(product)
+                log_message(category, product["jan_code"], "進行中", f"{self.label}に投稿します")
+                result = self.publish(message)
+                if result.get("auth_error") and not reauthenticated:
+                    reauthenticated = True  # 認証し直すのは1回の投稿処理で1度だけ
+                    if self.reauthenticate():
+                        log_message(category, product["jan_code"], "再試行", "認証し直して投稿します")
+                        result = self.publish(message)
+                post_result = PostResult(self.platform, product, result)
+                self.record(post_result)
+                results.append(post_result)
+                if on_result is not None:
+                    on_result(post_result)
+                log_message(category, product["jan_code"], "完了",
+                            f"結果: {'成功' if post_result.success else '失敗'}")
+
+                # 連続投稿の場合はAPIレート制限を考慮して少し待機
+                if i < max_posts - 1:
+                    time.sleep(self.post_interval)
+
+            except Exception as e:
+                log_message(category, product["jan_code"], "失敗", f"エラー: {str(e)}")
+
+        log_message(category, "システム", "完了", f"{len(results)}件の商品の投稿が完了しました")
+        return results
+
+# 通知対象商品のファイルを読み込む（投稿スクリプトを単体で実行する場合）
+def load_notifiable_products(path="notifiable_products.json"):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f) or []
+
+# 設定されている投稿先
+def create_posters():
+    """スレッズは常に、X(Twitter)は認証情報（TWITTER_API_KEY）がある場合のみ投稿先とする"""
+    # 投稿スクリプトがこのモジュールを読み込むため、ここで読み込む
+    from threads_poster import ThreadsPoster
+    posters = [ThreadsPoster()]
+    if "TWITTER_API_KEY" in os.environ:
+        from twitter_poster import TwitterPoster
+        posters.append(TwitterPoster())
+    return posters
+
+# 投稿先ごとに並行して投稿する
+def run_posters(products, posters, on_result=None, exclude=None):
+    """各投稿先の投稿を別スレッドで行い、全投稿先のPostResultのリストを投稿先の順に返す
+
+    on_resultは各投稿先のスレッドから呼ばれる。excludeには投稿先ごとに投稿済みのJANコードを渡す（{platform: JANコードの集合}）。
+    投稿済みの商品は投稿せず、その件数を投稿先ごとの上限から差し引く。
+    """
+    if not products or not posters:
+        return []
+    exclude = exclude or {}
+
+    def post(poster):
+        try:
+            posted = exclude.get(poster.platform, ())
+            return poster.post_products([product for product in products if str(product["jan_code"]) not in posted],
+                                        on_result, len(posted))
+        except Exception as e:
+            log_message(f"{poster.label}投稿", "システム", "失敗", f"エラー: {str(e)}")
+            return []
+
+    with ThreadPoolExecutor(max_workers=len(posters), thread_name_prefix="poster") as executor:
+        return [result for results in executor.map(post, posters) for result in results]
@@ -0,0 +1,274 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+# ======= JANごとの価格時系列 =======
+
+# 1サンプルの固定長レコード（当月分の追記ファイルの形式）
+SAMPLE_DTYPE = np.dtype([
+    ("jan", "<u8"),  # JANコード（先頭に1を付けた整数。先頭の0と桁数を保持する）
+    ("time", "<u4"),  # 取得時刻（エポック秒）
+    ("price", "<i4"),  # 価格（円）
+    ("availability", "u1"),  # 在庫状況のコード
+    ("shop", "<u4"),  # 販売店名の番号（shops.txtの行番号）
+])
+
+# 在庫状況のコード
+AVAILABILITY_CODES = {"不明": 0, "在庫あり": 1, "在庫なし": 2}
+AVAILABILITY_NAMES = {code: name for name, code in AVAILABILITY_CODES.items()}
+
+# JANコードを整数に変換
+def encode_jan_code(jan_code):
+    """数字のみのJANコードを整数に変換する（変換できない場合はNone）"""
+    jan_code = str(jan_code).strip()
+    if not jan_code.isdigit() or len(jan_code) > 18:
+        return None
+    return int("1" + jan_code)
+
+# 整数からJANコードに戻す
+def decode_jan_code(value):
+    return str(int(value))[1:]
+
+# 月ごとのファイルに価格サンプルを蓄積する時系列ストア
+class PriceSeriesStore:
+    """当月分は固定長レコードの追記ファイル（YYYY-MM.bin）、過去の月は列ごとに圧縮したファイル（YYYY-MM.npz）に保存する"""
+
+    def __init__(self, directory="price_series"):
+        self.directory = directory
+        self.shops_path = os.path.join(directory, "shops.txt")
+        self._shops = None
+        self._shop_ids = None
+        self._month_cache = {}  # 月 → (ファイルの状態, サンプル, JAN順に整列済みか)
+
+    # 販売店名の辞書
+    def _load_shops(self):
+        if self._shops is None:
+            self._shops = []
+            if os.path.exists(self.shops_path):
+                with open(self.shops_path, "r", encoding="utf-8") as f:
+                    self._shops = [line.rstrip("\n") for line in f]
+            self._shop_ids = {name: shop_id for shop_id, name in enumerate(self._shops)}
+        return self._shops
+
+    def _shop_id(self, shop_name, new_shops):
+        """販売店名の番号を返す（未登録なら追加する）"""
+        shop_name = " ".join(str(shop_name or "").split())  # 1行1店舗で保存するため改行を除く
+        shop_id = self._shop_ids.get(shop_name)
+        if shop_id is None:
+            shop_id = len(self._shops)
+            self._shops.append(shop_name)
+            self._shop_ids[shop_name] = shop_id
+            new_shops.append(shop_name)
+        return shop_id
+
+    @staticmethod
+    def month_of(epoch):
+        return datetime.fromtimestamp(epoch).strftime("%Y-%m")
+
+    def _path(self, month, suffix):
+        return os.path.join(self.directory, f"{month}.{suffix}")
+
+    # 月の一覧
+    def months(self):
+        """保存されている月（YYYY-MM）を古い順に返す"""
+        names = glob.glob(os.path.join(self.directory, "*.bin")) + glob.glob(os.path.join(self.directory, "*.npz"))
+        months = {os.path.splitext(os.path.basename(name))[0] for name in names}
+        return sorted(month for month in months if len(month) == 7)
+
+    # サンプルの追記
+    def append(self, samples, now=None):
+        """(jan_code, price, availability, shop_name) のサンプルを同じ時刻で追記し、書き込んだ件数と除外した件数を返す"""
+        now = int(datetime.now().timestamp() if now is None else now)
+        self._load_shops()
+
+        records = []
+        new_shops = []
+        skipped = 0
+        for jan_code, price, availability, shop_name in samples:
+            jan = encode_jan_code(jan_code)
+            if jan is None:
+                skipped += 1
+                continue
+            records.append((
+                jan, now, int(round(float(price))),
+                AVAILABILITY_CODES.get(availability, 0), self._shop_id(shop_name, new_shops)
+            ))
+
+        if not records:
+            return 0, skipped
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # 販売店名を先に追記する（レコードが参照する番号を必ず存在させるため）
+        if new_shops:
+            with open(self.shops_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{name}\n" for name in new_shops))
+                f.flush()
+                os.fsync(f.fileno())
+
+        month = self.month_of(now)
+        self.pack_completed_months(month)
+        with open(self._path(month, "bin"), "ab") as f:
+            f.write(np.array(records, dtype=SAMPLE_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        return len(records), skipped
+
+    # 月のサンプルを読み込む
+    def load_month(self, month):
+        """指定月の全サンプルを構造化配列で返す（途中で切れた末尾のレコードは無視する）"""
+        return self._load_month(month)[0]
+
+    def _load_month(self, month):
+        """(サンプル, JAN順に整列済みか) を返す。ファイルが変わっていなければ前回読み込んだ結果を使う"""
+        packed_path = self._path(month, "npz")
+        path = packed_path if os.path.exists(packed_path) else self._path(month, "bin")
+        if not os.path.exists(path):
+            return np.empty(0, dtype=SAMPLE_DTYPE), False
+
+        file_stat = os.stat(path)
+        signature = (path, file_stat.st_mtime_ns, file_stat.st_size)
+        cached = self._month_cache.get(month)
+        if cached is not None and cached[0] == signature:
+            return cached[1], cached[2]
+
+        if path == packed_path:
+            with np.load(packed_path) as packed:
+                samples = np.empty(len(packed["jan"]), dtype=SAMPLE_DTYPE)
+                for name in SAMPLE_DTYPE.names:
+                    samples[name] = packed[name]
+            sorted_by_jan = True
+        else:
+            count = file_stat.st_size // SAMPLE_DTYPE.itemsize
+            samples = np.fromfile(path, dtype=SAMPLE_DTYPE, count=count)
+            sorted_by_jan = False
+
+        self._month_cache[month] = (signature, samples, sorted_by_jan)
+        return samples, sorted_by_jan
+
+    # 過去の月を列形式に圧縮
+    def pack_completed_months(self, current_month=None):
+        """当月より前の追記ファイルを、JAN・時刻順に並べた列ごとの圧縮ファイルに変換する"""
+        current_month = current_month or self.month_of(datetime.now().timestamp())
+        packed = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.bin"))):
+            month = os.path.splitext(os.path.basename(path))[0]
+            if month >= current_month:
+                continue
+            samples = self.load_month(month)
+            samples = samples[np.lexsort((samples["time"], samples["jan"]))]
+
+            temp_path = self._path(month, "npz.tmp")
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, **{name: samples[name] for name in SAMPLE_DTYPE.names})
+            os.replace(temp_path, self._path(month, "npz"))
+            os.remove(path)
+            packed.append(month)
+        return packed
+
+    # 期間・JANでの検索
+    def query(self, jan_codes=None, start=None, end=None):
+        """期間 [start, end)（エポック秒またはdatetime）とJANコードで絞り込んだサンプルを時刻順の構造化配列で返す"""
+        start = start.timestamp() if isinstance(start, datetime) else start
+        end = end.timestamp() if isinstance(end, datetime) else end
+        start_month = self.month_of(start) if start is not None else None
+        end_month = self.month_of(end) if end is not None else None
+
+        jan_values = None
+        if jan_codes is not None:
+            if isinstance(jan_codes, str):
+                jan_codes = [jan_codes]
+            jan_values = np.array([value for value in map(encode_jan_code, jan_codes) if value is not None],
+                                  dtype=np.uint64)
+
+        parts = []
+        for month in self.months():
+            # 期間外の月のファイルは読み込まない
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            samples, sorted_by_jan = self._load_month(month)
+            if jan_values is not None and sorted_by_jan:
+                # 圧縮済みの月はJAN順に並んでいるため二分探索で該当範囲だけを取り出す
+                lower = np.searchsorted(samples["jan"], jan_values, side="left")
+                upper = np.searchsorted(samples["jan"], jan_values, side="right")
+                samples = np.concatenate([samples[i:j] for i, j in zip(lower, upper)] or [samples[:0]])
+            mask = np.ones(len(samples), dtype=bool)
+            if jan_values is not None and not sorted_by_jan:
+                mask &= np.isin(samples["jan"], jan_values)
+            if start is not None:
+                mask &= samples["time"] >= start
+            if end is not None:
+                mask &= samples["time"] < end
+            parts.append(samples[mask])
+
+        if not parts:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        result = np.concatenate(parts)
+        return result[np.argsort(result["time"], kind="stable")]
+
+    # 検索結果をDataFrameに変換
+    def to_frame(self, samples):
+        """構造化配列を jan_code / time / price / availability / shop_name 列のDataFrameに変換する"""
+        shops = self._load_shops()
+        jan_names = {value: decode_jan_code(value) for value in np.unique(samples["jan"])}
+        return pd.DataFrame({
+            "jan_code": [jan_names[value] for value in samples["jan"]],
+            "time": pd.to_datetime([datetime.fromtimestamp(epoch) for epoch in samples["time"].tolist()]),
+            "price": samples["price"].astype("int64"),
+            "availability": [AVAILABILITY_NAMES.get(code, "不明") for code in samples["availability"]],
+            "shop_name": [shops[shop_id] if shop_id < len(shops) else "" for shop_id in samples["shop"]],
+        })
+
+    # JANごとの期間集計
+    def summarize(self, start=None, end=None, jan_codes=None):
+        """期間内のJANごとのサンプル数・最安値・最高値・最初と最後の価格をDataFrameで返す"""
+        samples = self.query(jan_codes, start, end)
+        columns = ["jan_code", "samples", "min_price", "max_price", "first_price", "last_price"]
+        if len(samples) == 0:
+            return pd.DataFrame(columns=columns)
+
+        # JAN・時刻順に並べ、JANごとの区間の先頭と末尾から集計する
+        samples = samples[np.lexsort((samples["time"], samples["jan"]))]
+        jan_values, starts, counts = np.unique(samples["jan"], return_index=True, return_counts=True)
+        prices = samples["price"].astype("int64")
+        return pd.DataFrame({
+            "jan_code": [decode_jan_code(value) for value in jan_values],
+            "samples": counts,
+            "min_price": np.minimum.reduceat(prices, starts),
+            "max_price": np.maximum.reduceat(prices, starts),
+            "first_price": prices[starts],
+            "last_price": prices[starts + counts - 1],
+        }, columns=columns)
+
+    # JANごとの基準価格
+    def reference_prices(self, jan_codes=None, start=None, end=None):
+        """期間内のJANごとの価格の中央値（価格が0以下のサンプルは除く）を {JANコード: 価格} で返す"""
+        samples = self.query(jan_codes, start, end)
+        samples = samples[samples["price"] > 0]
+        if len(samples) == 0:
+            return {}
+
+        # JAN・価格順に並べ、JANごとの区間の中央の値を取る（件数が偶数なら中央の2つの平均）
+        samples = samples[np.lexsort((samples["price"], samples["jan"]))]
+        jan_values, starts, counts = np.unique(samples["jan"], return_index=True, return_counts=True)
+        prices = samples["price"].astype("float64")
+        medians = (prices[starts + (counts - 1) // 2] + prices[starts + counts // 2]) / 2
+        return {decode_jan_code(value): float(median) for value, median in zip(jan_values, medians)}
+
+    # 保存状況の統計
+    def stats(self):
+        """サンプル数とファイルサイズの合計を返す"""
+        samples = 0
+        file_size = 0
+        for month in self.months():
+            samples += len(self.load_month(month))
+            for suffix in ("bin", "npz"):
+                path = self._path(month, suffix)
+                if os.path.exists(path):
+                    file_size += os.path.getsize(path)
+        if os.path.exists(self.shops_path):
+            file_size += os.path.getsize(self.shops_path)
+        return {"months": len(self.months()), "samples": samples, "file_size": file_size,
+                "shops": len(self._load_shops())}
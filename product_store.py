@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+# ======= 監視ループ用の軽量レコード =======
+
+# 商品リストの1行（比較に使う列のみ）
+class ProductRecord:
+    """監視対象の判定・変動検知・候補の選択に使う列だけを持つ商品レコード（欠損値は初回扱いになる値で補完済み）"""
+    __slots__ = ("label", "jan_code", "product_name", "last_price", "last_availability", "monitor_flag", "reference_name")
+
+    def __init__(self, label, jan_code, product_name, last_price, last_availability, monitor_flag, reference_name=""):
+        self.label = label
+        self.jan_code = jan_code
+        self.product_name = product_name
+        self.last_price = last_price
+        self.last_availability = last_availability
+        self.monitor_flag = monitor_flag
+        self.reference_name = reference_name  # 候補の選択の基準にする商品名（選択した出品の商品名では上書きしない）
+
+    # 初回取得が必要か
+    @property
+    def needs_first_fetch(self):
+        return self.last_price == 0 or self.last_availability == "不明"
+
+# APIから取得した出品情報
+class OfferRecord:
+    """取得結果のうち、比較・保存・通知に使う項目だけを持つレコード"""
+    __slots__ = ("jan_code", "item_name", "item_price", "availability", "shop_name", "item_url", "affiliate_url")
+
+    def __init__(self, jan_code, item_name, item_price, availability, shop_name, item_url, affiliate_url):
+        self.jan_code = jan_code
+        self.item_name = item_name
+        self.item_price = item_price
+        self.availability = availability
+        self.shop_name = shop_name
+        self.item_url = item_url
+        self.affiliate_url = affiliate_url
+
+    @classmethod
+    def from_product_info(cls, jan_code, product_info):
+        return cls(jan_code, product_info["item_name"], product_info["item_price"], product_info["availability"],
+                   product_info["shop_name"], product_info["item_url"], product_info["affiliate_url"])
+
+# 前回値との比較結果
+class ChangeRecord:
+    """取得結果と前回値の比較結果（初回取得の場合は変動なし）"""
+    __slots__ = ("offer", "previous_price", "previous_availability", "first_fetch",
+                 "price_changed", "availability_changed", "changed", "price_change_rate")
+
+    def __init__(self, offer, previous_price, previous_availability):
+        current_price = offer.item_price
+        self.offer = offer
+        self.previous_price = previous_price
+        self.previous_availability = previous_availability
+        self.first_fetch = previous_price == 0 or previous_availability == "不明"
+        self.price_changed = not self.first_fetch and current_price != previous_price
+        self.availability_changed = not self.first_fetch and offer.availability != previous_availability
+        self.changed = self.price_changed or self.availability_changed
+        self.price_change_rate = (
+            (current_price - previous_price) / previous_price * 100 if self.changed and previous_price > 0 else 0.0
+        )
+
+    # 一括比較の結果から作成（__init__と同じ判定を配列で済ませた値を受け取る）
+    @classmethod
+    def from_compared(cls, offer, previous_price, previous_availability, first_fetch,
+                      price_changed, availability_changed, price_change_rate):
+        change = cls.__new__(cls)
+        change.offer = offer
+        change.previous_price = previous_price
+        change.previous_availability = previous_availability
+        change.first_fetch = first_fetch
+        change.price_changed = price_changed
+        change.availability_changed = availability_changed
+        change.changed = price_changed or availability_changed
+        change.price_change_rate = price_change_rate
+        return change
+
+# ======= JANコード索引付き商品リスト =======
+
+# JANコードで参照・更新できる商品リスト
+class ProductStore:
+    """商品リストのDataFrameと、JANコード→行ラベルの索引を同期して保持する"""
+
+    def __init__(self, product_df):
+        self.df = product_df
+        self._index = {}
+        self._records = None  # 行ラベル → ProductRecord（records()の初回呼び出し時に作成）
+        self.reindex()
+
+    # 索引の再構築
+    def reindex(self):
+        """DataFrameの行を追加・削除した後に呼び出して索引を作り直す"""
+        index = {}
+        for label, jan_code in zip(self.df.index, self.df["jan_code"]):
+            index.setdefault(self.normalize_jan_code(jan_code), []).append(label)
+        self._index = index
+        self._records = None
+
+    @staticmethod
+    def normalize_jan_code(jan_code):
+        return str(jan_code).strip()
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, jan_code):
+        return self.normalize_jan_code(jan_code) in self._index
+
+    # JANコードの一覧（商品リストの順序）
+    def jan_codes(self):
+        return list(self._index)
+
+    # 値の取得
+    def get(self, jan_code, column, default=None):
+        """指定JANコードの列の値を返す（存在しない・欠損の場合はdefault）"""
+        labels = self._index.get(self.normalize_jan_code(jan_code))
+        if not labels:
+            return default
+        value = self.df.at[labels[0], column]
+        return default if pd.isna(value) else value
+
+    # 行の取得
+    def get_row(self, jan_code):
+        """指定JANコードの行を辞書で返す（存在しない場合はNone）"""
+        labels = self._index.get(self.normalize_jan_code(jan_code))
+        if not labels:
+            return None
+        return self.df.loc[labels[0]].to_dict()
+
+    # 値の更新
+    def update(self, jan_code, **values):
+        """指定JANコードの行（重複があればすべて）を更新し、更新できたかを返す"""
+        labels = self._index.get(self.normalize_jan_code(jan_code))
+        if not labels:
+            return False
+        for label in labels:
+            for column, value in values.items():
+                self.df.at[label, column] = value
+        if self._records is not None and {"product_name", "last_price", "last_availability", "monitor_flag",
+                                          "reference_name"} & values.keys():
+            self._records = None  # 比較に使う列が変わったため次回作り直す
+        return True
+
+    # 比較用レコードの一覧
+    def records(self):
+        """全行のProductRecordを商品リストの順序で返す（列ごとにまとめて変換し、行ごとのSeriesは作らない）"""
+        if self._records is None:
+            df = self.df
+            jan_codes = df["jan_code"].astype(str).str.strip().tolist()
+            product_names = df["product_name"].where(df["product_name"].notna(), "").astype(str).tolist()
+            last_prices = pd.to_numeric(df["last_price"], errors="coerce").fillna(0).to_numpy(dtype=float).tolist()
+            last_availabilities = df["last_availability"].where(df["last_availability"].notna(), "不明").tolist()
+            monitor_flags = (df["monitor_flag"] == True).tolist()
+            reference_names = (df["reference_name"].where(df["reference_name"].notna(), "").astype(str).tolist()
+                               if "reference_name" in df.columns else product_names)
+            self._records = {
+                label: ProductRecord(label, jan_code, product_name, last_price, last_availability, monitor_flag, reference_name)
+                for label, jan_code, product_name, last_price, last_availability, monitor_flag, reference_name in zip(
+                    df.index, jan_codes, product_names, last_prices, last_availabilities, monitor_flags, reference_names)
+            }
+        return list(self._records.values())
+
+    # 取得結果の一括反映
+    def apply_fetch_results(self, offers):
+        """取得結果（OfferRecordのリスト）をバッチ全体で前回値と一括比較し、初回取得・変動のある行をまとめて更新する
+
+        判定は配列でまとめて行い、その結果から入力順のChangeRecordのリストを作って返す（商品リストに存在しないJANコードは除外）。
+        """
+        if self._records is None:
+            self.records()
+
+        # JANコードで商品リストの行と結合（商品リストに存在しないJANコードは比較できないため除外）
+        matched = []
+        for offer in offers:
+            labels = self._index.get(self.normalize_jan_code(offer.jan_code))
+            if labels:
+                matched.append((offer, labels))
+        if not matched:
+            return []
+
+        # 前回の値（レコードは欠損を初回扱いになる値で補完済み）と今回の値の配列
+        first_records = [self._records[labels[0]] for _, labels in matched]
+        previous_price = np.array([record.last_price for record in first_records], dtype=float)
+        previous_availability = np.array([record.last_availability for record in first_records], dtype=object)
+        current_price = np.array([offer.item_price for offer, _ in matched], dtype=float)
+        current_availability = np.array([offer.availability for offer, _ in matched], dtype=object)
+
+        # 初回取得・変動の判定
+        first_fetch = (previous_price == 0) | (previous_availability == "不明")
+        price_changed = ~first_fetch & (current_price != previous_price)
+        availability_changed = ~first_fetch & (current_availability != previous_availability)
+        changed = price_changed | availability_changed
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_change_rate = np.where(
+                changed & (previous_price > 0), (current_price - previous_price) / previous_price * 100, 0.0)
+
+        changes = [
+            ChangeRecord.from_compared(offer, record.last_price, record.last_availability, is_first, is_price_changed,
+                                       is_availability_changed, rate)
+            for (offer, _), record, is_first, is_price_changed, is_availability_changed, rate in zip(
+                matched, first_records, first_fetch.tolist(), price_changed.tolist(),
+                availability_changed.tolist(), price_change_rate.tolist())
+        ]
+
+        # 初回取得または変動のある行のみを書き戻す（重複行があればすべて）
+        updates = {}
+        for (offer, labels), needs_update in zip(matched, (first_fetch | changed).tolist()):
+            if needs_update:
+                for label in labels:
+                    updates[label] = offer
+
+        if updates:
+            labels = list(updates)
+            self.df.loc[labels, "product_name"] = [offer.item_name for offer in updates.values()]
+            self.df.loc[labels, "last_price"] = [offer.item_price for offer in updates.values()]
+            self.df.loc[labels, "last_availability"] = [offer.availability for offer in updates.values()]
+            for label, offer in updates.items():
+                record = self._records[label]
+                record.product_name = offer.item_name
+                record.last_price = float(offer.item_price)
+                record.last_availability = offer.availability
+
+        return changes
@@ -0,0 +1,71 @@
+import json
+
+# ======= 楽天商品検索APIの検索結果 =======
+
+# APIに返却を要求する項目（選択・整形に使うものだけ）
+SEARCH_ELEMENTS = [
+    "count", "itemName", "itemPrice", "itemCode", "shopName", "availability", "itemUrl", "affiliateUrl"
+]
+
+# JANコードの照合に説明文を使う場合に追加する項目
+CAPTION_ELEMENT = "itemCaption"
+
+# 検索結果の1商品
+class SearchItem:
+    """検索結果の商品のうち、選択・整形に使う項目だけを持つレコード（説明文はJANコード・中古キーワードの該当有無のみ保持）"""
+    __slots__ = ("item_name", "item_price", "item_code", "shop_name", "availability",
+                 "item_url", "affiliate_url", "jan_in_caption", "used_in_caption")
+
+    def __init__(self, item_name, item_price, item_code, shop_name, availability,
+                 item_url, affiliate_url, jan_in_caption=False, used_in_caption=False):
+        self.item_name = item_name
+        self.item_price = item_price
+        self.item_code = item_code
+        self.shop_name = shop_name
+        self.availability = availability
+        self.item_url = item_url
+        self.affiliate_url = affiliate_url
+        self.jan_in_caption = jan_in_caption
+        self.used_in_caption = used_in_caption
+
+    # キャッシュ保存用のリストに変換
+    def to_list(self):
+        return [self.item_name, self.item_price, self.item_code, self.shop_name, self.availability,
+                self.item_url, self.affiliate_url, self.jan_in_caption, self.used_in_caption]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values)
+
+# APIの商品オブジェクトからレコードを作成
+def make_search_item(item, jan_code, caption_classifier=None):
+    """formatVersion 1（{"Item": {...}}）・2（{...}）のどちらの商品オブジェクトも受け付ける
+
+    jan_codeがNoneなら説明文とJANコードを照合せず、caption_classifierがあれば説明文の中古キーワードを判定する。
+    """
+    item = item.get("Item", item)
+    caption = item.get("itemCaption")
+    return SearchItem(
+        item.get("itemName"),
+        item.get("itemPrice"),
+        item.get("itemCode"),
+        item.get("shopName"),
+        item.get("availability"),
+        item.get("itemUrl"),
+        item.get("affiliateUrl"),
+        bool(caption) and jan_code is not None and str(jan_code).lower() in caption.lower(),
+        bool(caption) and caption_classifier is not None and caption_classifier.matches(caption)
+    )
+
+# 検索結果のレスポンスを解析
+def parse_search_response(body, jan_code, caption_classifier=None):
+    """レスポンス本文（bytesまたはstr）を解析し、(結果dict, 商品レコードのリスト) を返す
+
+    結果dictはエラー判定とログ用の count / error / error_description / has_items のみを持つ。
+    商品の生のdictは変換後すぐに破棄する。
+    """
+    result = json.loads(body)
+    summary = {key: result[key] for key in ("count", "error", "error_description") if key in result}
+    summary["has_items"] = "Items" in result
+    items = [make_search_item(item, jan_code, caption_classifier) for item in result.get("Items") or []]
+    return summary, items
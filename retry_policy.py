@@ -0,0 +1,170 @@
+import time
+import threading
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+# ======= リトライ対象の判定とサーキットブレーカー =======
+
+# エラーの分類
+PERMANENT = "permanent"  # 再試行しても結果が変わらない（入力・設定の誤り）
+RATE_LIMIT = "rate_limit"  # レート制限（サーバーの指定に従って待つ）
+TRANSIENT = "transient"  # 一時的な障害（待って再試行する）
+
+# 再試行しても成功しないエラー
+class PermanentError(ValueError):
+    """無効なJANコード・認証情報の未設定・不正なパラメータなど"""
+
+# レート制限を受けたエラー
+class RateLimitError(Exception):
+    """HTTP 429 など。retry_afterはサーバーが指定した待機秒数（指定がなければNone）"""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# 一時的な障害によるエラー
+class TransientError(Exception):
+    """HTTP 5xx など。statusはHTTPステータスコード（なければNone）"""
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+# サーキットブレーカーが開いているため実行しなかったエラー
+class CircuitOpenError(Exception):
+    """障害が続いたため、これ以上リクエストを送らない"""
+
+# Retry-Afterヘッダーを秒数に変換
+def parse_retry_after(value, now=None):
+    """秒数またはHTTP日付の値を待機秒数に変換する（解釈できなければNone）"""
+    if value is None or value == "":
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    now = now if now is not None else datetime.now(retry_at.tzinfo)
+    return max(0.0, (retry_at - now).total_seconds())
+
+# HTTP応答からエラーを作成
+def error_for_response(status_code, headers=None, message=None):
+    """ステータスコードに応じた分類のエラーを返す（429はレート制限、5xxは一時的、その他の4xxは恒久的）"""
+    message = message or f"API応答エラー：ステータスコード {status_code}"
+    retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+    if status_code == 429:
+        return RateLimitError(message, retry_after)
+    if status_code >= 500 or status_code in (408, 425):
+        return TransientError(message, status_code, retry_after)
+    return PermanentError(message)
+
+# エラーの分類
+def classify_error(error):
+    """(分類, サーキットブレーカーの失敗として数えるか) を返す
+
+    分類できない例外は従来どおり一時的な障害として再試行する。
+    接続エラー・タイムアウト（OSErrorの派生。requestsの例外を含む）はサーバー障害として数える。
+    """
+    if isinstance(error, (PermanentError, CircuitOpenError)):
+        return PERMANENT, False
+    if isinstance(error, RateLimitError):
+        return RATE_LIMIT, True
+    if isinstance(error, TransientError):
+        return TRANSIENT, error.status is None or error.status >= 500
+    if isinstance(error, OSError):
+        return TRANSIENT, True
+    return TRANSIENT, False
+
+# プロセス全体で共有するサーキットブレーカー
+class CircuitBreaker:
+    """レート制限・サーバー障害が連続したら一定時間リクエストを止め、繰り返す場合は以降のリクエストを中止する
+
+    - failure_threshold回連続で失敗すると開き、cooldown秒（Retry-Afterの指定が長ければその秒数）待つ
+    - 待機後の最初の結果で判定し、失敗ならすぐに再び開く（成功なら通常に戻る）
+    - max_trips回を超えて開いた場合は停止し、以降はCircuitOpenErrorで即座に失敗させる
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60, max_trips=3, on_state_change=None):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.cooldown = float(cooldown)
+        self.max_trips = int(max_trips)
+        self.on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._half_open = False
+        self._open_until = 0.0
+        self.stopped = False
+        self.counters = {"trips": 0, "paused_seconds": 0.0, "rejected": 0}
+
+    # リクエスト前の確認
+    def before_call(self):
+        """開いている間は待機し、停止している場合はCircuitOpenErrorを送出する"""
+        while True:
+            with self._lock:
+                if self.stopped:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError("障害が続いたためリクエストを中止しました")
+                wait_time = self._open_until - time.monotonic()
+                if wait_time <= 0:
+                    return
+            time.sleep(wait_time)
+
+    # 成功の記録
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._half_open = False
+
+    # 失敗の記録
+    def record_failure(self, retry_after=None):
+        """連続失敗が閾値に達したら開く（待機後の最初の失敗ならすぐに開く）"""
+        with self._lock:
+            if self.stopped or time.monotonic() < self._open_until:
+                return  # 開く前に送信したリクエストの失敗は数えない
+            self._failures += 1
+            if self._failures < self.failure_threshold and not self._half_open:
+                return
+
+            self._failures = 0
+            self._half_open = True
+            self.counters["trips"] += 1
+            if self.counters["trips"] > self.max_trips:
+                self.stopped = True
+                state, pause = "stopped", 0.0
+            else:
+                pause = max(self.cooldown, retry_after or 0.0)
+                self._open_until = max(self._open_until, time.monotonic() + pause)
+                self.counters["paused_seconds"] += pause
+                state = "open"
+            trips = self.counters["trips"]
+
+        if self.on_state_change:
+            self.on_state_change(state, trips, pause)
+
+# リトライの統計（全スレッドで共有）
+class RetryStats:
+    """分類ごとの再試行・断念の件数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {"retries": {PERMANENT: 0, RATE_LIMIT: 0, TRANSIENT: 0},
+                         "gave_up": {PERMANENT: 0, RATE_LIMIT: 0, TRANSIENT: 0},
+                         "waited_seconds": 0.0}
+
+    def record_retry(self, kind, wait_time):
+        with self._lock:
+            self.counters["retries"][kind] += 1
+            self.counters["waited_seconds"] += wait_time
+
+    def record_give_up(self, kind):
+        with self._lock:
+            self.counters["gave_up"][kind] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"retries": dict(self.counters["retries"]), "gave_up": dict(self.counters["gave_up"]),
+                    "waited_seconds": self.counters["waited_seconds"]}
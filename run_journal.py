@@ -0,0 +1,127 @@
+import os
+import json
+from datetime import datetime
+
+# ======= 実行の途中経過の記録（中断時の再開用） =======
+
+# 監視実行のジャーナル
+class RunJournal:
+    """取得対象・取得結果・完了した段階を1行1件のJSONで追記し、中断した実行を再開できるようにする
+
+    - start: 実行の開始（取得対象のJANコードの一覧）
+    - result: 1JANの取得結果（エラーになったJANは記録せず、再開時に取得し直す）
+    - phase: 完了した段階（価格時系列の追記・商品リストの保存など）と、その後の処理に必要な値
+      （商品リストを保存する前の通知対象saving、通知対象を選んだ段階notifyingと、投稿に成功するたびに書き直すnotifiedもここに記録する）
+    途中で切れた末尾の行は読み込み時に削除する。実行が最後まで完了したらファイルを削除する。
+    """
+
+    def __init__(self, path="run_journal.jsonl", sync_interval=100):
+        self.path = path
+        self.sync_interval = sync_interval  # この件数ごとにディスクへ書き出す（各行はflush済み）
+        self.header = None
+        self.results = {}
+        self.phases = {}
+        self.skipped_lines = 0
+        self._file = None
+        self._unsynced = 0
+
+    # 既存のジャーナルの読み込み
+    def load(self):
+        """ファイルがあれば内容を読み込み、再開できる実行があるかを返す"""
+        self.header = None
+        self.results = {}
+        self.phases = {}
+        self.skipped_lines = 0
+        if not os.path.exists(self.path):
+            return False
+
+        # 書き込み途中で切れた末尾の行は削除する（続けて追記した行と連結させないため）
+        with open(self.path, "rb+") as f:
+            content = f.read()
+            complete_length = content.rfind(b"\n") + 1
+            if complete_length < len(content):
+                f.truncate(complete_length)
+                self.skipped_lines += 1
+
+        for line in content[:complete_length].decode("utf-8", errors="replace").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                self.skipped_lines += 1
+                continue
+            entry_type = entry.get("type")
+            if entry_type == "start":
+                self.header = entry
+            elif entry_type == "result":
+                self.results[entry["jan_code"]] = entry["product_info"]
+            elif entry_type == "phase":
+                self.phases[entry["phase"]] = entry.get("data") or {}
+        return self.header is not None
+
+    @property
+    def resumable(self):
+        return self.header is not None
+
+    # 再開時の取得対象
+    @property
+    def jan_codes(self):
+        return list(self.header["jan_codes"]) if self.header else []
+
+    # 段階の完了確認
+    def has_phase(self, phase):
+        return phase in self.phases
+
+    def _open(self, mode):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, mode, encoding="utf-8")
+        return self._file
+
+    def _write(self, entry, sync=False):
+        f = self._open("a")
+        f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        self._unsynced += 1
+        if sync or self._unsynced >= self.sync_interval:
+            os.fsync(f.fileno())
+            self._unsynced = 0
+
+    # 実行の開始
+    def start(self, jan_codes):
+        """既存の内容を破棄して新しい実行を記録する"""
+        self.close()
+        self._open("w")
+        self.header = {"type": "start", "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                       "jan_codes": list(jan_codes)}
+        self.results = {}
+        self.phases = {}
+        self._write(self.header, sync=True)
+
+    # 取得結果の記録
+    def record_result(self, jan_code, product_info):
+        self.results[jan_code] = product_info
+        self._write({"type": "result", "jan_code": jan_code, "product_info": product_info})
+
+    # 段階の完了の記録
+    def mark(self, phase, **data):
+        self.phases[phase] = data
+        self._write({"type": "phase", "phase": phase, "data": data}, sync=True)
+
+    # 実行の完了
+    def finish(self):
+        """実行が最後まで完了したのでジャーナルを削除する"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.header = None
+        self.results = {}
+        self.phases = {}
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from datetime import datetime
+
+# ======= 共通のログ出力（監視・投稿スクリプトで共有） =======
+
+# ログレベル（標準のloggingモジュールと同じ値）
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# ステータスからレベルを決める（レベルを指定しない呼び出し用）
+WARNING_STATUSES = frozenset(["警告", "注意", "停止", "待機", "中止", "延期"])
+
+# ログ出力の設定値
+LOG_CONFIG = {
+    "level": os.environ.get("LOG_LEVEL", "INFO").upper(),  # 出力する最低レベル（--debugでDEBUG）
+    "file_path": os.environ.get("RUN_LOG_PATH", "run_log.jsonl"),  # JSON Lines形式の出力先（空なら出力しない）
+    "buffer_lines": 256,  # この行数たまったら書き出す
+    "flush_interval": 1.0,  # 前回の書き出しからこの秒数を過ぎたら書き出す
+}
+
+# レベル名を数値に変換
+def parse_level(value):
+    if isinstance(value, int):
+        return value
+    for level, name in LEVEL_NAMES.items():
+        if str(value).upper() == name:
+            return level
+    return INFO
+
+# ステータスからレベルを推定
+def infer_level(status):
+    status = str(status)
+    if status.endswith("失敗") or status.endswith("エラー"):
+        return ERROR
+    if status in WARNING_STATUSES:
+        return WARNING
+    return INFO
+
+# 実行中のログ出力
+class RunLogger:
+    """レベルで絞り込んだログを標準出力とJSON Linesのファイルにまとめて書き出す
+
+    出力しなかった（レベル未満の）行は種類ごとの件数だけを数え、実行の最後に要約として出力する。
+    エラーの行はすぐに書き出す。
+    """
+
+    def __init__(self, level=INFO, file_path=None, script=None):
+        self._lock = threading.Lock()
+        self.level = parse_level(level)
+        self.file_path = file_path
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+        self._console = []
+        self._records = []
+        self._last_flush = time.monotonic()
+        self._second = None
+        self._timestamp = ""
+        self.suppressed = {}  # 種類: 出力しなかった件数
+
+    # 指定レベルのログを出力するか
+    def is_enabled(self, level):
+        return level >= self.level
+
+    # 秒単位の時刻の文字列（同じ秒の間は使い回す）
+    def _format_time(self, now):
+        second = int(now)
+        if second != self._second:
+            self._timestamp = datetime.fromtimestamp(second).strftime("%Y-%m-%d %H:%M:%S")
+            self._second = second
+        return self._timestamp
+
+    def log(self, message_type, target, status, message, level=None):
+        level = infer_level(status) if level is None else level
+        if level < self.level:
+            with self._lock:
+                self.suppressed[message_type] = self.suppressed.get(message_type, 0) + 1
+            return
+
+        now = time.time()
+        with self._lock:
+            timestamp = self._format_time(now)
+            self._console.append(f"[{timestamp}] [{message_type}] [{target}] [{status}] {message}\n")
+            if self.file_path:
+                self._records.append({"time": timestamp, "level": LEVEL_NAMES.get(level, str(level)),
+                                      "script": self.script, "type": message_type, "target": str(target),
+                                      "status": status, "message": str(message)})
+            due = (level >= ERROR or len(self._console) >= LOG_CONFIG["buffer_lines"]
+                   or time.monotonic() - self._last_flush >= LOG_CONFIG["flush_interval"])
+        if due:
+            self.flush()
+
+    # バッファの書き出し
+    def flush(self):
+        """ためた行を標準出力とファイルに書き出す（サブプロセスの起動・プロセスの複製の前にも呼ぶ）"""
+        with self._lock:
+            console, self._console = self._console, []
+            records, self._records = self._records, []
+            self._last_flush = time.monotonic()
+            if console:
+                sys.stdout.write("".join(console))
+                sys.stdout.flush()
+            if records and self.file_path:
+                try:
+                    # 投稿スクリプト・シャードのプロセスも同じファイルに追記するため、書き出しごとに開き直す
+                    with open(self.file_path, "a", encoding="utf-8") as f:
+                        f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+                except OSError as e:
+                    sys.stderr.write(f"ログファイルに書き込めません: {e}\n")
+
+    # 複製された子プロセスでの初期化
+    def _reset_after_fork(self):
+        """親プロセスの未出力の行・件数を引き継がない"""
+        self._lock = threading.Lock()
+        self._console = []
+        self._records = []
+        self.suppressed = {}
+
+    # 出力しなかった行の要約
+    def summarize(self):
+        """レベル未満のため出力しなかった行を種類ごとの件数で出力する"""
+        with self._lock:
+            suppressed, self.suppressed = self.suppressed, {}
+        if suppressed:
+            self.log("ログ", "システム", "集計",
+                     "詳細ログ（--debugで表示）: " + ", ".join(f"{name} {count}件" for name, count in
+                                                        sorted(suppressed.items(), key=lambda item: -item[1])))
+
+_logger = RunLogger(LOG_CONFIG["level"], LOG_CONFIG["file_path"])
+atexit.register(lambda: (_logger.summarize(), _logger.flush()))
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_logger._reset_after_fork)
+
+# ログ出力の設定
+def configure_logging(level=None, file_path=None, script=None, truncate=False):
+    """エントリポイントで呼ぶ。truncate=Trueなら前回の実行のログファイルを空にする"""
+    _logger.flush()
+    if level is not None:
+        _logger.level = parse_level(level)
+    if file_path is not None:
+        _logger.file_path = file_path or None
+    if script is not None:
+        _logger.script = script
+    if truncate and _logger.file_path:
+        try:
+            open(_logger.file_path, "w", encoding="utf-8").close()
+        except OSError as e:
+            sys.stderr.write(f"ログファイルを初期化できません: {e}\n")
+    return _logger
+
+# ログ出力関数
+def log_message(message_type, target, status, message, level=None):
+    """[時刻] [種類] [対象] [ステータス] メッセージ の形式で出力する（levelを省略するとステータスから決める）"""
+    _logger.log(message_type, target, status, message, level)
+
+def is_enabled(level):
+    return _logger.is_enabled(level)
+
+def flush_logs():
+    _logger.flush()
+
+def summarize_logs():
+    _logger.summarize()
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import bisect
+import threading
+from datetime import datetime
+
+# ======= 実行ごとの計測（段階ごとの所要時間・ヒストグラム・カウンター） =======
+
+# ヒストグラムの区切り（上限値）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 秒
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)  # バイト
+
+# 計測値の名前の接頭辞（Prometheus形式の出力で使う）
+METRIC_PREFIX = "price_monitor"
+
+# 段階の所要時間の計測
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.add_stage_time(self.name, time.perf_counter() - self.start)
+        return False
+
+# 固定の区切りのヒストグラム
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最後は上限なし（+Inf）
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.total, "buckets": buckets}
+
+# 実行ごとの計測値（全スレッドで共有）
+class RunMetrics:
+    """段階ごとの所要時間・ヒストグラム・カウンターを集め、実行の最後にJSONとPrometheus形式で書き出す
+
+    段階の所要時間は同じ名前の区間の合計（複数スレッドで並行して計測した段階は各スレッドの時間の合計）。
+    """
+    enabled = True
+
+    def __init__(self, histogram_buckets=None):
+        self._lock = threading.Lock()
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._start = time.perf_counter()
+        self.stages = {}  # 段階名: {"seconds": 合計秒数, "calls": 回数}
+        self.counters = {}  # (名前, ラベルのタプル): 値
+        self.histograms = {}  # 名前: Histogram
+        self.histogram_buckets = dict(histogram_buckets or {})
+
+    # 段階の所要時間を計測するコンテキストマネージャー
+    def stage(self, name):
+        return _StageTimer(self, name)
+
+    def add_stage_time(self, name, seconds):
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {"seconds": 0.0, "calls": 0}
+            stage["seconds"] += seconds
+            stage["calls"] += 1
+
+    # カウンターの加算
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    # ヒストグラムへの記録
+    def observe(self, name, value):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.histogram_buckets.get(name, LATENCY_BUCKETS))
+            histogram.observe(value)
+
+    # 計測値の要約
+    def summary(self):
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "total"] = value
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": time.perf_counter() - self._start,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": counters,
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    # Prometheusのテキスト形式
+    def to_prometheus(self):
+        summary = self.summary()
+        lines = [f"# TYPE {METRIC_PREFIX}_run_elapsed_seconds gauge",
+                 f"{METRIC_PREFIX}_run_elapsed_seconds {summary['elapsed_seconds']:.6f}",
+                 f"# TYPE {METRIC_PREFIX}_stage_seconds gauge"]
+        for name, stage in summary["stages"].items():
+            lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{name}"}} {stage["seconds"]:.6f}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_calls gauge")
+        for name, stage in summary["stages"].items():
+            lines.append(f'{METRIC_PREFIX}_stage_calls{{stage="{name}"}} {stage["calls"]}')
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+                declared.add(name)
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{METRIC_PREFIX}_{name}_total{{{label_text}}} {value}" if label_text
+                         else f"{METRIC_PREFIX}_{name}_total {value}")
+
+        for name, histogram in summary["histograms"].items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{METRIC_PREFIX}_{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{METRIC_PREFIX}_{name}_sum {histogram['sum']:.6f}")
+            lines.append(f"{METRIC_PREFIX}_{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    # JSONとPrometheus形式のファイルに書き出す
+    def write(self, json_path, prometheus_path):
+        """書き出したファイルのパスを返す（一時ファイルに書いてから置き換える）"""
+        written = []
+        outputs = ((json_path, lambda: json.dumps(self.summary(), ensure_ascii=False, indent=2) + "\n"),
+                   (prometheus_path, self.to_prometheus))
+        for path, render in outputs:
+            if not path:
+                continue
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(render())
+            os.replace(temp_path, path)
+            written.append(path)
+        return written
+
+# 計測を無効にした場合の代わり（何も記録しない）
+class _NullStageTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+class NullMetrics:
+    """計測無効時に使う。各メソッドは何もしない"""
+    enabled = False
+    _timer = _NullStageTimer()
+
+    def stage(self, name):
+        return self._timer
+
+    def add_stage_time(self, name, seconds):
+        pass
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, value):
+        pass
+
+    def summary(self):
+        return {}
+
+    def write(self, json_path, prometheus_path):
+        return []
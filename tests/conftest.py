@@ -0,0 +1,4 @@
+import os
+
+# テスト中は実行ログ（run_log.jsonl）を書き出さない
+os.environ.setdefault("RUN_LOG_PATH", "")
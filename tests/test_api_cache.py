@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import monitor
+
+# キャッシュを開けない場合は1回の実行で1度だけ試し、エラーも1度だけ記録する
+def test_unopenable_cache_is_tried_once_per_run(tmp_path, monkeypatch):
+    messages = []
+    monkeypatch.setattr(monitor, "log_message", lambda *args, **kwargs: messages.append(args))
+    monkeypatch.setitem(monitor.CONFIG, "api_cache_path", str(tmp_path / "missing" / "api_cache.sqlite3"))
+    opened = []
+    def open_cache(*args, **kwargs):
+        opened.append(args)
+        raise OSError("unable to open database file")
+    monkeypatch.setattr(monitor, "ResponseCache", open_cache)
+
+    assert [monitor.get_api_cache() for _ in range(50)] == [None] * 50
+    assert len(opened) == 1
+    assert [args for args in messages if args[0] == "APIキャッシュ"] == [
+        ("APIキャッシュ", "システム", "エラー", "キャッシュを開けないため無効化します: unable to open database file")]
+
+    # 次の実行では開き直す
+    monitor.close_api_cache()
+    assert monitor.get_api_cache() is None
+    assert len(opened) == 2
+    monitor.close_api_cache()
@@ -0,0 +1,53 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from candidate_scoring import CandidateContext, CandidateScorer
+
+JAN_CODE = "4548736143579"
+
+# 検索結果の候補（採点に使う項目のみ）
+class Item:
+    def __init__(self, item_name, item_price, shop_name="ショップ", jan_in_caption=False):
+        self.item_name = item_name
+        self.item_price = item_price
+        self.shop_name = shop_name
+        self.jan_in_caption = jan_in_caption
+
+def make_context(reference_price=30000):
+    return CandidateContext(JAN_CODE, "ソニー ワイヤレスイヤホン WF-1000XM5 ブラック", reference_price)
+
+# 基準価格より極端に安くても、同じ商品（JANコード・商品名が一致）なら値下がりとして選ぶ
+def test_genuine_price_drop_is_selected():
+    genuine = Item("【大特価】ソニー ワイヤレスイヤホン WF-1000XM5 ブラック", 8000, jan_in_caption=True)
+    regular = Item("ソニー ワイヤレスイヤホン WF-1000XM5 ブラック", 29800)
+    selected, _, rejected = CandidateScorer().select([regular, genuine], make_context())
+    assert selected is genuine
+    assert rejected["price_outlier"] == 0
+
+    # 説明文にJANコードがなくても、商品名が一致すれば残す
+    genuine.jan_in_caption = False
+    selected, _, _ = CandidateScorer().select([regular, genuine], make_context())
+    assert selected is genuine
+
+# JANコードも商品名も一致しない安い候補（付属品など）は除外する
+def test_low_priced_accessory_is_rejected():
+    accessory = Item("イヤーピース 交換用 シリコン Mサイズ 4個入り", 1200)
+    regular = Item("ソニー ワイヤレスイヤホン WF-1000XM5 ブラック", 29800)
+    selected, _, rejected = CandidateScorer().select([accessory, regular], make_context())
+    assert selected is regular
+    assert rejected["price_outlier"] == 1
+
+# 全候補が外れ値の場合は価格が実際に変わったとみなして、外れ値判定なしで選ぶ
+def test_all_outliers_fall_back_to_normal_selection():
+    cheaper = Item("ワイヤレスイヤホン 充電ケース 単品", 2000)
+    cheapest = Item("イヤホン用 イヤーピース", 1500)
+    selected, _, rejected = CandidateScorer().select([cheaper, cheapest], make_context())
+    assert selected is cheapest
+    assert rejected["price_outlier"] == 2
+
+    # 基準価格より極端に高い候補だけの場合も同じ
+    expensive = Item("ソニー ワイヤレスイヤホン WF-1000XM5 ブラック 5個セット", 150000)
+    selected, _, rejected = CandidateScorer().select([expensive], make_context())
+    assert selected is expensive
+    assert rejected["price_outlier"] == 1
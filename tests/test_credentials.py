@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import stat
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import credentials
+from credentials import CredentialCache, CredentialManager, fingerprint
+
+# 投稿先ごとのスレッドから同時に保存しても、失敗・破損しない
+def test_concurrent_save(tmp_path, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(credentials, "log_message", lambda *args, **kwargs: warnings.append(args))
+    path = tmp_path / "credential_cache.json"
+    cache = CredentialCache(str(path))
+
+    def save_repeatedly(name):
+        for i in range(300):
+            cache.put(name, {"token": f"{name}-{i}", "validated_at": i})
+            cache.save()
+
+    threads = [threading.Thread(target=save_repeatedly, args=(name,)) for name in ("threads", "twitter")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert warnings == []
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    assert entries == {"threads": {"token_fingerprint": fingerprint("threads-299"), "validated_at": 299},
+                       "twitter": {"token_fingerprint": fingerprint("twitter-299"), "validated_at": 299}}
+    assert os.listdir(tmp_path) == ["credential_cache.json"]  # 一時ファイルが残らない
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+# 元の認証情報のトークンを期限前に更新する投稿先
+class RefreshingCredentials(CredentialManager):
+    name = "test"
+
+    def __init__(self, cache, refreshed_token):
+        super().__init__(cache, {"validate_interval_hours": 24, "refresh_before_days": 7})
+        self.refreshed_token = refreshed_token
+        self.validated = []
+
+    def source(self):
+        return "source-token"
+
+    def fetch(self):
+        return {"token": "source-token", "expires_at": None, "validated_at": None, "refreshable": True}
+
+    def validate(self, entry):
+        self.validated.append(entry["token"])
+        return True
+
+    def refresh(self, token):
+        return self.refreshed_token, 1e12
+
+# キャッシュファイルにはトークンを平文で保存しない（鍵がなければ更新したトークンも保存しない）
+def test_cache_file_has_no_token(tmp_path):
+    path = str(tmp_path / "credential_cache.json")
+    assert RefreshingCredentials(CredentialCache(path), "refreshed-token").get_token() == "refreshed-token"
+    text = open(path, encoding="utf-8").read()
+    assert "source-token" not in text and "refreshed-token" not in text
+    assert json.loads(text)["test"]["token_fingerprint"] == fingerprint("refreshed-token")
+
+    # 次の実行は元の認証情報のトークンを検証し直して使う
+    manager = RefreshingCredentials(CredentialCache(path), "refreshed-token")
+    assert manager.get_token() == "source-token"
+    assert manager.validated == ["source-token"]
+
+# 鍵があれば更新したトークンを暗号化して次の実行に引き継ぐ
+def test_refreshed_token_is_encrypted_with_cache_key(tmp_path):
+    fernet = pytest.importorskip("cryptography.fernet")
+    key = fernet.Fernet.generate_key().decode("ascii")
+    path = str(tmp_path / "credential_cache.json")
+    assert RefreshingCredentials(CredentialCache(path, key), "refreshed-token").get_token() == "refreshed-token"
+    assert "refreshed-token" not in open(path, encoding="utf-8").read()
+
+    manager = RefreshingCredentials(CredentialCache(path, key), "other-token")
+    assert manager.get_token() == "refreshed-token"
+    assert manager.validated == []  # 検証済み・期限前なので検証も更新もしない
+
+    # 鍵が違えば復号できず、元の認証情報のトークンを検証し直して使う
+    manager = RefreshingCredentials(CredentialCache(path, fernet.Fernet.generate_key().decode("ascii")), "other-token")
+    assert manager.get_token() == "source-token"
+    assert manager.validated == ["source-token"]
+
+# 以前の形式で保存されたトークンは使わず、次の保存で消える
+def test_plaintext_token_from_old_cache_is_dropped(tmp_path):
+    path = tmp_path / "credential_cache.json"
+    path.write_text(json.dumps({"test": {"token": "leaked-token", "source": fingerprint("source-token"),
+                                         "expires_at": 1e12, "validated_at": 1e12, "refreshable": True}}),
+                    encoding="utf-8")
+    manager = RefreshingCredentials(CredentialCache(str(path)), "refreshed-token")
+    assert manager.get_token() != "leaked-token"
+    assert "leaked-token" not in path.read_text(encoding="utf-8")
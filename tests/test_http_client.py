@@ -0,0 +1,54 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
+# keep-aliveで応答するローカルサーバー
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# 同じ接続を使い回したリクエストは再利用として数える
+def test_keep_alive_requests_are_counted_as_reused():
+    server = start_server()
+    try:
+        http_client.close_sessions()
+        for _ in range(5):
+            assert http_client.get(f"http://127.0.0.1:{server.server_port}/").status_code == 200
+        assert http_client.get_connection_stats() == {
+            "127.0.0.1": {"requests": 5, "connections_opened": 1, "connections_reused": 4}}
+    finally:
+        http_client.close_sessions()
+        server.shutdown()
+
+# 接続プールが追い出されても、それまでの統計は失われない
+def test_stats_survive_pool_eviction(monkeypatch):
+    monkeypatch.setitem(http_client.HTTP_CONFIG, "pool_connections", 1)
+    servers = [start_server(), start_server()]
+    try:
+        http_client.close_sessions()
+        for _ in range(3):
+            for server in servers:  # ポートごとのプールが交互に追い出される
+                assert http_client.get(f"http://127.0.0.1:{server.server_port}/").status_code == 200
+        assert http_client.get_connection_stats() == {
+            "127.0.0.1": {"requests": 6, "connections_opened": 6, "connections_reused": 0}}
+    finally:
+        http_client.close_sessions()
+        for server in servers:
+            server.shutdown()
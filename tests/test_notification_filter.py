@@ -0,0 +1,88 @@
+import os
+import sys
+import random
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import monitor
+from notification_history import NotificationHistory, HISTORY_TIME_FORMAT
+
+NOW = 1780000000.0
+
+# 配列化する前の1件ずつの判定（比較の基準）
+def filter_one_by_one(changed_products, product_store, threshold, notification_history, current_time):
+    notifiable = []
+    for product in changed_products:
+        jan_code = str(product["jan_code"])
+        if abs(product["price_change_rate"]) < monitor.CONFIG["min_price_change_percentage"]:
+            continue
+        if abs(product["current_price"] - product["previous_price"]) < monitor.CONFIG["min_price_change_amount"]:
+            continue
+        has_stock = product["current_availability"] == "在庫あり"
+        if not has_stock:
+            continue
+        if jan_code in notification_history:
+            try:
+                hours_since_last = notification_history.hours_since_notified(jan_code, current_time)
+                if hours_since_last < monitor.CONFIG["min_notification_interval_hours"]:
+                    continue
+                last_price = notification_history.last_notified_price(jan_code)
+                price_diff_percent = abs((product["current_price"] - last_price) / last_price * 100) if last_price > 0 else 100
+                if price_diff_percent < threshold:
+                    continue
+            except Exception:
+                pass
+        if jan_code not in product_store:
+            continue
+        price_reduced = product["price_change_rate"] < 0 and abs(product["price_change_rate"]) >= threshold
+        stock_restored = product["previous_availability"] == "在庫なし" and product["current_availability"] == "在庫あり"
+        if (price_reduced or stock_restored) and has_stock:
+            notifiable.append(product)
+    return notifiable
+
+# 境界値・解析できない履歴を含む変動商品と通知履歴
+def make_batch(seed, size=200):
+    rnd = random.Random(seed)
+    jan_codes = [f"49{i:011d}" for i in range(size // 2)]
+    product_store = set(rnd.sample(jan_codes, len(jan_codes) * 9 // 10))
+
+    history = {}
+    for jan_code in rnd.sample(jan_codes, len(jan_codes) // 2):
+        hours_ago = rnd.choice([rnd.uniform(0, 200), 72, 71.5, 72.5])
+        notified_time = rnd.choice([datetime.fromtimestamp(NOW - hours_ago * 3600).strftime(HISTORY_TIME_FORMAT)] * 8
+                                   + ["不正な時刻", None])
+        price = rnd.choice([rnd.randint(1000, 50000)] * 6 + [0, -100, None, "1000", True])
+        entry = {"product_name": "商品", "last_notified_time": notified_time}
+        if rnd.random() < 0.95:
+            entry["price"] = price
+        history[jan_code] = entry
+
+    changed_products = []
+    for _ in range(size):
+        previous_price = rnd.randint(1000, 50000)
+        current_price = rnd.choice([previous_price + rnd.randint(-20000, 20000), previous_price - 499,
+                                    previous_price - 500, previous_price + 500, previous_price])
+        current_price = max(1, current_price)
+        changed_products.append({
+            "jan_code": int(rnd.choice(jan_codes)) if rnd.random() < 0.1 else rnd.choice(jan_codes),
+            "current_price": current_price,
+            "previous_price": previous_price,
+            "price_change_rate": rnd.choice([(current_price - previous_price) / previous_price * 100, 1.0, 0.99, -5.0, -4.99]),
+            "current_availability": rnd.choice(["在庫あり", "在庫あり", "在庫なし", "不明"]),
+            "previous_availability": rnd.choice(["在庫あり", "在庫なし", "不明"]),
+        })
+    return changed_products, product_store, history
+
+# 配列による一括判定が1件ずつの判定と同じ商品を通知対象に選ぶ
+def test_mask_filter_matches_one_by_one_filter(monkeypatch):
+    monkeypatch.setattr(monitor, "log_message", lambda *args, **kwargs: None)
+    monkeypatch.setattr(monitor.time, "time", lambda: NOW)
+    for seed in range(200):
+        changed_products, product_store, history = make_batch(seed)
+        notification_history = NotificationHistory(history)
+        monkeypatch.setattr(monitor, "get_notification_history_service", lambda: notification_history)
+        for threshold in (5, 10):
+            expected = filter_one_by_one(changed_products, product_store, threshold, notification_history, NOW)
+            notifiable, rejections = monitor.filter_notifiable_products(changed_products, product_store, threshold)
+            assert [id(product) for product in notifiable] == [id(product) for product in expected], seed
+            assert sum(rejections.values()) + len(notifiable) == len(changed_products)
@@ -0,0 +1,84 @@
+import os
+import csv
+import sys
+import json
+import random
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子プロセスで楽天APIの代わりに決まった検索結果を返して監視を実行する（JANごとに応答時間を変えて完了順を入れ替える）
+RUN_MONITOR = """
+import os, sys, json, time, zlib, random, urllib.parse
+sys.path.insert(0, {root!r})
+import monitor
+
+class FakeResponse:
+    def __init__(self, body):
+        self.status_code = 200
+        self._body = body
+        self.text = json.dumps(body)
+        self.content = self.text.encode("utf-8")
+        self.headers = {{}}
+
+    def json(self):
+        return self._body
+
+def fake_get(url, params=None, **kwargs):
+    jan_code = (params or dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)))["keyword"]
+    rnd = random.Random(zlib.crc32(jan_code.encode("utf-8")))
+    time.sleep(rnd.uniform(0, 0.01))
+    items = []
+    for i in range(rnd.randint(0, 4)):
+        items.append({{"Item": {{
+            "itemName": ("中古 " if rnd.random() < 0.2 else "") + f"テスト商品 {{jan_code}} {{i}}",
+            "itemPrice": rnd.randint(1000, 30000), "shopName": f"shop{{i}}", "availability": rnd.choice([0, 1, 1]),
+            "itemUrl": f"http://example.com/{{jan_code}}/{{i}}", "affiliateUrl": "", "itemCode": f"shop{{i}}:{{jan_code}}",
+            "itemCaption": f"JAN {{jan_code}}" if rnd.random() < 0.5 else "",
+            "mediumImageUrls": [{{"imageUrl": "http://example.com/image.jpg"}}]}}}})
+    return FakeResponse({{"count": len(items), "Items": items}})
+
+monitor.http_client.get = fake_get
+monitor.post_notifiable_products = lambda *args, **kwargs: []
+notified_products = monitor.monitor_products(max_workers=int(os.environ["WORKERS"]))
+with open("notified_products.json", "w", encoding="utf-8") as f:
+    json.dump([{{key: value for key, value in product.items() if key != "timestamp"}} for product in notified_products],
+              f, ensure_ascii=False, sort_keys=True)
+"""
+
+def write_product_list(workdir, seed=7, size=80):
+    rnd = random.Random(seed)
+    with open(workdir / "product_list.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["jan_code", "product_name", "last_price", "last_availability", "monitor_flag",
+                         "notified_flag", "last_notified_price", "last_notified_time"])
+        for i in range(size):
+            last_price = rnd.choice([0, rnd.randint(1000, 30000), rnd.randint(1000, 30000)])
+            writer.writerow([f"49{i:011d}", f"テスト商品 49{i:011d}" if last_price else "", last_price,
+                             rnd.choice(["在庫あり", "在庫なし"]) if last_price else "unknown", True, False, 0, ""])
+
+def run_monitor(workdir, workers):
+    write_product_list(workdir)
+    env = dict(os.environ, RAKUTEN_APP_ID="test", RAKUTEN_API_RATE_LIMIT="0", WORKERS=str(workers),
+               RUN_METRICS="0", ADAPTIVE_POLLING="0", PRICE_SERIES_DIR=str(workdir / "price_series"), RUN_LOG_PATH="")
+    completed = subprocess.run([sys.executable, "-c", RUN_MONITOR.format(root=ROOT)], cwd=workdir, env=env,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+
+    with open(workdir / "product_list.csv", encoding="utf-8") as f:
+        rows = [{key: value for key, value in row.items() if key != "last_updated"} for row in csv.DictReader(f)]
+    with open(workdir / "notified_products.json", encoding="utf-8") as f:
+        notified_products = json.load(f)
+    return rows, notified_products
+
+# 並列に取得しても、逐次取得と同じ商品リスト・通知対象になる
+def test_parallel_fetch_matches_sequential_fetch(tmp_path):
+    (tmp_path / "sequential").mkdir()
+    (tmp_path / "parallel").mkdir()
+    sequential_rows, sequential_notified = run_monitor(tmp_path / "sequential", 1)
+    parallel_rows, parallel_notified = run_monitor(tmp_path / "parallel", 8)
+
+    assert parallel_rows == sequential_rows
+    assert parallel_notified == sequential_notified
+    assert any(row["last_price"] not in ("0", "") for row in sequential_rows)
+    assert sequential_notified  # 通知対象がある場合を比較している
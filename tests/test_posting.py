@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import posting
+from posting import Poster, run_posters
+
+# 投稿した商品を記録する投稿先
+class RecordingPoster(Poster):
+    label = "Test"
+    max_posts = 3
+    post_interval = 0
+
+    def __init__(self, platform):
+        self.platform = platform
+        self.published = []
+
+    def create_message(self, product):
+        return product["jan_code"]
+
+    def publish(self, message):
+        self.published.append(message)
+        return {"success": True, "id": message, "platform": self.platform}
+
+def make_products(count):
+    return [{"jan_code": f"49000000000{i:02d}", "product_name": f"商品{i}", "current_price": 1000,
+             "price_change_rate": -10.0} for i in range(count)]
+
+# 再開時は投稿済みの件数を投稿先ごとの上限から差し引く
+def test_resumed_posting_keeps_per_platform_cap(monkeypatch):
+    monkeypatch.setattr(posting, "log_message", lambda *args, **kwargs: None)
+    products = make_products(6)
+    jan_codes = [product["jan_code"] for product in products]
+    first, second, third = RecordingPoster("first"), RecordingPoster("second"), RecordingPoster("third")
+
+    results = run_posters(products, [first, second, third],
+                          exclude={"first": set(jan_codes[:2]), "second": set(jan_codes[:3])})
+
+    assert first.published == jan_codes[2:3]  # 上限3件のうち2件は中断前に投稿済み
+    assert second.published == []  # 中断前に上限まで投稿済み
+    assert third.published == jan_codes[:3]
+    assert [result.platform for result in results] == ["first", "third", "third", "third"]
@@ -0,0 +1,88 @@
+import os
+import sys
+import random
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from product_store import ProductStore, OfferRecord, ChangeRecord
+
+CHANGE_FIELDS = ("previous_price", "previous_availability", "first_fetch", "price_changed",
+                 "availability_changed", "changed", "price_change_rate")
+
+# 欠損値・重複行・初回取得を含む商品リストと取得結果
+def make_batch(seed, size=400):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(size):
+        jan_code = f"49{i:011d}"
+        last_price = rnd.choice([np.nan, 0, 1000, 2500, 9800, rnd.randint(100, 50000)])
+        last_availability = rnd.choice(["在庫あり", "在庫なし", "不明", np.nan])
+        rows.append({"jan_code": jan_code, "product_name": rnd.choice([f"商品{i}", np.nan]), "last_price": last_price,
+                     "last_availability": last_availability, "monitor_flag": True})
+        if rnd.random() < 0.05:
+            rows.append(dict(rows[-1]))  # 重複行
+    df = pd.DataFrame(rows)
+
+    offers = []
+    for row in rnd.sample(rows, len(rows) // 2):
+        price = row["last_price"] if rnd.random() < 0.5 and row["last_price"] == row["last_price"] else rnd.randint(100, 50000)
+        availability = row["last_availability"] if rnd.random() < 0.7 else rnd.choice(["在庫あり", "在庫なし"])
+        offers.append(OfferRecord(f" {row['jan_code']} ", f"取得 {row['jan_code']}", int(price),
+                                  availability if isinstance(availability, str) else "在庫あり", "店", "", ""))
+    offers.append(OfferRecord("0000000000000", "商品リストにない", 100, "在庫あり", "店", "", ""))
+    return df, offers
+
+# ChangeRecordを1件ずつ作る比較（一括比較の基準）
+def apply_one_by_one(store, offers):
+    records = store.records()
+    changes = []
+    for offer in offers:
+        labels = store._index.get(store.normalize_jan_code(offer.jan_code))
+        if labels:
+            record = records[labels[0]]
+            changes.append(ChangeRecord(offer, record.last_price, record.last_availability))
+    return changes
+
+# 一括比較の結果が1件ずつの比較と一致する
+def test_batch_compare_matches_per_offer_change_records():
+    for seed in range(20):
+        df, offers = make_batch(seed)
+        expected = apply_one_by_one(ProductStore(df.copy()), offers)
+        store = ProductStore(df.copy())
+        actual = store.apply_fetch_results(offers)
+
+        assert len(actual) == len(expected)
+        for got, want in zip(actual, expected):
+            assert got.offer is want.offer
+            assert tuple(getattr(got, field) for field in CHANGE_FIELDS) == \
+                   tuple(getattr(want, field) for field in CHANGE_FIELDS)
+            assert all(type(getattr(got, field)) is type(getattr(want, field)) for field in CHANGE_FIELDS)
+
+        # 初回取得・変動のある行だけが書き戻される
+        written = {store.normalize_jan_code(change.offer.jan_code): change.offer
+                   for change in expected if change.first_fetch or change.changed}
+        for label, row in store.df.iterrows():
+            offer = written.get(row["jan_code"])
+            if offer is not None:
+                assert (row["product_name"], row["last_price"], row["last_availability"]) == \
+                       (offer.item_name, offer.item_price, offer.availability)
+            else:
+                original = df.loc[label]
+                assert pd.isna(row["last_price"]) and pd.isna(original["last_price"]) or \
+                       row["last_price"] == original["last_price"]
+
+def test_empty_batch():
+    df, _ = make_batch(0, size=10)
+    assert ProductStore(df).apply_fetch_results([]) == []
+
+# 基準の商品名は選択した出品の商品名で上書きしない（誤った選択が次回の基準にならない）
+def test_reference_name_is_kept_after_fetch():
+    df = pd.DataFrame([{"jan_code": "4900000000011", "product_name": "登録した商品名", "last_price": 1000,
+                        "last_availability": "在庫あり", "monitor_flag": True, "reference_name": "登録した商品名"}])
+    store = ProductStore(df)
+    store.apply_fetch_results([OfferRecord("4900000000011", "別の出品の商品名", 800, "在庫あり", "店", "", "")])
+    assert store.df.loc[0, "product_name"] == "別の出品の商品名"
+    assert store.df.loc[0, "reference_name"] == "登録した商品名"
+    assert ProductStore(store.df).records()[0].reference_name == "登録した商品名"
@@ -0,0 +1,130 @@
+import os
+import csv
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from run_journal import RunJournal
+
+JAN_CODES = ["4900000000011", "4900000000028", "4900000000035", "4900000000042"]
+
+# 子プロセスで再開実行する（CRASH_AFTER件投稿したら次の投稿の途中でプロセスを終了する）
+RUN_MONITOR = """
+import os, sys
+sys.path.insert(0, {root!r})
+import monitor, posting
+
+crash_after = int(os.environ.get("CRASH_AFTER", "0"))
+published = []
+
+class RecordingPoster(posting.Poster):
+    platform = "test"
+    label = "Test"
+    max_posts = 10
+    post_interval = 0
+
+    def create_message(self, product):
+        return str(product["jan_code"])
+
+    def publish(self, message):
+        if crash_after and len(published) >= crash_after:
+            os._exit(9)
+        published.append(message)
+        with open("published.txt", "a", encoding="utf-8") as f:
+            f.write(message + "\\n")
+        return {{"success": True, "id": message, "platform": "test"}}
+
+monitor.create_posters = lambda: [RecordingPoster()]
+
+# 商品リストを保存した直後（記録の前）にプロセスを終了する
+if os.environ.get("CRASH_AFTER_SAVE"):
+    save_product_list = monitor.save_product_list
+    def save_and_crash(df):
+        save_product_list(df)
+        os._exit(9)
+    monitor.save_product_list = save_and_crash
+
+monitor.monitor_products(resume=True)
+"""
+
+def changed_product(jan_code):
+    return {"jan_code": jan_code, "product_name": f"テスト商品 {jan_code}", "current_price": 8000,
+            "previous_price": 10000, "price_change_rate": -20.0, "current_availability": "在庫あり",
+            "previous_availability": "在庫あり", "shop_name": "テストショップ", "item_url": "",
+            "affiliate_url": "", "timestamp": "2026-01-01 00:00:00"}
+
+def run_monitor(workdir, crash_after=0, crash_after_save=False):
+    env = dict(os.environ, RAKUTEN_APP_ID="test", CRASH_AFTER=str(crash_after), RUN_METRICS="0",
+               CRASH_AFTER_SAVE="1" if crash_after_save else "",
+               ADAPTIVE_POLLING="0", PRICE_SERIES_DIR=str(workdir / "price_series"),
+               RUN_LOG_PATH="")
+    return subprocess.run([sys.executable, "-c", RUN_MONITOR.format(root=ROOT)], cwd=workdir, env=env,
+                          capture_output=True, text=True)
+
+def read_published(workdir):
+    path = workdir / "published.txt"
+    return path.read_text(encoding="utf-8").split() if path.exists() else []
+
+def write_product_list(workdir, last_price):
+    with open(workdir / "product_list.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["jan_code", "product_name", "last_price", "last_availability", "monitor_flag",
+                         "notified_flag", "last_notified_price", "last_notified_time", "last_updated"])
+        for jan_code in JAN_CODES:
+            writer.writerow([jan_code, f"テスト商品 {jan_code}", last_price, "在庫あり", True, False, 0, "", ""])
+
+def read_notified_flags(workdir):
+    with open(workdir / "product_list.csv", encoding="utf-8") as f:
+        return {row["jan_code"]: row["notified_flag"] for row in csv.DictReader(f)}
+
+# 投稿中に中断した実行を再開しても、投稿済みの商品を投稿し直さない
+def test_resume_after_crash_during_posting_does_not_repost(tmp_path):
+    write_product_list(tmp_path, 8000)
+
+    # 商品リストの保存まで完了した実行の記録
+    journal = RunJournal(str(tmp_path / "run_journal.jsonl"))
+    journal.start(JAN_CODES)
+    journal.mark("product_list", changed_products=[changed_product(jan_code) for jan_code in JAN_CODES])
+    journal.close()
+
+    crashed = run_monitor(tmp_path, crash_after=2)
+    assert crashed.returncode == 9, crashed.stdout + crashed.stderr
+    assert read_published(tmp_path) == JAN_CODES[:2]
+    assert (tmp_path / "run_journal.jsonl").exists()
+
+    resumed = run_monitor(tmp_path)
+    assert resumed.returncode == 0, resumed.stdout + resumed.stderr
+    published = read_published(tmp_path)
+    assert sorted(published) == sorted(JAN_CODES)  # 各商品を1回ずつ投稿した
+    assert not (tmp_path / "run_journal.jsonl").exists()
+
+    # 中断前に投稿した商品も通知済みとして保存される
+    flags = read_notified_flags(tmp_path)
+    assert all(flags[jan_code] == "True" for jan_code in JAN_CODES), flags
+
+# 商品リストを保存した直後に中断した実行を再開しても、通知対象を失わない
+def test_resume_after_crash_right_after_saving_product_list(tmp_path):
+    write_product_list(tmp_path, 10000)
+
+    # 全商品の取得まで完了した実行の記録（保存済みの商品リストには取得結果の価格が反映される）
+    journal = RunJournal(str(tmp_path / "run_journal.jsonl"))
+    journal.start(JAN_CODES)
+    for jan_code in JAN_CODES:
+        journal.record_result(jan_code, {"item_name": f"テスト商品 {jan_code}", "item_price": 8000,
+                                         "availability": "在庫あり", "shop_name": "テストショップ",
+                                         "item_url": "", "affiliate_url": ""})
+    journal.close()
+
+    crashed = run_monitor(tmp_path, crash_after_save=True)
+    assert crashed.returncode == 9, crashed.stdout + crashed.stderr
+    assert read_published(tmp_path) == []
+    with open(tmp_path / "product_list.csv", encoding="utf-8") as f:
+        assert all(row["last_price"] == "8000" for row in csv.DictReader(f))
+
+    resumed = run_monitor(tmp_path)
+    assert resumed.returncode == 0, resumed.stdout + resumed.stderr
+    assert sorted(read_published(tmp_path)) == sorted(JAN_CODES)
+    assert not (tmp_path / "run_journal.jsonl").exists()
+    flags = read_notified_flags(tmp_path)
+    assert all(flags[jan_code] == "True" for jan_code in JAN_CODES), flags
@@ -1,13 +1,13 @@
 import os
-import json
-import csv
-import requests
-from datetime import datetime
+import time
+import threading
+import http_client
+from credentials import CredentialManager
+from posting import Poster, load_notifiable_products
+from run_log import log_message
 
-# ログ出力関数
-def log_message(message_type, target, status, message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{message_type}] [{target}] [{status}] {message}")
+# スレッズAPIのURL
+THREADS_API_URL = "https://graph.threads.net"
 
 # スレッズ投稿用のメッセージを作成
 def create_threads_message(product):
@@ -67,7 +67,7 @@ def get_threads_access_token():
         
         # POSTリクエストを送信
         log_message("Threads認証", "システム", "進行中", "アクセストークンをリクエスト中...")
-        response = requests.get(token_url, params=params)
+        response = http_client.get(token_url, params=params)
         
         # レスポンスを確認
         if response.status_code == 200:
@@ -84,11 +84,69 @@ def get_threads_access_token():
         log_message("Threads認証", "システム", "失敗", f"エラー: {str(e)}")
         raise
 
+# スレッズの認証情報（キャッシュ・検証・長期アクセストークンの更新）
+class ThreadsCredentials(CredentialManager):
+    name = "threads"
+
+    def source(self):
+        return os.environ.get("THREADS_LONG_LIVED_TOKEN") or (
+            f"{os.environ.get('THREADS_APP_ID', '')}:{os.environ.get('THREADS_APP_SECRET', '')}")
+
+    def fetch(self):
+        # 長期アクセストークンは検証が必要で、期限前に更新できる。クライアントアクセストークンは発行された時点で有効とする
+        long_lived = bool(os.environ.get("THREADS_LONG_LIVED_TOKEN"))
+        token = get_threads_access_token()
+        if not token:
+            raise ValueError("アクセストークンが取得できません")
+        return {"token": token, "expires_at": None, "validated_at": None if long_lived else time.time(),
+                "refreshable": long_lived}
+
+    def validate(self, entry):
+        response = http_client.get(f"{THREADS_API_URL}/v1.0/me",
+                                   params={"fields": "id", "access_token": entry["token"]})
+        return response.status_code == 200
+
+    # 長期アクセストークンの更新（発行から24時間以上経過し、期限切れ前のトークンのみ更新できる）
+    def refresh(self, token):
+        response = http_client.get(f"{THREADS_API_URL}/refresh_access_token",
+                                   params={"grant_type": "th_refresh_token", "access_token": token})
+        if response.status_code != 200:
+            log_message("Threads認証", "システム", "警告",
+                        f"トークン更新エラー: ステータスコード {response.status_code}, レスポンス: {response.text}")
+            return None
+        data = response.json()
+        if not data.get("access_token"):
+            return None
+        expires_in = data.get("expires_in")
+        return data["access_token"], (time.time() + float(expires_in)) if expires_in else None
+
+# スレッズの認証情報（全投稿で共有）
+_threads_credentials = None
+_threads_credentials_lock = threading.Lock()
+
+def get_threads_credentials():
+    global _threads_credentials
+    with _threads_credentials_lock:
+        if _threads_credentials is None:
+            _threads_credentials = ThreadsCredentials()
+        return _threads_credentials
+
+# 認証エラーの応答か（トークンの期限切れ・失効）
+def is_threads_auth_error(response):
+    if response.status_code == 401:
+        return True
+    try:
+        return (response.json().get("error") or {}).get("code") == 190
+    except Exception:
+        return False
+
 # スレッズにAPIを使用して投稿する関数
-def post_to_threads(message):
+def post_to_threads(message, access_token=None):
+    """access_tokenを省略するとキャッシュ済み（この実行で確認済み）のトークンを使う"""
     try:
         # スレッズAPI認証情報
-        access_token = get_threads_access_token()
+        if access_token is None:
+            access_token = get_threads_credentials().get_token()
         
         if not access_token:
             log_message("Threads投稿", "システム", "警告", "アクセストークンの取得に失敗しました")
@@ -101,7 +159,7 @@ def post_to_threads(message):
         log_message("Threads投稿", "システム", "進行中", "ステップ1: コンテナID作成中...")
         
         # ステップ1: コンテナIDの作成（新しいエンドポイント）
-        upload_url = "https://graph.threads.net/v1.0/me/threads"
+        upload_url = f"{THREADS_API_URL}/v1.0/me/threads"
         upload_params = {
             "access_token": access_token,
             "media_type": "TEXT",
@@ -109,7 +167,7 @@ def post_to_threads(message):
         }
         
         # リクエスト送信
-        upload_response = requests.post(upload_url, data=upload_params)
+        upload_response = http_client.post(upload_url, data=upload_params)
         
         if upload_response.status_code != 200:
             error_msg = f"コンテナ作成エラー: ステータスコード {upload_response.status_code}, レスポンス: {upload_response.text}"
@@ -117,6 +175,7 @@ def post_to_threads(message):
             return {
                 "success": False,
                 "error": error_msg,
+                "auth_error": is_threads_auth_error(upload_response),
                 "platform": "threads"
             }
         
@@ -144,14 +203,14 @@ def post_to_threads(message):
         
         # ステップ2: 投稿の公開
         log_message("Threads投稿", "システム", "進行中", "ステップ2: 投稿公開中...")
-        publish_url = "https://graph.threads.net/v1.0/me/threads_publish"
+        publish_url = f"{THREADS_API_URL}/v1.0/me/threads_publish"
         publish_params = {
             "access_token": access_token,
             "creation_id": container_id
         }
         
         # リクエスト送信
-        publish_response = requests.post(publish_url, data=publish_params)
+        publish_response = http_client.post(publish_url, data=publish_params)
         
         if publish_response.status_code != 200:
             error_msg = f"公開エラー: ステータスコード {publish_response.status_code}, レスポンス: {publish_response.text}"
@@ -159,6 +218,7 @@ def post_to_threads(message):
             return {
                 "success": False,
                 "error": error_msg,
+                "auth_error": is_threads_auth_error(publish_response),
                 "platform": "threads"
             }
         
@@ -189,111 +249,57 @@ def post_to_threads(message):
             "platform": "threads"
         }
 
-# 投稿結果を記録
-def record_posting_result(product, post_result):
-    try:
-        # 記録用のファイルがなければ作成
-        if not os.path.exists("threads_posting_log.csv"):
-            with open("threads_posting_log.csv", mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "timestamp", "jan_code", "product_name", "current_price", 
-                    "price_change_rate", "success", "thread_id", "error"
-                ])
-        
-        # 記録を追加
-        with open("threads_posting_log.csv", mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                product["jan_code"],
-                product["product_name"],
-                product["current_price"],
-                product["price_change_rate"],
-                post_result["success"],
-                post_result.get("id", ""),
-                post_result.get("error", "")
-            ])
-            
-    except Exception as e:
-        log_message("投稿記録", product["jan_code"], "失敗", f"エラー: {str(e)}")
-
 # アクセストークンの検証用関数
-def validate_threads_token():
-    """トークンが正常に取得できるかを検証する関数"""
+def validate_threads_token(revalidate=False):
+    """有効なトークンがあるかを確認する関数（キャッシュが古い場合・revalidate=Trueの場合のみAPIで検証する）"""
     try:
-        token = get_threads_access_token()
+        token = get_threads_credentials().get_token(revalidate)
         if token:
-            log_message("Threads認証", "システム", "検証", "アクセストークンの取得に成功しました")
+            log_message("Threads認証", "システム", "検証", "有効なアクセストークンを確認しました")
             return True
         return False
     except Exception as e:
         log_message("Threads認証", "システム", "検証失敗", f"エラー: {str(e)}")
         return False
 
+# スレッズの投稿先
+class ThreadsPoster(Poster):
+    platform = "threads"
+    label = "Threads"
+    log_path = "threads_posting_log.csv"
+    id_column = "thread_id"
+    max_posts = 20
+
+    def __init__(self):
+        self.access_token = None
+
+    # トークンを一度だけ確認し、以降の投稿で使い回す
+    def prepare(self):
+        if not validate_threads_token():
+            return False
+        self.access_token = get_threads_credentials().get_token()
+        return True
+
+    def reauthenticate(self):
+        if not validate_threads_token(revalidate=True):
+            return False
+        self.access_token = get_threads_credentials().get_token()
+        return True
+
+    def create_message(self, product):
+        return create_threads_message(product)
+
+    def publish(self, message):
+        return post_to_threads(message, self.access_token)
+
 # 商品情報をスレッズに投稿するメイン関数
-def post_products_to_threads():
+def post_products_to_threads(products=None):
+    """productsを省略するとnotifiable_products.jsonから読み込む。商品ごとのPostResultのリストを返す"""
     try:
-        # まずトークンの検証を行う
-        if not validate_threads_token():
-            log_message("Threads投稿", "システム", "中止", "アクセストークンの検証に失敗したため処理を中止します")
-            return []
-            
-        # 通知対象の商品がなければ終了
-        if not os.path.exists("notifiable_products.json"):
-            log_message("Threads投稿", "システム", "情報", "通知対象の商品がありません")
-            return []
-            
-        # 通知対象の商品を読み込む
-        with open("notifiable_products.json", "r", encoding="utf-8") as f:
-            notifiable_products = json.load(f)
-            
-        if not notifiable_products:
-            log_message("Threads投稿", "システム", "情報", "通知対象の商品がありません")
-            return []
-            
-        log_message("Threads投稿", "システム", "開始", f"{len(notifiable_products)}件の商品を投稿します")
-        
-        results = []
-        
-        # 投稿数の上限（API制限対策）
-        max_posts = min(20, len(notifiable_products))
-        
-        # 各商品を処理
-        for i in range(max_posts):
-            product = notifiable_products[i]
-            
-            try:
-                # 投稿メッセージを作成
-                threads_message = create_threads_message(product)
-                
-                # スレッズに投稿
-                log_message("Threads投稿", product["jan_code"], "進行中", "Threadsに投稿します")
-                post_result = post_to_threads(threads_message)
-                
-                # 投稿結果を記録
-                record_posting_result(product, post_result)
-                
-                results.append({
-                    "product": product,
-                    "result": post_result
-                })
-                
-                log_message("Threads投稿", product["jan_code"], "完了", 
-                           f"結果: {'成功' if post_result['success'] else '失敗'}")
-                
-                # 連続投稿の場合はAPIレート制限を考慮して少し待機
-                if i < max_posts - 1:
-                    import time
-                    time.sleep(2)
-                    
-            except Exception as e:
-                log_message("Threads投稿", product["jan_code"], "失敗", f"エラー: {str(e)}")
-        
-        log_message("Threads投稿", "システム", "完了", f"{len(results)}件の商品の投稿が完了しました")
-        
-        return results
-        
+        if products is None:
+            products = load_notifiable_products()
+        return ThreadsPoster().post_products(products)
+
     except Exception as e:
         log_message("Threads投稿", "システム", "失敗", f"エラー: {str(e)}")
         return []
@@ -314,7 +320,7 @@ def test_threads_connection():
         log_message("接続テスト", "システム", "情報", f"Instagram ID設定: {'あり' if instagram_account_id else 'なし'}")
         
         # アクセストークン取得テスト
-        token = get_threads_access_token()
+        token = get_threads_credentials().get_token(revalidate=True)
         log_message("接続テスト", "システム", "情報", f"アクセストークン取得: {'成功' if token else '失敗'}")
         
         # 簡易的なテスト投稿
@@ -349,6 +355,7 @@ if __name__ == "__main__":
             
             # 実行結果をログに記録
             log_message("メイン処理", "システム", "完了", f"{len(results)}件の商品をThreadsに投稿しました")
+            log_message("HTTP接続", "システム", "統計", http_client.format_connection_stats())
             
             # notifiable_products.jsonファイルを維持し、GitHubのコミットに含める
             log_message("メイン処理", "システム", "情報", "通知対象商品リストを保持しています（コミット用）")
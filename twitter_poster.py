@@ -1,14 +1,9 @@
 import os
-import json
-import csv
-from datetime import datetime
-import tweepy
-import time
-
-# ログ出力関数
-def log_message(message_type, target, status, message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] [{message_type}] [{target}] [{status}] {message}")
+import threading
+import http_client
+from credentials import CredentialManager
+from posting import Poster, load_notifiable_products
+from run_log import log_message
 
 # テキストを指定した長さに切り詰める
 def truncate_text(text, max_length):
@@ -44,41 +39,88 @@ def create_twitter_message(product):
     
     return twitter_msg
 
+# 環境変数のTwitter API認証情報 (注: 両方の命名規則をサポート)
+def get_twitter_keys():
+    return (
+        os.environ.get("TWITTER_API_KEY") or os.environ.get("TWITTER_CONSUMER_KEY"),
+        os.environ.get("TWITTER_API_SECRET") or os.environ.get("TWITTER_CONSUMER_SECRET"),
+        os.environ.get("TWITTER_ACCESS_TOKEN"),
+        os.environ.get("TWITTER_ACCESS_TOKEN_SECRET"),
+    )
+
+# Twitter APIクライアント（実行ごとに1回だけ作成する）
+_twitter_client = None
+_twitter_client_lock = threading.Lock()
+
+def get_twitter_client():
+    """認証情報が不足している場合はNone（認証の確認は行わない）"""
+    global _twitter_client
+    with _twitter_client_lock:
+        if _twitter_client is None:
+            api_key, api_secret, access_token, access_token_secret = get_twitter_keys()
+            if not all([api_key, api_secret, access_token, access_token_secret]):
+                return None
+            
+            # Twitter APIクライアントを初期化（tweepyは投稿する商品がある場合のみ読み込む）
+            import tweepy
+            client = tweepy.Client(
+                consumer_key=api_key,
+                consumer_secret=api_secret,
+                access_token=access_token,
+                access_token_secret=access_token_secret
+            )
+            
+            # 共通HTTPクライアントの接続プールを使用
+            client.session = http_client.get_session("api.twitter.com")
+            _twitter_client = client
+        return _twitter_client
+
+# Twitterの認証情報（OAuth 1.0aのトークンは期限がないため、検証結果のみキャッシュする）
+class TwitterCredentials(CredentialManager):
+    name = "twitter"
+
+    def source(self):
+        return ":".join(key or "" for key in get_twitter_keys())
+
+    def fetch(self):
+        if get_twitter_client() is None:
+            raise ValueError("Twitter API認証情報が不足しています")
+        return {"token": "", "expires_at": None, "validated_at": None, "refreshable": False}
+
+    # 認証テスト - ユーザー情報を取得して検証
+    def validate(self, entry):
+        me = get_twitter_client().get_me()
+        if not me.data:
+            return False
+        entry["account"] = me.data.username
+        return True
+
+# Twitterの認証情報（全投稿で共有）
+_twitter_credentials = None
+_twitter_credentials_lock = threading.Lock()
+
+def get_twitter_credentials():
+    global _twitter_credentials
+    with _twitter_credentials_lock:
+        if _twitter_credentials is None:
+            _twitter_credentials = TwitterCredentials()
+        return _twitter_credentials
+
 # Twitter APIのセットアップ
-def setup_twitter_api():
-    """Twitter APIの設定と認証テスト"""
+def setup_twitter_api(revalidate=False):
+    """Twitter APIクライアントを返す（認証の確認はキャッシュが古い場合・revalidate=Trueの場合のみAPIで行う）"""
     try:
-        # 環境変数を取得 (注: 両方の命名規則をサポート)
-        api_key = os.environ.get("TWITTER_API_KEY") or os.environ.get("TWITTER_CONSUMER_KEY")
-        api_secret = os.environ.get("TWITTER_API_SECRET") or os.environ.get("TWITTER_CONSUMER_SECRET")
-        access_token = os.environ.get("TWITTER_ACCESS_TOKEN")
-        access_token_secret = os.environ.get("TWITTER_ACCESS_TOKEN_SECRET")
-        
-        # 認証情報が設定されているか確認
-        if not all([api_key, api_secret, access_token, access_token_secret]):
+        client = get_twitter_client()
+        if client is None:
             log_message("Twitter認証", "システム", "警告", "Twitter API認証情報が不足しています")
             return None
-            
-        # Twitter APIクライアントを初期化
-        client = tweepy.Client(
-            consumer_key=api_key,
-            consumer_secret=api_secret,
-            access_token=access_token,
-            access_token_secret=access_token_secret
-        )
         
-        # 認証テスト - ユーザー情報を取得して検証
-        try:
-            me = client.get_me()
-            if me.data:
-                log_message("Twitter認証", "システム", "成功", f"認証成功: @{me.data.username}")
-                return client
-            else:
-                log_message("Twitter認証", "システム", "失敗", "認証テストに失敗しました")
-                return None
-        except Exception as e:
-            log_message("Twitter認証", "システム", "失敗", f"認証テストエラー: {str(e)}")
+        entry = get_twitter_credentials().get(revalidate)
+        if entry is None:
+            log_message("Twitter認証", "システム", "失敗", "認証テストに失敗しました")
             return None
+        log_message("Twitter認証", "システム", "成功", f"認証済み: @{entry.get('account', '')}")
+        return client
             
     except Exception as e:
         log_message("Twitter認証", "システム", "失敗", f"APIセットアップエラー: {str(e)}")
@@ -122,104 +164,48 @@ def post_to_twitter(message, client=None):
             
     except Exception as e:
         log_message("Twitter投稿", "なし", "失敗", f"エラー: {str(e)}")
+        response = getattr(e, "response", None)
         return {
             "success": False,
             "error": str(e),
+            "auth_error": getattr(response, "status_code", None) == 401,
             "platform": "twitter"
         }
 
-# 投稿結果を記録
-def record_posting_result(product, post_result):
-    try:
-        # 記録用のファイルがなければ作成
-        if not os.path.exists("twitter_posting_log.csv"):
-            with open("twitter_posting_log.csv", mode="w", newline="", encoding="utf-8") as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "timestamp", "jan_code", "product_name", "current_price", 
-                    "price_change_rate", "success", "tweet_id", "error"
-                ])
-        
-        # 記録を追加
-        with open("twitter_posting_log.csv", mode="a", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                product["jan_code"],
-                product["product_name"],
-                product["current_price"],
-                product["price_change_rate"],
-                post_result["success"],
-                post_result.get("id", ""),
-                post_result.get("error", "")
-            ])
-            
-    except Exception as e:
-        log_message("投稿記録", product["jan_code"], "失敗", f"エラー: {str(e)}")
+# X(Twitter)の投稿先
+class TwitterPoster(Poster):
+    platform = "twitter"
+    label = "Twitter"
+    log_path = "twitter_posting_log.csv"
+    id_column = "tweet_id"
+    max_posts = 5
+
+    def __init__(self):
+        self.client = None
+
+    # APIクライアントを一度だけ初期化する
+    def prepare(self):
+        self.client = setup_twitter_api()
+        return self.client is not None
+
+    def reauthenticate(self):
+        self.client = setup_twitter_api(revalidate=True)
+        return self.client is not None
+
+    def create_message(self, product):
+        return create_twitter_message(product)
+
+    def publish(self, message):
+        return post_to_twitter(message, self.client)
 
 # 商品情報をTwitterに投稿するメイン関数
-def post_products_to_twitter():
+def post_products_to_twitter(products=None):
+    """productsを省略するとnotifiable_products.jsonから読み込む。商品ごとのPostResultのリストを返す"""
     try:
-        # 通知対象の商品がなければ終了
-        if not os.path.exists("notifiable_products.json"):
-            log_message("Twitter投稿", "システム", "情報", "通知対象の商品がありません")
-            return []
-            
-        # 通知対象の商品を読み込む
-        with open("notifiable_products.json", "r", encoding="utf-8") as f:
-            notifiable_products = json.load(f)
-            
-        if not notifiable_products:
-            log_message("Twitter投稿", "システム", "情報", "通知対象の商品がありません")
-            return []
-            
-        log_message("Twitter投稿", "システム", "開始", f"{len(notifiable_products)}件の商品を投稿します")
-        
-        # Twitter APIクライアントを初期化（一度だけ初期化）
-        twitter_client = setup_twitter_api()
-        if not twitter_client:
-            log_message("Twitter投稿", "システム", "警告", "Twitter APIの認証に失敗したため投稿をスキップします")
-            return []
-        
-        results = []
-        
-        # 投稿数の上限（API制限対策）
-        max_posts = min(5, len(notifiable_products))
-        
-        # 各商品を処理
-        for i in range(max_posts):
-            product = notifiable_products[i]
-            
-            try:
-                # 投稿メッセージを作成
-                twitter_message = create_twitter_message(product)
-                
-                # Twitterに投稿
-                log_message("Twitter投稿", product["jan_code"], "進行中", "Twitterに投稿します")
-                post_result = post_to_twitter(twitter_message, twitter_client)
-                
-                # 投稿結果を記録
-                record_posting_result(product, post_result)
-                
-                results.append({
-                    "product": product,
-                    "result": post_result
-                })
-                
-                log_message("Twitter投稿", product["jan_code"], "完了", 
-                           f"結果: {'成功' if post_result['success'] else '失敗'}")
-                
-                # 連続投稿の場合はAPIレート制限を考慮して少し待機
-                if i < max_posts - 1:
-                    time.sleep(2)
-                    
-            except Exception as e:
-                log_message("Twitter投稿", product["jan_code"], "失敗", f"エラー: {str(e)}")
-        
-        log_message("Twitter投稿", "システム", "完了", f"{len(results)}件の商品の投稿が完了しました")
-        
-        return results
-        
+        if products is None:
+            products = load_notifiable_products()
+        return TwitterPoster().post_products(products)
+
     except Exception as e:
         log_message("Twitter投稿", "システム", "失敗", f"エラー: {str(e)}")
         return []
@@ -235,6 +221,7 @@ if __name__ == "__main__":
         
         # 実行結果をログに記録
         log_message("メイン処理", "システム", "完了", f"{len(results)}件の商品をTwitterに投稿しました")
+        log_message("HTTP接続", "システム", "統計", http_client.format_connection_stats())
         
         # notifiable_products.jsonは更新せず、GitHubコミット用に保持しておく
         log_message("メイン処理", "システム", "情報", "通知対象商品リストを保持しています（コミット用）")